@@ -1,11 +1,13 @@
 balances = Hash(default_value=0)
 metadata = Hash()
+metadata_version = Variable()
+checkpoints = Hash(default_value=0)
 TransferEvent = LogEvent(event="Transfer", params={"from":{'type':str, 'idx':True}, "to": {'type':str, 'idx':True}, "amount": {'type':(int, float, decimal)}})
 ApproveEvent = LogEvent(event="Approve", params={"from":{'type':str, 'idx':True}, "to": {'type':str, 'idx':True}, "amount": {'type':(int, float, decimal)}})
 
 
 @construct
-def seed():
+def seed(decimals: int = None, enable_checkpoints: bool = False):
     balances[ctx.caller] = 1_000_000
 
     metadata['token_name'] = "TEST TOKEN"
@@ -14,41 +16,159 @@ def seed():
     metadata['token_website'] = 'https://some.token.url'
     metadata['total_supply'] = balances[ctx.caller]
     metadata['operator'] = ctx.caller
+    # The token's decimals (e.g. 8) to keep every amount in integer base units, or None for floats
+    assert decimals is None or (isinstance(decimals, int) and not isinstance(decimals, bool) and decimals >= 0), 'Decimals must be a non-negative integer!'
+    metadata['decimals'] = decimals
+    # Time checkpointing started, or None. Fixed at deployment so the history has no gaps
+    metadata['checkpoints'] = now if enable_checkpoints else None
 
+    metadata_version.set(0)
 
+
+# xsc-core: begin (generated from xsc_tools/core.py, do not edit by hand)
 @export
 def change_metadata(key: str, value: Any):
     assert ctx.caller == metadata['operator'], 'Only operator can set metadata!'
+    validate_metadata(key, value)
+
     metadata[key] = value
-    
+    metadata_version.set(metadata_version.get() + 1)
+
+
 @export
-def balance_of(address: str):
-    return balances[address]
+def get_metadata():
+    return {
+        'token_name': metadata['token_name'],
+        'token_symbol': metadata['token_symbol'],
+        'token_logo_url': metadata['token_logo_url'],
+        'token_website': metadata['token_website'],
+        'total_supply': metadata['total_supply'],
+        'operator': metadata['operator'],
+        'decimals': metadata['decimals'],
+        'version': metadata_version.get(),
+    }
+
 
 @export
 def transfer(amount: float, to: str):
+    validate_amount(amount, metadata['decimals'])
     assert amount > 0, 'Cannot send negative balances!'
     assert balances[ctx.caller] >= amount, 'Not enough coins to send!'
 
     balances[ctx.caller] -= amount
     balances[to] += amount
+    write_transfer_checkpoints(ctx.caller, to, amount)
+
     TransferEvent({"from": ctx.caller, "to": to, "amount": amount})
 
+
 @export
 def approve(amount: float, to: str):
+    validate_amount(amount, metadata['decimals'])
     assert amount >= 0, 'Cannot approve negative balances!'
-    
     balances[ctx.caller, to] = amount
+
     ApproveEvent({"from": ctx.caller, "to": to, "amount": amount})
-    
+
 
 @export
 def transfer_from(amount: float, to: str, main_account: str):
+    validate_amount(amount, metadata['decimals'])
     assert amount > 0, 'Cannot send negative balances!'
-    assert balances[main_account, ctx.caller] >= amount, f'Not enough coins approved to send! You have {balances[main_account, ctx.caller]} and are trying to spend {amount}'
+    assert (
+        balances[main_account, ctx.caller] >= amount
+    ), f'Not enough coins approved to send! You have {balances[main_account, ctx.caller]} and are trying to spend {amount}'
     assert balances[main_account] >= amount, 'Not enough coins to send!'
 
     balances[main_account, ctx.caller] -= amount
     balances[main_account] -= amount
     balances[to] += amount
+    write_transfer_checkpoints(main_account, to, amount)
+
     TransferEvent({"from": main_account, "to": to, "amount": amount})
+
+
+@export
+def balance_of(address: str):
+    return balances[address]
+# xsc-core: end
+
+
+# Balance of `address` at `time` (a '%Y-%m-%d %H:%M:%S' string), from its checkpoints
+@export
+def balance_at(address: str, time: str):
+    return find_checkpoint(checkpoints, address, strptime_ymdhms(time), balances[address])
+
+
+def validate_metadata(key: str, value: Any):
+    assert key != 'total_supply', 'Total supply is managed by the contract!'
+    assert key != 'decimals', 'Decimals are fixed at deployment!'
+    assert key != 'checkpoints', 'Checkpoints are fixed at deployment!'
+
+    if key in ['token_name', 'token_symbol', 'operator']:
+        assert isinstance(value, str) and value != '', f'Metadata {key} must be a non-empty string!'
+    elif key in ['token_logo_url', 'token_website']:
+        assert isinstance(value, str), f'Metadata {key} must be a string!'
+
+
+# Integer-unit mode: with `decimals` set, amounts must be whole base units, so balances stay exact integers
+def validate_amount(amount: float, decimals: int):
+    if decimals is not None:
+        assert isinstance(amount, int) and not isinstance(amount, bool), 'Amounts must be integer base units!'
+
+
+# Checkpoints: store[key] is the number of checkpoints, store[key, i] is [time, value],
+# the value from `time` on. Changes within one block share a checkpoint.
+def write_transfer_checkpoints(sender: str, receiver: str, amount: float):
+    since = metadata['checkpoints']
+    if since is not None and sender != receiver:
+        write_checkpoint(checkpoints, sender, balances[sender] + amount, balances[sender], since)
+        write_checkpoint(checkpoints, receiver, balances[receiver] - amount, balances[receiver], since)
+
+
+def write_checkpoint(store: Any, key: str, previous: float, current: float, since: datetime.datetime):
+    count = store[key]
+
+    # First checkpoint of a non-zero value: the value held since checkpointing started
+    if count == 0 and previous != 0:
+        store[key, 0] = [since, previous]
+        count = 1
+
+    if count > 0 and store[key, count - 1][0] == now:
+        store[key, count - 1] = [now, current]
+    else:
+        store[key, count] = [now, current]
+        store[key] = count + 1
+
+
+# Binary search for the last checkpoint at or before `time`
+def find_checkpoint(store: Any, key: str, time: datetime.datetime, current: float):
+    since = metadata['checkpoints']
+    assert since is not None, 'Checkpoints are not enabled!'
+    assert time >= since, f'No checkpoints before {since}!'
+
+    count = store[key]
+
+    # No checkpoints: the value has not changed while checkpointing was on
+    if count == 0:
+        return current
+
+    low = 0
+    high = count
+
+    for step in range(count.bit_length() + 1):
+        if low >= high:
+            break
+        middle = (low + high) // 2
+        if store[key, middle][0] <= time:
+            low = middle + 1
+        else:
+            high = middle
+
+    if low == 0:
+        return 0
+    return store[key, low - 1][1]
+
+
+def strptime_ymdhms(date_string: str) -> datetime.datetime:
+    return datetime.datetime.strptime(date_string, '%Y-%m-%d %H:%M:%S')
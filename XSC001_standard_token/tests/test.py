@@ -27,6 +27,11 @@ class TestCurrencyContract(unittest.TestCase):
         # Called after every test, ensures each test starts with a clean slate and is isolated from others
         self.client.flush()
 
+    def deploy(self, **constructor_args):
+        with open(Path(__file__).parent.parent / "XSC0001.py") as f:
+            self.client.submit(f.read(), name="configured", constructor_args=constructor_args)
+        return self.client.get_contract("configured")
+
     def test_initial_balance(self):
         # Check initial balance set by constructor
         sys_balance = self.currency.balances["sys"]
@@ -49,6 +54,31 @@ class TestCurrencyContract(unittest.TestCase):
         new_name = self.currency.metadata["token_name"]
         self.assertEqual(new_name, "NEW TOKEN")
 
+    def test_get_metadata(self):
+        metadata = self.currency.get_metadata()
+        self.assertEqual(metadata["token_name"], "TEST TOKEN")
+        self.assertEqual(metadata["token_symbol"], "TST")
+        self.assertEqual(metadata["total_supply"], 1_000_000)
+        self.assertEqual(metadata["operator"], "sys")
+        self.assertEqual(metadata["version"], 0)
+
+    def test_change_metadata_bumps_version(self):
+        self.currency.change_metadata(key="token_name", value="NEW TOKEN", signer="sys")
+        self.currency.change_metadata(key="token_symbol", value="NEW", signer="sys")
+        metadata = self.currency.get_metadata()
+        self.assertEqual(metadata["token_name"], "NEW TOKEN")
+        self.assertEqual(metadata["token_symbol"], "NEW")
+        self.assertEqual(metadata["version"], 2)
+
+    def test_change_metadata_validates_standard_keys(self):
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_symbol", value=123, signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_name", value="", signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="total_supply", value=1, signer="sys")
+        self.assertEqual(self.currency.get_metadata()["version"], 0)
+
     def test_approve_and_allowance(self):
         # Test approve
         self.currency.approve(amount=500, to="eve", signer="sys")
@@ -89,6 +119,71 @@ class TestCurrencyContract(unittest.TestCase):
         # THEN the new allowance should overwrite the old one
         self.assertEqual(new_allowance, 200)
 
+    def test_integer_units(self):
+        # Tokens deployed with decimals only accept integer base units
+        self.currency = self.deploy(decimals=8)
+        self.currency.transfer(amount=150_000, to="bob", signer="sys")
+        self.assertEqual(self.currency.balances["bob"], 150_000)
+        self.assertIsInstance(self.currency.balances["sys"], int)
+        with self.assertRaises(Exception):
+            self.currency.transfer(amount=1.5, to="bob", signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.approve(amount=0.5, to="bob", signer="sys")
+        # Booleans are not amounts, even though they are ints in Python
+        with self.assertRaises(AssertionError):
+            self.currency.transfer(amount=True, to="bob", signer="sys")
+        self.assertEqual(self.currency.get_metadata()["decimals"], 8)
+
+    def test_decimals_cannot_be_changed(self):
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="decimals", value=8, signer="sys")
+
+    def test_balance_at(self):
+        currency = self.deploy(enable_checkpoints=True)
+        currency.transfer(amount=100, to="bob", signer="sys", environment={"now": Datetime(year=2100, month=1, day=1)})
+        currency.transfer(amount=50, to="bob", signer="sys", environment={"now": Datetime(year=2100, month=2, day=1)})
+        currency.transfer(amount=30, to="carl", signer="bob", environment={"now": Datetime(year=2100, month=3, day=1)})
+
+        self.assertEqual(currency.balance_at(address="bob", time="2099-12-31 00:00:00"), 0)
+        self.assertEqual(currency.balance_at(address="bob", time="2100-01-01 00:00:00"), 100)
+        self.assertEqual(currency.balance_at(address="bob", time="2100-02-15 00:00:00"), 150)
+        self.assertEqual(currency.balance_at(address="bob", time="2101-01-01 00:00:00"), 120)
+        # Balances held before the first checkpoint are kept back to the deployment
+        self.assertEqual(currency.balance_at(address="sys", time="2099-12-31 00:00:00"), 1_000_000)
+        self.assertEqual(currency.balance_at(address="sys", time="2100-01-15 00:00:00"), 999_900)
+        # Accounts without checkpoints report their current balance
+        self.assertEqual(currency.balance_at(address="dave", time="2100-01-15 00:00:00"), 0)
+
+    def test_checkpoints_share_a_block(self):
+        currency = self.deploy(enable_checkpoints=True)
+        env = {"now": Datetime(year=2100, month=1, day=1)}
+        currency.transfer(amount=100, to="bob", signer="sys", environment=env)
+        currency.transfer(amount=100, to="bob", signer="sys", environment=env)
+        self.assertEqual(currency.checkpoints["bob"], 1)
+        self.assertEqual(currency.balance_at(address="bob", time="2100-01-01 00:00:00"), 200)
+
+    def test_no_checkpoints_before_deployment(self):
+        currency = self.deploy(enable_checkpoints=True)
+        currency.transfer(amount=100, to="bob", signer="sys", environment={"now": Datetime(year=2100, month=1, day=1)})
+        with self.assertRaises(AssertionError):
+            currency.balance_at(address="sys", time="1990-01-01 00:00:00")
+
+    def test_checkpoints_cannot_be_toggled(self):
+        currency = self.deploy(enable_checkpoints=True)
+        with self.assertRaises(AssertionError):
+            currency.change_metadata(key="checkpoints", value=None, signer="sys")
+        currency.transfer(amount=100, to="bob", signer="sys", environment={"now": Datetime(year=2100, month=1, day=1)})
+        self.assertEqual(currency.balance_at(address="bob", time="2100-01-02 00:00:00"), 100)
+
+    def test_checkpoints_are_off_by_default(self):
+        self.currency.transfer(amount=100, to="bob", signer="sys")
+        self.assertEqual(self.currency.checkpoints["bob"], 0)
+        with self.assertRaises(AssertionError):
+            self.currency.change_metadata(key="checkpoints", value=True, signer="sys")
+        # Turning them on later would leave a gap, so history is never reported
+        with self.assertRaises(AssertionError):
+            self.currency.balance_at(address="bob", time="2100-01-01 00:00:00")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,13 @@
 balances = Hash(default_value=0)
 metadata = Hash()
+metadata_version = Variable()
 permits = Hash()
 
 TransferEvent = LogEvent(event="Transfer", params={"from":{'type':str, 'idx':True}, "to": {'type':str, 'idx':True}, "amount": {'type':(int, float, decimal)}})
 ApproveEvent = LogEvent(event="Approve", params={"from":{'type':str, 'idx':True}, "to": {'type':str, 'idx':True}, "amount": {'type':(int, float, decimal)}})
 
 @construct
-def seed():
+def seed(decimals: int = None):
     balances[ctx.caller] = 1_000_000
 
     metadata['token_name'] = "TEST TOKEN"
@@ -15,16 +16,40 @@ def seed():
     metadata['token_website'] = 'https://some.token.url'
     metadata['total_supply'] = balances[ctx.caller]
     metadata['operator'] = ctx.caller
+    # The token's decimals (e.g. 8) to keep every amount in integer base units, or None for floats
+    assert decimals is None or (isinstance(decimals, int) and not isinstance(decimals, bool) and decimals >= 0), 'Decimals must be a non-negative integer!'
+    metadata['decimals'] = decimals
 
+    metadata_version.set(0)
 
+
+# xsc-core: begin (generated from xsc_tools/core.py, do not edit by hand)
 @export
 def change_metadata(key: str, value: Any):
     assert ctx.caller == metadata['operator'], 'Only operator can set metadata!'
+    validate_metadata(key, value)
+
     metadata[key] = value
+    metadata_version.set(metadata_version.get() + 1)
+
+
+@export
+def get_metadata():
+    return {
+        'token_name': metadata['token_name'],
+        'token_symbol': metadata['token_symbol'],
+        'token_logo_url': metadata['token_logo_url'],
+        'token_website': metadata['token_website'],
+        'total_supply': metadata['total_supply'],
+        'operator': metadata['operator'],
+        'decimals': metadata['decimals'],
+        'version': metadata_version.get(),
+    }
 
 
 @export
 def transfer(amount: float, to: str):
+    validate_amount(amount, metadata['decimals'])
     assert amount > 0, 'Cannot send negative balances!'
     assert balances[ctx.caller] >= amount, 'Not enough coins to send!'
 
@@ -33,8 +58,10 @@ def transfer(amount: float, to: str):
 
     TransferEvent({"from": ctx.caller, "to": to, "amount": amount})
 
+
 @export
 def approve(amount: float, to: str):
+    validate_amount(amount, metadata['decimals'])
     assert amount >= 0, 'Cannot approve negative balances!'
     balances[ctx.caller, to] = amount
 
@@ -43,8 +70,11 @@ def approve(amount: float, to: str):
 
 @export
 def transfer_from(amount: float, to: str, main_account: str):
+    validate_amount(amount, metadata['decimals'])
     assert amount > 0, 'Cannot send negative balances!'
-    assert balances[main_account, ctx.caller] >= amount, f'Not enough coins approved to send! You have {balances[main_account, ctx.caller]} and are trying to spend {amount}'
+    assert (
+        balances[main_account, ctx.caller] >= amount
+    ), f'Not enough coins approved to send! You have {balances[main_account, ctx.caller]} and are trying to spend {amount}'
     assert balances[main_account] >= amount, 'Not enough coins to send!'
 
     balances[main_account, ctx.caller] -= amount
@@ -57,14 +87,41 @@ def transfer_from(amount: float, to: str, main_account: str):
 @export
 def balance_of(address: str):
     return balances[address]
+# xsc-core: end
+
+
+def validate_metadata(key: str, value: Any):
+    assert key != 'total_supply', 'Total supply is managed by the contract!'
+    assert key != 'decimals', 'Decimals are fixed at deployment!'
+
+    if key in ['token_name', 'token_symbol', 'operator']:
+        assert isinstance(value, str) and value != '', f'Metadata {key} must be a non-empty string!'
+    elif key in ['token_logo_url', 'token_website']:
+        assert isinstance(value, str), f'Metadata {key} must be a string!'
+
+
+# Integer-unit mode: with `decimals` set, amounts must be whole base units, so balances stay exact integers
+def validate_amount(amount: float, decimals: int):
+    if decimals is not None:
+        assert isinstance(amount, int) and not isinstance(amount, bool), 'Amounts must be integer base units!'
 
 
 # XSC002
 
+PERMIT_DOMAIN_NAME = 'XSC002'
+PERMIT_DOMAIN_VERSION = '1'
+
+
 @export
-def permit(owner: str, spender: str, value: float, deadline: str, signature: str):
+def permit(owner: str, spender: str, value: float, deadline: str, signature: str, structured: bool = False):
+    validate_amount(value, metadata['decimals'])
     deadline = strptime_ymdhms(deadline)
-    permit_msg = construct_permit_msg(owner, spender, value, str(deadline))
+
+    if structured:
+        permit_msg = construct_structured_permit_msg(owner, spender, value, str(deadline))
+    else:
+        permit_msg = construct_permit_msg(owner, spender, value, str(deadline))
+
     permit_hash = hashlib.sha3(permit_msg)
 
     assert permits[permit_hash] is None, 'Permit can only be used once.'
@@ -73,17 +130,79 @@ def permit(owner: str, spender: str, value: float, deadline: str, signature: str
     assert crypto.verify(owner, permit_msg, signature), 'Invalid signature.'
 
     balances[owner, spender] = value
-    permits[permit_hash] = True
+    permits[permit_hash] = deadline
 
     ApproveEvent({"from": owner, "to": spender, "amount": value})
     
     return permit_hash
 
 
+@export
+def prune_permits(permit_hashes: list):
+    for permit_hash in permit_hashes:
+        deadline = permits[permit_hash]
+        assert deadline is not None, 'Permit does not exist.'
+        assert not isinstance(deadline, bool), 'Permit was recorded without a deadline and cannot be pruned.'
+        assert deadline <= now, 'Permit has not expired.'
+        permits[permit_hash] = None
+
+
 def construct_permit_msg(owner: str, spender: str, value: float, deadline: str):
     return f"{owner}:{spender}:{value}:{deadline}:{ctx.this}:{chain_id}"
 
 
+def construct_structured_permit_msg(owner: str, spender: str, value: float, deadline: str):
+    return encode_permit_fields([permit_domain(), 'permit', owner, spender, format_amount(value), deadline])
+
+
+# Identifies the contract, chain and encoding version a structured permit is valid for
+def permit_domain():
+    return hashlib.sha3(encode_permit_fields([PERMIT_DOMAIN_NAME, ctx.this, chain_id, PERMIT_DOMAIN_VERSION]))
+
+
+# Length-prefixes every field ("<len>:<field>"), so fields may contain any character
+def encode_permit_fields(fields: list):
+    encoded = ''
+    for field in fields:
+        field = str(field)
+        encoded += f'{len(field)}:{field}'
+    return encoded
+
+
+# Canonical amount for structured permits: fixed-point digits without exponent or trailing zeros,
+# so 1, 1.0 and 1.00 sign the same while 1.5E+2 and 1.5E+20 do not
+def format_amount(amount: float):
+    digits = str(amount).lower()
+    sign = ''
+    if digits.startswith('-'):
+        sign = '-'
+        digits = digits[1:]
+
+    exponent = 0
+    if 'e' in digits:
+        digits, exponent = digits.split('e')
+        exponent = int(exponent)
+
+    point = len(digits) + exponent
+    if '.' in digits:
+        point = digits.index('.') + exponent
+        digits = digits.replace('.', '')
+
+    if point < 0:
+        digits = '0' * -point + digits
+        point = 0
+    if point > len(digits):
+        digits += '0' * (point - len(digits))
+
+    whole = digits[:point].lstrip('0') or '0'
+    fraction = digits[point:].rstrip('0')
+    if fraction != '':
+        whole += '.' + fraction
+    if whole == '0':
+        return whole
+    return sign + whole
+
+
 def strptime_ymdhms(date_string: str) -> datetime.datetime:
     return datetime.datetime.strptime(date_string, '%Y-%m-%d %H:%M:%S')
 
@@ -36,6 +36,11 @@ class TestCurrencyContract(unittest.TestCase):
         # Called after every test, ensures each test starts with a clean slate and is isolated from others
         self.client.flush()
 
+    def deploy(self, **constructor_args):
+        with open(Path(__file__).parent.parent / "XSC0002.py") as f:
+            self.client.submit(f.read(), name="configured", constructor_args=constructor_args)
+        return self.client.get_contract("configured")
+
     def test_initial_balance(self):
         # Check initial balance set by constructor
         sys_balance = self.currency.balances["sys"]
@@ -58,6 +63,31 @@ class TestCurrencyContract(unittest.TestCase):
         new_name = self.currency.metadata["token_name"]
         self.assertEqual(new_name, "NEW TOKEN")
 
+    def test_get_metadata(self):
+        metadata = self.currency.get_metadata()
+        self.assertEqual(metadata["token_name"], "TEST TOKEN")
+        self.assertEqual(metadata["token_symbol"], "TST")
+        self.assertEqual(metadata["total_supply"], 1_000_000)
+        self.assertEqual(metadata["operator"], "sys")
+        self.assertEqual(metadata["version"], 0)
+
+    def test_change_metadata_bumps_version(self):
+        self.currency.change_metadata(key="token_name", value="NEW TOKEN", signer="sys")
+        self.currency.change_metadata(key="token_symbol", value="NEW", signer="sys")
+        metadata = self.currency.get_metadata()
+        self.assertEqual(metadata["token_name"], "NEW TOKEN")
+        self.assertEqual(metadata["token_symbol"], "NEW")
+        self.assertEqual(metadata["version"], 2)
+
+    def test_change_metadata_validates_standard_keys(self):
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_symbol", value=123, signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_name", value="", signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="total_supply", value=1, signer="sys")
+        self.assertEqual(self.currency.get_metadata()["version"], 0)
+
     def test_approve_and_allowance(self):
         # Test approve
         self.currency.approve(amount=500, to="eve", signer="sys")
@@ -98,6 +128,15 @@ class TestCurrencyContract(unittest.TestCase):
         return f"{owner}:{spender}:{value}:{deadline}:currency:{self.chain_id}"
 
 
+    def encode_permit_fields(self, fields: list):
+        return "".join(f"{len(str(field))}:{field}" for field in fields)
+
+
+    def construct_structured_permit_msg(self, owner: str, spender: str, value: float, deadline: dict):
+        domain = sha3(self.encode_permit_fields(["XSC002", "currency", self.chain_id, "1"]))
+        return self.encode_permit_fields([domain, "permit", owner, spender, value, deadline])
+
+
     def create_deadline(self, minutes=1):
         d = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
         return Datetime(d.year, d.month, d.day, hour=d.hour, minute=d.minute)
@@ -215,7 +254,85 @@ class TestCurrencyContract(unittest.TestCase):
             new_allowance = self.currency.balances[public_key, spender]
             self.assertEqual(new_allowance, new_value)
 
+    def test_permit_stores_deadline(self):
+        private_key = 'ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8'
+        wallet = Wallet(private_key)
+        deadline = self.create_deadline()
+        msg = self.construct_permit_msg(wallet.public_key, "some_spender", 100, deadline)
+        permit_hash = self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg))
+        self.assertEqual(self.currency.permits[permit_hash], deadline)
+
+    def test_prune_permits(self):
+        private_key = 'ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8'
+        wallet = Wallet(private_key)
+        deadline = Datetime(year=2030, month=1, day=1)
+        msg = self.construct_permit_msg(wallet.public_key, "some_spender", 100, deadline)
+        permit_hash = self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg), environment={"now": Datetime(year=2029, month=1, day=1)})
+
+        # Cannot prune before the deadline
+        with self.assertRaises(Exception):
+            self.currency.prune_permits(permit_hashes=[permit_hash], signer="anyone", environment={"now": Datetime(year=2029, month=6, day=1)})
+
+        self.currency.prune_permits(permit_hashes=[permit_hash], signer="anyone", environment={"now": Datetime(year=2030, month=6, day=1)})
+        self.assertIsNone(self.currency.permits[permit_hash])
+
+        # The deadline alone still rejects a replay
+        with self.assertRaises(Exception) as context:
+            self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg), environment={"now": Datetime(year=2030, month=6, day=1)})
+        self.assertIn('Permit has expired', str(context.exception))
+
+    def test_prune_permits_rejects_legacy_markers(self):
+        # Permits recorded before deadlines were stored hold True
+        self.currency.permits["legacy_hash"] = True
+        with self.assertRaises(Exception) as context:
+            self.currency.prune_permits(permit_hashes=["legacy_hash"], signer="anyone", environment={"now": Datetime(year=2030, month=6, day=1)})
+        self.assertIn('without a deadline', str(context.exception))
+        self.assertTrue(self.currency.permits["legacy_hash"])
+
+    def test_structured_permit(self):
+        private_key = 'ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8'
+        wallet = Wallet(private_key)
+        deadline = self.create_deadline()
+        msg = self.construct_structured_permit_msg(wallet.public_key, "some_spender", 100, deadline)
+        permit_hash = self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True)
+        self.assertEqual(permit_hash, sha3(msg))
+        self.assertEqual(self.currency.balances[wallet.public_key, "some_spender"], 100)
+
+        # A legacy signature does not verify against the structured encoding
+        legacy_msg = self.construct_permit_msg(wallet.public_key, "other_spender", 100, deadline)
+        with self.assertRaises(Exception) as context:
+            self.currency.permit(owner=wallet.public_key, spender="other_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(legacy_msg), structured=True)
+        self.assertIn('Invalid signature', str(context.exception))
 
+    def test_structured_permit_amounts_are_fixed_point(self):
+        private_key = 'ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8'
+        wallet = Wallet(private_key)
+        deadline = self.create_deadline()
+        for i, (value, encoded) in enumerate([(1.5e20, "150000000000000000000"), (1.5e2, "150"), (2.5e-10, "0.00000000025"), (1.0e10, "10000000000")]):
+            msg = self.construct_structured_permit_msg(wallet.public_key, f"spender_{i}", encoded, deadline)
+            permit_hash = self.currency.permit(owner=wallet.public_key, spender=f"spender_{i}", value=value, deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True)
+            self.assertEqual(permit_hash, sha3(msg))
+
+        # A permit signed for 150 does not authorize 1.5E+20
+        msg = self.construct_structured_permit_msg(wallet.public_key, "other_spender", "150", deadline)
+        with self.assertRaises(Exception) as context:
+            self.currency.permit(owner=wallet.public_key, spender="other_spender", value=1.5e20, deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True)
+        self.assertIn('Invalid signature', str(context.exception))
+
+    def test_integer_units(self):
+        self.currency = self.deploy(decimals=8)
+        self.currency.transfer(amount=150_000, to="bob", signer="sys")
+        self.assertEqual(self.currency.balances["bob"], 150_000)
+        with self.assertRaises(Exception):
+            self.currency.transfer(amount=1.5, to="bob", signer="sys")
+
+        private_key = 'ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8'
+        wallet = Wallet(private_key)
+        deadline = self.create_deadline()
+        msg = self.construct_permit_msg(wallet.public_key, "some_spender", 0.5, deadline)
+        with self.assertRaises(Exception) as context:
+            self.currency.permit(owner=wallet.public_key, spender="some_spender", value=0.5, deadline=str(deadline), signature=wallet.sign_msg(msg))
+        self.assertIn('integer base units', str(context.exception))
 
 
 if __name__ == "__main__":
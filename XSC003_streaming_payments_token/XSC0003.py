@@ -1,7 +1,12 @@
 balances = Hash(default_value=0)
 metadata = Hash()
+metadata_version = Variable()
 permits = Hash()
 streams = Hash()
+stream_count = Variable()
+stream_aliases = Hash()
+stream_index = Hash(default_value=0)
+stream_positions = Hash()
 
 TransferEvent = LogEvent(
     event="Transfer",
@@ -40,6 +45,35 @@ StreamBalanceEvent = LogEvent(
         "balancer": {"type": str},
     },
 )
+StreamClaimEvent = LogEvent(
+    event="StreamClaim",
+    params={
+        "receiver": {"type": str, "idx": True},
+        "sender": {"type": str, "idx": True},
+        "stream_id": {"type": str, "idx": True},
+        "amount": {"type": (int, float, decimal)},
+        "to": {"type": str},
+    },
+)
+StreamTransferEvent = LogEvent(
+    event="StreamTransfer",
+    params={
+        "from": {"type": str, "idx": True},
+        "to": {"type": str, "idx": True},
+        "stream_id": {"type": str, "idx": True},
+        "sender": {"type": str},
+    },
+)
+StreamRateChangeEvent = LogEvent(
+    event="StreamRateChange",
+    params={
+        "receiver": {"type": str, "idx": True},
+        "sender": {"type": str, "idx": True},
+        "stream_id": {"type": str, "idx": True},
+        "rate": {"type": (int, float, decimal)},
+        "time": {"type": str},
+    },
+)
 StreamCloseChangeEvent = LogEvent(
     event="StreamCloseChange",
     params={
@@ -69,10 +103,81 @@ StreamFinalizedEvent = LogEvent(
     },
 )
 
+# Compact stream events, emitted instead of the events above when
+# metadata["stream_events"] is "compact". Streams are referenced by their
+# sequence number, times are unix timestamps and only StreamCreatedCompact
+# carries the full stream id, sender and receiver. For block streams
+# (StreamCreatedCompact "blocks" is True) all times are block heights instead.
+
+StreamCreatedCompactEvent = LogEvent(
+    event="StreamCreatedCompact",
+    params={
+        "sender": {"type": str, "idx": True},
+        "receiver": {"type": str, "idx": True},
+        "stream": {"type": int, "idx": True},
+        "stream_id": {"type": str},
+        "rate": {"type": (int, float, decimal)},
+        "begins": {"type": int},
+        "closes": {"type": int},
+        "blocks": {"type": bool},
+    },
+)
+StreamBalanceCompactEvent = LogEvent(
+    event="StreamBalanceCompact",
+    params={
+        "stream": {"type": int, "idx": True},
+        "amount": {"type": (int, float, decimal)},
+    },
+)
+StreamClaimCompactEvent = LogEvent(
+    event="StreamClaimCompact",
+    params={
+        "stream": {"type": int, "idx": True},
+        "amount": {"type": (int, float, decimal)},
+        "to": {"type": str},
+    },
+)
+StreamTransferCompactEvent = LogEvent(
+    event="StreamTransferCompact",
+    params={
+        "stream": {"type": int, "idx": True},
+        "to": {"type": str},
+    },
+)
+StreamRateChangeCompactEvent = LogEvent(
+    event="StreamRateChangeCompact",
+    params={
+        "stream": {"type": int, "idx": True},
+        "rate": {"type": (int, float, decimal)},
+        "time": {"type": int},
+    },
+)
+StreamCloseChangeCompactEvent = LogEvent(
+    event="StreamCloseChangeCompact",
+    params={
+        "stream": {"type": int, "idx": True},
+        "time": {"type": int},
+    },
+)
+StreamForfeitCompactEvent = LogEvent(
+    event="StreamForfeitCompact",
+    params={
+        "stream": {"type": int, "idx": True},
+        "time": {"type": int},
+    },
+)
+StreamFinalizedCompactEvent = LogEvent(
+    event="StreamFinalizedCompact",
+    params={
+        "stream": {"type": int, "idx": True},
+        "time": {"type": int},
+    },
+)
+
 # XSC001
 
 @construct
-def seed():
+def seed(decimals: int = None):
     balances[ctx.caller] = 1_000_000
 
     metadata["token_name"] = "TEST TOKEN"
@@ -81,16 +186,45 @@ def seed():
     metadata["token_website"] = "https://some.token.url"
     metadata["total_supply"] = balances[ctx.caller]
     metadata["operator"] = ctx.caller
+    # The token's decimals (e.g. 8) to keep every amount in integer base units, or None for floats
+    assert decimals is None or (isinstance(decimals, int) and not isinstance(decimals, bool) and decimals >= 0), "Decimals must be a non-negative integer."
+    metadata["decimals"] = decimals
+
+    metadata_version.set(0)
+
+    metadata["stream_events"] = STREAM_EVENTS_FULL
+    metadata["stream_ids"] = STREAM_IDS_HASH
+    metadata["stream_aliases"] = False
+    stream_count.set(0)
 
 
+# xsc-core: begin (generated from xsc_tools/core.py, do not edit by hand)
 @export
 def change_metadata(key: str, value: Any):
     assert ctx.caller == metadata["operator"], "Only operator can set metadata."
+    validate_metadata(key, value)
+
     metadata[key] = value
+    metadata_version.set(metadata_version.get() + 1)
+
+
+@export
+def get_metadata():
+    return {
+        "token_name": metadata["token_name"],
+        "token_symbol": metadata["token_symbol"],
+        "token_logo_url": metadata["token_logo_url"],
+        "token_website": metadata["token_website"],
+        "total_supply": metadata["total_supply"],
+        "operator": metadata["operator"],
+        "decimals": metadata["decimals"],
+        "version": metadata_version.get(),
+    }
 
 
 @export
 def transfer(amount: float, to: str):
+    validate_amount(amount, metadata["decimals"])
     assert amount > 0, "Cannot send negative balances."
     assert balances[ctx.caller] >= amount, "Not enough coins to send."
 
@@ -102,6 +236,7 @@ def transfer(amount: float, to: str):
 
 @export
 def approve(amount: float, to: str):
+    validate_amount(amount, metadata["decimals"])
     assert amount >= 0, "Cannot approve negative balances."
     balances[ctx.caller, to] = amount
 
@@ -110,6 +245,7 @@ def approve(amount: float, to: str):
 
 @export
 def transfer_from(amount: float, to: str, main_account: str):
+    validate_amount(amount, metadata["decimals"])
     assert amount > 0, "Cannot send negative balances."
     assert (
         balances[main_account, ctx.caller] >= amount
@@ -126,15 +262,49 @@ def transfer_from(amount: float, to: str, main_account: str):
 @export
 def balance_of(address: str):
     return balances[address]
+# xsc-core: end
+
+
+def validate_metadata(key: str, value: Any):
+    assert key != "total_supply", "Total supply is managed by the contract."
+    assert key != "decimals", "Decimals are fixed at deployment."
+
+    if key in ["token_name", "token_symbol", "operator"]:
+        assert isinstance(value, str) and value != "", f"Metadata {key} must be a non-empty string."
+    elif key in ["token_logo_url", "token_website"]:
+        assert isinstance(value, str), f"Metadata {key} must be a string."
+    elif key == "stream_events":
+        assert value in [STREAM_EVENTS_FULL, STREAM_EVENTS_COMPACT], "Stream events must be full or compact."
+    elif key == "stream_ids":
+        assert value in [STREAM_IDS_HASH, STREAM_IDS_SEQUENTIAL], "Stream ids must be hash or sequential."
+    elif key == "stream_aliases":
+        assert isinstance(value, bool), "Stream aliases must be a boolean."
+
+
+# Integer-unit mode: with `decimals` set, amounts must be whole base units, so balances stay exact integers
+def validate_amount(amount: float, decimals: int):
+    if decimals is not None:
+        assert isinstance(amount, int) and not isinstance(amount, bool), "Amounts must be integer base units."
 
 
 # XSC002 / Permit
 
+PERMIT_DOMAIN_NAME = "XSC002"
+PERMIT_DOMAIN_VERSION = "1"
+
 
 @export
-def permit(owner: str, spender: str, value: float, deadline: str, signature: str) -> str:
+def permit(
+    owner: str, spender: str, value: float, deadline: str, signature: str, structured: bool = False
+) -> str:
+    validate_amount(value, metadata["decimals"])
     deadline = strptime_ymdhms(deadline)
-    permit_msg = construct_permit_msg(owner, spender, value, str(deadline))
+
+    if structured:
+        permit_msg = construct_structured_permit_msg(owner, spender, value, str(deadline))
+    else:
+        permit_msg = construct_permit_msg(owner, spender, value, str(deadline))
+
     permit_hash = hashlib.sha3(permit_msg)
 
     assert permits[permit_hash] is None, "Permit can only be used once."
@@ -143,17 +313,81 @@ def permit(owner: str, spender: str, value: float, deadline: str, signature: str
     assert crypto.verify(owner, permit_msg, signature), "Invalid signature."
 
     balances[owner, spender] = value
-    permits[permit_hash] = True
+    permits[permit_hash] = deadline
 
     ApproveEvent({"from":owner, "to":spender, "amount":value})
 
     return permit_hash
 
 
+# Removes used permits whose deadline has passed; the deadline check alone rejects their replays
+# Called by anyone
+@export
+def prune_permits(permit_hashes: list):
+    for permit_hash in permit_hashes:
+        deadline = permits[permit_hash]
+        assert deadline is not None, "Permit does not exist."
+        assert not isinstance(deadline, bool), "Permit was recorded without a deadline and cannot be pruned."
+        assert deadline <= now, "Permit has not expired."
+        permits[permit_hash] = None
+
+
 def construct_permit_msg(owner: str, spender: str, value: float, deadline: str):
     return f"{owner}:{spender}:{value}:{deadline}:{ctx.this}:{chain_id}"
 
 
+def construct_structured_permit_msg(owner: str, spender: str, value: float, deadline: str):
+    return encode_permit_fields([permit_domain(), "permit", owner, spender, format_amount(value), deadline])
+
+
+# Identifies the contract, chain and encoding version a structured permit is valid for
+def permit_domain():
+    return hashlib.sha3(encode_permit_fields([PERMIT_DOMAIN_NAME, ctx.this, chain_id, PERMIT_DOMAIN_VERSION]))
+
+
+# Length-prefixes every field ("<len>:<field>"), so fields may contain any character
+def encode_permit_fields(fields: list):
+    encoded = ""
+    for field in fields:
+        field = str(field)
+        encoded += f"{len(field)}:{field}"
+    return encoded
+
+
+# Canonical amount for structured permits: fixed-point digits without exponent or trailing zeros,
+# so 1, 1.0 and 1.00 sign the same while 1.5E+2 and 1.5E+20 do not
+def format_amount(amount: float):
+    digits = str(amount).lower()
+    sign = ""
+    if digits.startswith("-"):
+        sign = "-"
+        digits = digits[1:]
+
+    exponent = 0
+    if "e" in digits:
+        digits, exponent = digits.split("e")
+        exponent = int(exponent)
+
+    point = len(digits) + exponent
+    if "." in digits:
+        point = digits.index(".") + exponent
+        digits = digits.replace(".", "")
+
+    if point < 0:
+        digits = "0" * -point + digits
+        point = 0
+    if point > len(digits):
+        digits += "0" * (point - len(digits))
+
+    whole = digits[:point].lstrip("0") or "0"
+    fraction = digits[point:].rstrip("0")
+    if fraction != "":
+        whole += "." + fraction
+    if whole == "0":
+        return whole
+    return sign + whole
+
+
 # XSC003 / Streaming Payments
 
 
@@ -164,9 +398,39 @@ BEGIN_KEY = "begins"
 CLOSE_KEY = "closes"
 RATE_KEY = "rate"
 CLAIMED_KEY = "claimed"
+SEQ_KEY = "seq"
+ESCROW_KEY = "escrow"
+ACCRUED_KEY = "accrued"
+ACCRUED_AT_KEY = "accrued_at"
+SCHEDULE_KEY = "schedule"
+CLIFF_KEY = "cliff"
+ALIAS_KEY = "alias"
 STREAM_ACTIVE = "active"
 STREAM_FINALIZED = "finalized"
 STREAM_FORFEIT = "forfeit"
+STREAM_EVENTS_FULL = "full"
+STREAM_EVENTS_COMPACT = "compact"
+STREAM_IDS_HASH = "hash"
+STREAM_IDS_SEQUENTIAL = "sequential"
+PRUNABLE_KEYS = [
+    SENDER_KEY,
+    RECEIVER_KEY,
+    BEGIN_KEY,
+    CLOSE_KEY,
+    RATE_KEY,
+    CLAIMED_KEY,
+    SEQ_KEY,
+    ESCROW_KEY,
+    ACCRUED_KEY,
+    ACCRUED_AT_KEY,
+    SCHEDULE_KEY,
+    CLIFF_KEY,
+    ALIAS_KEY,
+]
+ROLE_SENDER = "sender"
+ROLE_RECEIVER = "receiver"
+MAX_PAGE_SIZE = 100
+MAX_SEGMENTS = 16
 
 
 # Creates a new stream to a receiver from ctx.caller
@@ -178,19 +442,147 @@ def create_stream(receiver: str, rate: float, begins: str, closes: str):
     closes = strptime_ymdhms(closes)
     sender = ctx.caller
 
-    stream_id = perform_create_stream(sender, receiver, rate, begins, closes)
+    stream_id = perform_create_stream(sender, receiver, rate, begins, closes, metadata["decimals"])
+    return stream_id
+
+
+# Creates several streams from ctx.caller in one transaction
+# Each entry is [receiver, rate, begins, closes]; identical time strings are parsed once
+@export
+def create_streams(new_streams: list):
+    assert len(new_streams) > 0, "No streams to create."
+
+    sender = ctx.caller
+    decimals = metadata["decimals"]
+    parsed_times = {}
+    stream_ids = []
+
+    for new_stream in new_streams:
+        assert len(new_stream) == 4, "Streams must be [receiver, rate, begins, closes]."
+        receiver, rate, begins, closes = new_stream
+
+        if begins not in parsed_times:
+            parsed_times[begins] = strptime_ymdhms(begins)
+        if closes not in parsed_times:
+            parsed_times[closes] = strptime_ymdhms(closes)
+
+        stream_ids.append(
+            perform_create_stream(sender, receiver, rate, parsed_times[begins], parsed_times[closes], decimals)
+        )
+
+    return stream_ids
+
+
+# Creates a stream whose full amount (rate * duration) is escrowed from ctx.caller up front
+# Balancing an escrowed stream never depends on the sender's balance
+# Unused escrow is refunded when the close time is brought forward, on forfeit and on finalize
+@export
+def create_escrowed_stream(receiver: str, rate: float, begins: str, closes: str):
+    begins = strptime_ymdhms(begins)
+    closes = strptime_ymdhms(closes)
+    sender = ctx.caller
+    decimals = metadata["decimals"]
+
+    stream_id = perform_create_stream(sender, receiver, rate, begins, closes, decimals)
+
+    deposit_escrow(stream_id, sender, calc_escrow(begins, closes, rate, 0, 0, decimals))
+
+    return stream_id
+
+
+# Creates a stream from ctx.caller that accrues `rate` per block from block `begins_block` until
+# block `closes_block`, instead of per second. Its begins / closes are block heights, so accrual
+# is integer block arithmetic on `block_num` and involves no datetimes
+@export
+def create_block_stream(receiver: str, rate: float, begins_block: int, closes_block: int, escrowed: bool = False):
+    assert is_block_stream(begins_block) and is_block_stream(closes_block), "Blocks must be integers."
+    sender = ctx.caller
+    decimals = metadata["decimals"]
+
+    stream_id = perform_create_stream(sender, receiver, rate, begins_block, closes_block, decimals)
+
+    if escrowed:
+        deposit_escrow(stream_id, sender, calc_escrow(begins_block, closes_block, rate, 0, 0, decimals))
+
+    return stream_id
+
+
+# Creates a stream from ctx.caller that follows a schedule of [start, rate] segments: each rate
+# applies from its start until the next segment starts (or the stream closes)
+# The first segment starts the stream. With a `cliff`, nothing is due until the cliff; once the
+# stream runs past it, everything earned since the start is due. A stream closed before its cliff
+# pays nothing.
+@export
+def create_scheduled_stream(receiver: str, segments: list, closes: str, cliff: str = None, escrowed: bool = False):
+    assert 0 < len(segments) <= MAX_SEGMENTS, f"Schedules must have 1 to {MAX_SEGMENTS} segments."
+
+    closes = strptime_ymdhms(closes)
+    decimals = metadata["decimals"]
+    begins = None
+    schedule = []
+
+    for segment in segments:
+        assert len(segment) == 2, "Segments must be [start, rate]."
+        start = strptime_ymdhms(segment[0])
+        rate = segment[1]
+
+        assert rate > 0, "Rate must be greater than 0."
+        validate_amount(rate, decimals)
+
+        if begins is None:
+            begins = start
+        # Segments are stored as [seconds since begins, rate]
+        offset = int((start - begins).seconds)
+        assert len(schedule) == 0 or offset > schedule[-1][0], "Segments must start in time order."
+        assert start < closes, "Segments must start before the close date."
+        schedule.append([offset, rate])
+
+    if cliff is not None:
+        cliff = strptime_ymdhms(cliff)
+        assert begins <= cliff and cliff <= closes, "Cliff must be between the start and the close date."
+
+    sender = ctx.caller
+    stream_id = perform_create_stream(sender, receiver, schedule[0][1], begins, closes, decimals, schedule, cliff)
+
+    if escrowed:
+        deposit_escrow(stream_id, sender, calc_escrow(begins, closes, schedule[0][1], 0, 0, decimals, schedule, cliff))
+
     return stream_id
 
 
 # Internal function used to create a stream from a permit or from a direct call from the sender
 def perform_create_stream(
-    sender: str, receiver: str, rate: float, begins: datetime.datetime, closes: datetime.datetime
+    sender: str,
+    receiver: str,
+    rate: float,
+    begins: datetime.datetime,
+    closes: datetime.datetime,
+    decimals: int,
+    schedule: list = None,
+    cliff: datetime.datetime = None,
 ):
-    stream_id = hashlib.sha3(f"{sender}:{receiver}:{begins}:{closes}:{rate}")
-
-    assert streams[stream_id, STATUS_KEY] is None, "Stream already exists."
     assert begins < closes, "Stream cannot begin after the close date."
     assert rate > 0, "Rate must be greater than 0."
+    validate_amount(rate, decimals)
+    assert schedule is None or not is_block_stream(begins), "Scheduled streams run on time, not blocks."
+
+    seq = stream_count.get() + 1
+    stream_count.set(seq)
+
+    if metadata["stream_ids"] == STREAM_IDS_SEQUENTIAL:
+        # The sequence number is the id, so identical streams are allowed
+        stream_id = str(seq)
+
+        if metadata["stream_aliases"]:
+            alias = stream_hash(sender, receiver, rate, begins, closes, schedule, cliff)
+            stream_aliases[alias] = stream_id
+            streams[stream_id, ALIAS_KEY] = alias
+    else:
+        stream_id = stream_hash(sender, receiver, rate, begins, closes, schedule, cliff)
+
+        assert streams[stream_id, STATUS_KEY] is None, "Stream already exists."
+
+        streams[stream_id, SEQ_KEY] = seq
 
     streams[stream_id, STATUS_KEY] = STREAM_ACTIVE
     streams[stream_id, BEGIN_KEY] = begins
@@ -200,11 +592,29 @@ def perform_create_stream(
     streams[stream_id, RATE_KEY] = rate
     streams[stream_id, CLAIMED_KEY] = 0
 
-    StreamCreatedEvent({"sender":sender, "receiver":receiver, "stream_id":stream_id, "rate":rate, "begins":str(begins), "closes":str(closes)})
+    if schedule is not None:
+        streams[stream_id, SCHEDULE_KEY] = schedule
+    if cliff is not None:
+        streams[stream_id, CLIFF_KEY] = cliff
+
+    index_stream(sender, ROLE_SENDER, stream_id)
+    index_stream(receiver, ROLE_RECEIVER, stream_id)
+
+    if compact_events():
+        StreamCreatedCompactEvent({"sender":sender, "receiver":receiver, "stream":seq, "stream_id":stream_id, "rate":rate, "begins":timestamp(begins), "closes":timestamp(closes), "blocks":is_block_stream(begins)})
+    else:
+        StreamCreatedEvent({"sender":sender, "receiver":receiver, "stream_id":stream_id, "rate":rate, "begins":str(begins), "closes":str(closes)})
 
     return stream_id
 
 
+# Returns the stream id registered for a hash-derived alias, or the id itself
+@export
+def resolve_stream(stream_id: str):
+    alias = stream_aliases[stream_id]
+    return alias if alias is not None else stream_id
+
+
 # Creates a payment stream from a valid signature of a permit message
 # Wrapper for perform_create_stream
 @export
@@ -216,23 +626,30 @@ def create_stream_from_permit(
     closes: str,
     deadline: str,
     signature: str,
+    structured: bool = False,
 ):
     begins = strptime_ymdhms(begins)
     closes = strptime_ymdhms(closes)
     deadline = strptime_ymdhms(deadline)
 
     assert now < deadline, "Permit has expired."
-    permit_msg = construct_stream_permit_msg(
-        sender, receiver, rate, begins, closes, deadline
-    )
+
+    if structured:
+        permit_msg = construct_structured_stream_permit_msg(
+            sender, receiver, rate, begins, closes, deadline
+        )
+    else:
+        permit_msg = construct_stream_permit_msg(
+            sender, receiver, rate, begins, closes, deadline
+        )
     permit_hash = hashlib.sha3(permit_msg)
 
     assert permits[permit_hash] is None, "Permit can only be used once."
     assert crypto.verify(sender, permit_msg, signature), "Invalid signature."
 
-    permits[permit_hash] = True
+    permits[permit_hash] = deadline
 
-    return perform_create_stream(sender, receiver, rate, begins, closes)
+    return perform_create_stream(sender, receiver, rate, begins, closes, metadata["decimals"])
 
 
 # Moves balance due from stream from sender to receiver.
@@ -243,7 +660,9 @@ def balance_stream(stream_id: str):
     assert (
         streams[stream_id, STATUS_KEY] == STREAM_ACTIVE
     ), "You can only balance active streams."
-    assert now > streams[stream_id, BEGIN_KEY], "Stream has not started yet."
+
+    begins = streams[stream_id, BEGIN_KEY]
+    assert current_point(begins) > begins, "Stream has not started yet."
 
     sender = streams[stream_id, SENDER_KEY]
     receiver = streams[stream_id, RECEIVER_KEY]
@@ -254,26 +673,127 @@ def balance_stream(stream_id: str):
     ], "Only sender or receiver can balance a stream."
 
     closes = streams[stream_id, CLOSE_KEY]
-    begins = streams[stream_id, BEGIN_KEY]
     rate = streams[stream_id, RATE_KEY]
     claimed = streams[stream_id, CLAIMED_KEY]
+    accrued, start = accrual_state(stream_id, begins)
+    decimals = metadata["decimals"]
 
     # Calculate the amount of tokens that can be claimed
 
-    outstanding_balance = calc_outstanding_balance(begins, closes, rate, claimed)
+    outstanding_balance = calc_outstanding_balance(
+        start, closes, rate, claimed, accrued, decimals, streams[stream_id, SCHEDULE_KEY], streams[stream_id, CLIFF_KEY]
+    )
 
     assert outstanding_balance > 0, "No amount due on this stream."
 
-    claimable_amount = calc_claimable_amount(outstanding_balance, sender)
+    escrow = streams[stream_id, ESCROW_KEY]
+
+    if escrow is None:
+        claimable_amount = calc_claimable_amount(outstanding_balance, sender)
+    else:
+        # Escrowed streams are fully funded, the sender's balance is not involved
+        claimable_amount = outstanding_balance
+
+    pay_from_stream(stream_id, sender, escrow, claimable_amount, receiver)
 
-    balances[sender] -= claimable_amount
-    balances[receiver] += claimable_amount
+    if compact_events():
+        StreamBalanceCompactEvent({"stream":stream_seq(stream_id), "amount":claimable_amount})
+    else:
+        StreamBalanceEvent({"receiver":receiver, "sender":sender, "stream_id":stream_id, "amount":claimable_amount, "balancer":ctx.caller})
 
-    streams[stream_id, CLAIMED_KEY] += claimable_amount
 
-    StreamBalanceEvent({"receiver":receiver, "sender":sender, "stream_id":stream_id, "amount":claimable_amount, "balancer":ctx.caller})
+# Pays part of the balance due on a stream directly to any address.
+# Called by `receiver`
+@export
+def claim_stream(stream_id: str, amount: float, to: str):
+    decimals = metadata["decimals"]
+    validate_amount(amount, decimals)
+    assert streams[stream_id, STATUS_KEY], "Stream does not exist."
+    assert (
+        streams[stream_id, STATUS_KEY] == STREAM_ACTIVE
+    ), "You can only claim from active streams."
 
+    begins = streams[stream_id, BEGIN_KEY]
+    assert current_point(begins) > begins, "Stream has not started yet."
 
+    sender = streams[stream_id, SENDER_KEY]
+    receiver = streams[stream_id, RECEIVER_KEY]
+
+    assert ctx.caller == receiver, "Only receiver can claim from a stream."
+    assert amount > 0, "Cannot claim negative amounts."
+
+    closes = streams[stream_id, CLOSE_KEY]
+    rate = streams[stream_id, RATE_KEY]
+    claimed = streams[stream_id, CLAIMED_KEY]
+    accrued, start = accrual_state(stream_id, begins)
+
+    outstanding_balance = calc_outstanding_balance(
+        start, closes, rate, claimed, accrued, decimals, streams[stream_id, SCHEDULE_KEY], streams[stream_id, CLIFF_KEY]
+    )
+    escrow = streams[stream_id, ESCROW_KEY]
+
+    if escrow is None:
+        claimable_amount = calc_claimable_amount(outstanding_balance, sender)
+    else:
+        claimable_amount = outstanding_balance
+
+    assert amount <= claimable_amount, f"Not enough due on this stream. You can claim {claimable_amount}"
+
+    pay_from_stream(stream_id, sender, escrow, amount, to)
+
+    if compact_events():
+        StreamClaimCompactEvent({"stream":stream_seq(stream_id), "amount":amount, "to":to})
+    else:
+        StreamClaimEvent({"receiver":receiver, "sender":sender, "stream_id":stream_id, "amount":amount, "to":to})
+
+
+
+
+# Changes the rate of a stream from now on.
+# The amount earned so far is checkpointed into `accrued` and the stream accrues at the new rate from
+# `accrued_at` (now); `begins` keeps the stream's original start
+# Called by `sender`
+@export
+def change_rate(stream_id: str, new_rate: float):
+    assert streams[stream_id, STATUS_KEY], "Stream does not exist."
+    assert streams[stream_id, STATUS_KEY] == STREAM_ACTIVE, "Stream is not active."
+
+    sender = streams[stream_id, SENDER_KEY]
+
+    assert ctx.caller == sender, "Only sender can change the rate of a stream."
+    assert streams[stream_id, SCHEDULE_KEY] is None, "The rates of a scheduled stream are fixed."
+    assert new_rate > 0, "Rate must be greater than 0."
+    decimals = metadata["decimals"]
+    validate_amount(new_rate, decimals)
+
+    begins = streams[stream_id, BEGIN_KEY]
+    closes = streams[stream_id, CLOSE_KEY]
+
+    point = current_point(begins)
+    assert point < closes, "Stream has already closed."
+
+    accrued, start = accrual_state(stream_id, begins)
+    if point > start:
+        streams[stream_id, ACCRUED_KEY] = accrued + accrue(streams[stream_id, RATE_KEY], point - start, decimals)
+        streams[stream_id, ACCRUED_AT_KEY] = point
+
+    streams[stream_id, RATE_KEY] = new_rate
+
+    if streams[stream_id, ESCROW_KEY] is not None:
+        settle_escrow(stream_id, sender, decimals)
+
+    if compact_events():
+        StreamRateChangeCompactEvent({"stream": stream_seq(stream_id), "rate": new_rate, "time": timestamp(point)})
+    else:
+        StreamRateChangeEvent(
+            {
+                "receiver": streams[stream_id, RECEIVER_KEY],
+                "sender": sender,
+                "stream_id": stream_id,
+                "rate": new_rate,
+                "time": str(point),
+            }
+        )
 
 
 # Sets a stream to expire at some point greater than or equal to the current time.
@@ -282,8 +802,17 @@ def balance_stream(stream_id: str):
 # Called by `sender`
 @export
 def change_close_time(stream_id: str, new_close_time: str):
-    new_close_time = strptime_ymdhms(new_close_time)
+    perform_change_close(stream_id, strptime_ymdhms(new_close_time))
+
+
+# Block-stream counterpart of change_close_time: the new close is a block height
+# Called by `sender`
+@export
+def change_close_block(stream_id: str, new_close_block: int):
+    perform_change_close(stream_id, new_close_block)
+
 
+def perform_change_close(stream_id: str, new_close_time: Any):
     assert streams[stream_id, STATUS_KEY], "Stream does not exist."
     assert streams[stream_id, STATUS_KEY] == STREAM_ACTIVE, "Stream is not active."
 
@@ -292,23 +821,37 @@ def change_close_time(stream_id: str, new_close_time: str):
     begins = streams[stream_id, BEGIN_KEY]
 
     assert ctx.caller == sender, "Only sender can change the close time of a stream."
+    assert is_block_stream(new_close_time) == is_block_stream(begins), "Block streams close at a block, other streams at a time."
+
+    point = current_point(begins)
 
     # If new close time is in the past or before begin time, close immediately or at begin time
-    if new_close_time <= now:
-        streams[stream_id, CLOSE_KEY] = now
+    if new_close_time <= point:
+        streams[stream_id, CLOSE_KEY] = point
     elif new_close_time < begins:
         streams[stream_id, CLOSE_KEY] = begins
     else:
         streams[stream_id, CLOSE_KEY] = new_close_time
 
-    StreamCloseChangeEvent(
-        {
-            "receiver": receiver,
-            "sender": sender,
-            "stream_id": stream_id,
-            "time": str(streams[stream_id, CLOSE_KEY]),
-        }
-    )
+    if streams[stream_id, ESCROW_KEY] is not None:
+        settle_escrow(stream_id, sender, metadata["decimals"])
+
+    if compact_events():
+        StreamCloseChangeCompactEvent(
+            {
+                "stream": stream_seq(stream_id),
+                "time": timestamp(streams[stream_id, CLOSE_KEY]),
+            }
+        )
+    else:
+        StreamCloseChangeEvent(
+            {
+                "receiver": receiver,
+                "sender": sender,
+                "stream_id": stream_id,
+                "time": str(streams[stream_id, CLOSE_KEY]),
+            }
+        )
 
 
 
@@ -334,23 +877,34 @@ def finalize_stream(stream_id: str):
     closes = streams[stream_id, CLOSE_KEY]
     rate = streams[stream_id, RATE_KEY]
     claimed = streams[stream_id, CLAIMED_KEY]
+    accrued, start = accrual_state(stream_id, begins)
+    decimals = metadata["decimals"]
 
-    assert closes <= now, "Stream has not closed yet."
+    point = current_point(begins)
+    assert closes <= point, "Stream has not closed yet."
 
-    outstanding_balance = calc_outstanding_balance(begins, closes, rate, claimed)
+    outstanding_balance = calc_outstanding_balance(
+        start, closes, rate, claimed, accrued, decimals, streams[stream_id, SCHEDULE_KEY], streams[stream_id, CLIFF_KEY]
+    )
 
     assert outstanding_balance == 0, "Stream has outstanding balance."
 
     streams[stream_id, STATUS_KEY] = STREAM_FINALIZED
 
-    StreamFinalizedEvent(
-        {
-            "receiver": receiver,
-            "sender": sender,
-            "stream_id": stream_id,
-            "time": str(now),
-        }
-    )
+    if streams[stream_id, ESCROW_KEY] is not None:
+        refund_escrow(stream_id, sender)
+
+    if compact_events():
+        StreamFinalizedCompactEvent({"stream": stream_seq(stream_id), "time": timestamp(point)})
+    else:
+        StreamFinalizedEvent(
+            {
+                "receiver": receiver,
+                "sender": sender,
+                "stream_id": stream_id,
+                "time": str(point),
+            }
+        )
 
 
 
@@ -358,7 +912,10 @@ def finalize_stream(stream_id: str):
 # Called by `sender`
 @export
 def close_balance_finalize(stream_id: str):
-    change_close_time(stream_id=stream_id, new_close_time=str(now))
+    if is_block_stream(streams[stream_id, BEGIN_KEY]):
+        change_close_block(stream_id=stream_id, new_close_block=block_num)
+    else:
+        change_close_time(stream_id=stream_id, new_close_time=str(now))
     balance_finalize(stream_id=stream_id)
 
 
@@ -370,6 +927,35 @@ def balance_finalize(stream_id: str):
     finalize_stream(stream_id=stream_id)
 
 
+# Hands the stream, including any balance not yet claimed, to a new receiver
+# Called by `receiver`
+@export
+def transfer_stream(stream_id: str, new_receiver: str):
+    assert streams[stream_id, STATUS_KEY], "Stream does not exist."
+    assert streams[stream_id, STATUS_KEY] == STREAM_ACTIVE, "Stream is not active."
+
+    receiver = streams[stream_id, RECEIVER_KEY]
+
+    assert ctx.caller == receiver, "Only receiver can transfer a stream."
+    assert new_receiver != receiver, "Stream already belongs to this receiver."
+
+    streams[stream_id, RECEIVER_KEY] = new_receiver
+    unindex_stream(receiver, ROLE_RECEIVER, stream_id)
+    index_stream(new_receiver, ROLE_RECEIVER, stream_id)
+
+    if compact_events():
+        StreamTransferCompactEvent({"stream": stream_seq(stream_id), "to": new_receiver})
+    else:
+        StreamTransferEvent(
+            {
+                "from": receiver,
+                "to": new_receiver,
+                "stream_id": stream_id,
+                "sender": streams[stream_id, SENDER_KEY],
+            }
+        )
+
+
 # Forfeit a stream to the sender
 # Called by `receiver`
 @export
@@ -381,28 +967,147 @@ def forfeit_stream(stream_id: str) -> str:
     sender = streams[stream_id, SENDER_KEY]
     assert ctx.caller == receiver, "Only receiver can forfeit a stream."
 
+    point = current_point(streams[stream_id, BEGIN_KEY])
     streams[stream_id, STATUS_KEY] = STREAM_FORFEIT
-    streams[stream_id, CLOSE_KEY] = now
-
-    StreamForfeitEvent(
-        {
-            "receiver": receiver,
-            "sender": sender,
-            "stream_id": stream_id,
-            "time": str(now),
-        }
-    )
+    streams[stream_id, CLOSE_KEY] = point
+
+    if streams[stream_id, ESCROW_KEY] is not None:
+        refund_escrow(stream_id, sender)
+
+    if compact_events():
+        StreamForfeitCompactEvent({"stream": stream_seq(stream_id), "time": timestamp(point)})
+    else:
+        StreamForfeitEvent(
+            {
+                "receiver": receiver,
+                "sender": sender,
+                "stream_id": stream_id,
+                "time": str(point),
+            }
+        )
 
 
 
+# Deletes the records of finalized / forfeited streams, keeping only their status as a tombstone
+# so that hash-derived ids cannot be reused
+# Called by anyone
+@export
+def prune_streams(stream_ids: list):
+    for stream_id in stream_ids:
+        prune_stream(stream_id)
+
+
+def prune_stream(stream_id: str):
+    assert streams[stream_id, STATUS_KEY] in [
+        STREAM_FINALIZED,
+        STREAM_FORFEIT,
+    ], "Only finalized or forfeited streams can be pruned."
+
+    # Already pruned streams have no sender / receiver left to unindex
+    sender = streams[stream_id, SENDER_KEY]
+    if sender is not None:
+        unindex_stream(sender, ROLE_SENDER, stream_id)
+        unindex_stream(streams[stream_id, RECEIVER_KEY], ROLE_RECEIVER, stream_id)
+
+    # The alias may already point to a newer identical stream
+    alias = streams[stream_id, ALIAS_KEY]
+    if alias is not None and stream_aliases[alias] == stream_id:
+        stream_aliases[alias] = None
+
+    for key in PRUNABLE_KEYS:
+        streams[stream_id, key] = None
+
+
+# Returns the full record of a stream and the amount its receiver can balance / claim right now
+@export
+def get_stream(stream_id: str):
+    assert streams[stream_id, STATUS_KEY], "Stream does not exist."
+    return stream_record(stream_id, metadata["decimals"])
+
+
+# Returns one page of the streams `address` sends (role "sender") or receives (role "receiver")
+# A page covers `limit` index entries from `cursor`; `next_cursor` is None on the last page
+@export
+def streams_of(address: str, role: str, cursor: int = 0, limit: int = 50):
+    assert role in [ROLE_SENDER, ROLE_RECEIVER], "Role must be sender or receiver."
+    assert cursor >= 0, "Cursor cannot be negative."
+    assert 0 < limit <= MAX_PAGE_SIZE, f"Limit must be between 1 and {MAX_PAGE_SIZE}."
+
+    count = stream_index[address, role]
+    end = cursor + limit if cursor + limit < count else count
+    decimals = metadata["decimals"]
+    page = []
+
+    for i in range(cursor, end):
+        page.append(stream_record(stream_index[address, role, i], decimals))
+
+    return {"streams": page, "next_cursor": end if end < count else None}
+
+
+def stream_record(stream_id: str, decimals: int):
+    status = streams[stream_id, STATUS_KEY]
+    sender = streams[stream_id, SENDER_KEY]
+    begins = streams[stream_id, BEGIN_KEY]
+    closes = streams[stream_id, CLOSE_KEY]
+    rate = streams[stream_id, RATE_KEY]
+    claimed = streams[stream_id, CLAIMED_KEY]
+    accrued, start = accrual_state(stream_id, begins)
+    escrow = streams[stream_id, ESCROW_KEY]
+    schedule = streams[stream_id, SCHEDULE_KEY]
+    cliff = streams[stream_id, CLIFF_KEY]
+
+    outstanding = 0
+    claimable = 0
+    if schedule is not None:
+        # The stored rate of a scheduled stream is its first segment's; report the one in effect
+        point = current_point(begins)
+        rate = schedule_rate(schedule, (point if point < closes else closes) - begins)
+
+    if status == STREAM_ACTIVE and current_point(begins) > begins:
+        outstanding = calc_outstanding_balance(start, closes, rate, claimed, accrued, decimals, schedule, cliff)
+        if outstanding < 0:
+            outstanding = 0
+        if escrow is None:
+            claimable = calc_claimable_amount(outstanding, sender)
+        else:
+            claimable = outstanding
+
+    return {
+        "stream_id": stream_id,
+        "status": status,
+        "sender": sender,
+        "receiver": streams[stream_id, RECEIVER_KEY],
+        "blocks": is_block_stream(begins),
+        "begins": str(begins) if begins is not None else None,
+        "closes": str(closes) if closes is not None else None,
+        "rate": rate,
+        "claimed": claimed,
+        "accrued": accrued,
+        "accrued_at": str(start) if start != begins else None,
+        "escrow": escrow,
+        "schedule": schedule,
+        "cliff": str(cliff) if cliff is not None else None,
+        "outstanding": outstanding,
+        "claimable": claimable,
+    }
+
+
+# `accrued` is the amount earned before `begins` at earlier rates; after a rate change, `begins` is
+# the stream's `accrued_at` (see change_rate)
 def calc_outstanding_balance(
-    begins: datetime.datetime, closes: datetime.datetime, rate: float, claimed: float
+    begins: datetime.datetime,
+    closes: datetime.datetime,
+    rate: float,
+    claimed: float,
+    accrued: float,
+    decimals: int,
+    schedule: list = None,
+    cliff: datetime.datetime = None,
 ) -> float:
 
-    claimable_end_point = now if now < closes else closes
-    claimable_period = claimable_end_point - begins
-    claimable_seconds = claimable_period.seconds
-    amount_due = (rate * claimable_seconds) - claimed
+    point = current_point(begins)
+    claimable_end_point = point if point < closes else closes
+    amount_due = accrued + earned(begins, claimable_end_point, rate, schedule, cliff, decimals) - claimed
     return amount_due
 
 
@@ -410,11 +1115,215 @@ def calc_claimable_amount(amount_due: float, sender: str) -> float:
     return amount_due if amount_due < balances[sender] else balances[sender]
 
 
+# Moves `amount` from the sender (or the stream's escrow) to `to` and records it as claimed
+def pay_from_stream(stream_id: str, sender: str, escrow: float, amount: float, to: str):
+    if escrow is None:
+        balances[sender] -= amount
+    else:
+        streams[stream_id, ESCROW_KEY] = escrow - amount
+
+    balances[to] += amount
+    streams[stream_id, CLAIMED_KEY] += amount
+
+
+# Amount still owed to the receiver over the whole stream
+def calc_escrow(
+    begins: datetime.datetime,
+    closes: datetime.datetime,
+    rate: float,
+    claimed: float,
+    accrued: float,
+    decimals: int,
+    schedule: list = None,
+    cliff: datetime.datetime = None,
+) -> float:
+    if closes <= begins:
+        return accrued - claimed
+    return accrued + earned(begins, closes, rate, schedule, cliff, decimals) - claimed
+
+
+# Amount a stream has earned from `begins` until `end`: nothing while `end` is before the cliff,
+# otherwise `rate` per second, or the rates of its schedule
+def earned(
+    begins: datetime.datetime,
+    end: datetime.datetime,
+    rate: float,
+    schedule: list,
+    cliff: datetime.datetime,
+    decimals: int,
+) -> float:
+    if cliff is not None and end < cliff:
+        return 0
+    if schedule is None:
+        return accrue(rate, end - begins, decimals)
+    return accrue_schedule(schedule, end - begins, decimals)
+
+
+# Amount earned at `rate` over `period`; only whole seconds accrue in integer-unit mode
+# For block streams `period` is a number of blocks
+def accrue(rate: float, period: Any, decimals: int) -> float:
+    if is_block_stream(period):
+        return rate * period
+    if decimals is None:
+        return rate * period.seconds
+    return rate * int(period.seconds)
+
+
+# Amount earned over `period` from the start of a schedule of [seconds since begins, rate]
+# segments, summed per segment (a schedule has at most MAX_SEGMENTS segments)
+def accrue_schedule(schedule: list, period: datetime.timedelta, decimals: int) -> float:
+    elapsed = period.seconds if decimals is None else int(period.seconds)
+    amount = 0
+
+    for i in range(len(schedule)):
+        offset, rate = schedule[i]
+        if elapsed <= offset:
+            break
+
+        until = elapsed
+        if i + 1 < len(schedule) and schedule[i + 1][0] < elapsed:
+            until = schedule[i + 1][0]
+        amount += rate * (until - offset)
+
+    return amount
+
+
+# Returns [accrued, start]: the amount earned at earlier rates and the point accrual at the current
+# rate starts from, `begins` until the rate is first changed
+def accrual_state(stream_id: str, begins: Any) -> list:
+    accrued = streams[stream_id, ACCRUED_KEY]
+    if accrued is None:
+        return [0, begins]
+    return [accrued, streams[stream_id, ACCRUED_AT_KEY]]
+
+
+# Rate of the schedule segment in effect `period` after the start (the first one before the start)
+def schedule_rate(schedule: list, period: datetime.timedelta) -> float:
+    elapsed = period.seconds
+    rate = schedule[0][1]
+
+    for offset, segment_rate in schedule:
+        if offset > elapsed:
+            break
+        rate = segment_rate
+
+    return rate
+
+
+# Tops up or refunds the escrow so it covers exactly what the stream still owes
+def settle_escrow(stream_id: str, sender: str, decimals: int):
+    escrow = streams[stream_id, ESCROW_KEY]
+    accrued, start = accrual_state(stream_id, streams[stream_id, BEGIN_KEY])
+    required = calc_escrow(
+        start,
+        streams[stream_id, CLOSE_KEY],
+        streams[stream_id, RATE_KEY],
+        streams[stream_id, CLAIMED_KEY],
+        accrued,
+        decimals,
+        streams[stream_id, SCHEDULE_KEY],
+        streams[stream_id, CLIFF_KEY],
+    )
+
+    if required > escrow:
+        assert balances[sender] >= required - escrow, "Not enough coins to escrow."
+
+    balances[sender] -= required - escrow
+    streams[stream_id, ESCROW_KEY] = required
+
+
+def deposit_escrow(stream_id: str, sender: str, deposit: float):
+    assert balances[sender] >= deposit, "Not enough coins to escrow."
+
+    balances[sender] -= deposit
+    streams[stream_id, ESCROW_KEY] = deposit
+
+
+def refund_escrow(stream_id: str, sender: str):
+    balances[sender] += streams[stream_id, ESCROW_KEY]
+    streams[stream_id, ESCROW_KEY] = 0
+
+
 def construct_stream_permit_msg(
     sender: str, receiver: str, rate: float, begins: str, closes: str, deadline: str
 ) -> str:
     return f"{sender}:{receiver}:{rate}:{begins}:{closes}:{deadline}:{ctx.this}:{chain_id}"
 
 
+def construct_structured_stream_permit_msg(
+    sender: str, receiver: str, rate: float, begins: str, closes: str, deadline: str
+) -> str:
+    return encode_permit_fields(
+        [permit_domain(), "stream_permit", sender, receiver, format_amount(rate), begins, closes, deadline]
+    )
+
+
+# Scheduled streams also hash their schedule and cliff; plain streams keep their original ids
+def stream_hash(
+    sender: str,
+    receiver: str,
+    rate: float,
+    begins: datetime.datetime,
+    closes: datetime.datetime,
+    schedule: list = None,
+    cliff: datetime.datetime = None,
+) -> str:
+    if schedule is None and cliff is None:
+        return hashlib.sha3(f"{sender}:{receiver}:{begins}:{closes}:{rate}")
+    return hashlib.sha3(f"{sender}:{receiver}:{begins}:{closes}:{rate}:{schedule}:{cliff}")
+
+
+# Sequential streams use their sequence number as id and store no seq key
+def stream_seq(stream_id: str) -> int:
+    seq = streams[stream_id, SEQ_KEY]
+    return seq if seq is not None else int(stream_id)
+
+
+# Appends a stream to an account's index and remembers its position, so it can be removed again
+def index_stream(address: str, role: str, stream_id: str):
+    count = stream_index[address, role]
+    stream_index[address, role, count] = stream_id
+    stream_index[address, role] = count + 1
+    stream_positions[stream_id, role] = count
+
+
+# Removes a stream from an account's index by moving the last entry into its place
+def unindex_stream(address: str, role: str, stream_id: str):
+    position = stream_positions[stream_id, role]
+    last = stream_index[address, role] - 1
+
+    if position != last:
+        moved = stream_index[address, role, last]
+        stream_index[address, role, position] = moved
+        stream_positions[moved, role] = position
+
+    stream_index[address, role, last] = None
+    stream_index[address, role] = last
+    stream_positions[stream_id, role] = None
+
+
+# Block streams store block heights as begins / closes, all other streams datetimes
+def is_block_stream(begins: Any) -> bool:
+    return isinstance(begins, int) and not isinstance(begins, bool)
+
+
+# The current point on a stream's timeline: the block height for block streams, otherwise the time
+def current_point(begins: Any):
+    if is_block_stream(begins):
+        return block_num
+    return now
+
+
+def compact_events() -> bool:
+    return metadata["stream_events"] == STREAM_EVENTS_COMPACT
+
+
+# Unix timestamp of a stream point; block streams report block heights instead
+def timestamp(date: Any) -> int:
+    if is_block_stream(date):
+        return date
+    return int((date - datetime.datetime(1970, 1, 1)).seconds)
+
+
 def strptime_ymdhms(date_string: str) -> datetime.datetime:
     return datetime.datetime.strptime(date_string, "%Y-%m-%d %H:%M:%S")
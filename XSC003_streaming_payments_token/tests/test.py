@@ -36,6 +36,11 @@ class TestCurrencyContract(unittest.TestCase):
         # Called after every test, ensures each test starts with a clean slate and is isolated from others
         self.client.flush()
 
+    def deploy(self, **constructor_args):
+        with open(Path(__file__).parent.parent / "XSC0003.py") as f:
+            self.client.submit(f.read(), name="configured", constructor_args=constructor_args)
+        return self.client.get_contract("configured")
+
     def test_balance_of(self):
         # GIVEN
         receiver = 'receiver_account'
@@ -77,6 +82,40 @@ class TestCurrencyContract(unittest.TestCase):
         # THEN the metadata should be updated correctly
         self.assertEqual(new_name, "NEW TOKEN")
 
+    def test_get_metadata(self):
+        # GIVEN the seeded metadata
+        # WHEN reading all standard fields in one call
+        metadata = self.currency.get_metadata()
+        # THEN every field and the version counter should be returned
+        self.assertEqual(metadata["token_name"], "TEST TOKEN")
+        self.assertEqual(metadata["token_symbol"], "TST")
+        self.assertEqual(metadata["total_supply"], 1_000_000)
+        self.assertEqual(metadata["operator"], "sys")
+        self.assertEqual(metadata["version"], 0)
+
+    def test_change_metadata_bumps_version(self):
+        # GIVEN two metadata changes by the operator
+        self.currency.change_metadata(key="token_name", value="NEW TOKEN", signer="sys")
+        self.currency.change_metadata(key="token_symbol", value="NEW", signer="sys")
+        # WHEN reading the metadata
+        metadata = self.currency.get_metadata()
+        # THEN the version should have been bumped once per change
+        self.assertEqual(metadata["token_name"], "NEW TOKEN")
+        self.assertEqual(metadata["token_symbol"], "NEW")
+        self.assertEqual(metadata["version"], 2)
+
+    def test_change_metadata_validates_standard_keys(self):
+        # GIVEN invalid values for standard keys
+        # WHEN they are set by the operator
+        # THEN the changes should be rejected and the version left untouched
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_symbol", value=123, signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_name", value="", signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="total_supply", value=1, signer="sys")
+        self.assertEqual(self.currency.get_metadata()["version"], 0)
+
     def test_approve_and_allowance(self):
         # GIVEN an approval setup
         self.currency.approve(amount=500, to="eve", signer="sys")
@@ -130,7 +169,8 @@ class TestCurrencyContract(unittest.TestCase):
         private_key = 'ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8'
         wallet = Wallet(private_key)
         public_key = wallet.public_key
-        deadline = str(self.create_deadline())
+        deadline_time = self.create_deadline()
+        deadline = str(deadline_time)
         spender = "some_spender"
         value = 100
         msg = self.construct_permit_msg(public_key, spender, value, deadline)
@@ -142,7 +182,7 @@ class TestCurrencyContract(unittest.TestCase):
         permit = self.currency.permits[msg_hash]
         expected_event = [{'contract': 'currency', 'event': 'Approve', 'signer': 'sys', 'caller': 'sys', 'data_indexed': {'from': 'ddd326fddb5d1677595311f298b744a4e9f415b577ac179a6afbf38483dc0791', 'to': 'some_spender'}, 'data': {'amount': 100}}]
         self.assertEqual(response['events'], expected_event)
-        self.assertEqual(permit, True)
+        self.assertEqual(permit, deadline_time)
 
     def test_permit_expired(self):
         # GIVEN a permit setup with an expired deadline
@@ -233,6 +273,18 @@ class TestCurrencyContract(unittest.TestCase):
     def construct_stream_permit_msg(self, sender, receiver, rate, begins, closes, deadline):
         return f"{sender}:{receiver}:{rate}:{begins}:{closes}:{deadline}:currency:{self.chain_id}"
 
+    def encode_permit_fields(self, fields):
+        return "".join(f"{len(str(field))}:{field}" for field in fields)
+
+    def permit_domain(self):
+        return sha3(self.encode_permit_fields(["XSC002", "currency", self.chain_id, "1"]))
+
+    def construct_structured_permit_msg(self, owner, spender, value, deadline):
+        return self.encode_permit_fields([self.permit_domain(), "permit", owner, spender, value, deadline])
+
+    def construct_structured_stream_permit_msg(self, sender, receiver, rate, begins, closes, deadline):
+        return self.encode_permit_fields([self.permit_domain(), "stream_permit", sender, receiver, rate, begins, closes, deadline])
+
     def test_create_stream_success(self):
         # GIVEN a valid stream creation setup
         sender = 'alice'
@@ -912,5 +964,779 @@ class TestCurrencyContract(unittest.TestCase):
         self.assertEqual(self.currency.streams[stream_id, 'status'], 'finalized')
         self.assertEqual(self.currency.streams[stream_id, 'claimed'], seconds_in_period)
 
+    def test_streams_get_sequence_numbers(self):
+        # GIVEN two streams created by the same sender
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2024, month=1, day=1, hour=0, minute=0)
+        first_id = self.currency.create_stream(receiver='bob', rate=1, begins=str(begins), closes=str(closes), signer='alice')
+        second_id = self.currency.create_stream(receiver='carol', rate=1, begins=str(begins), closes=str(closes), signer='alice')
+        # THEN each stream should be numbered in creation order
+        self.assertEqual(self.currency.streams[first_id, 'seq'], 1)
+        self.assertEqual(self.currency.streams[second_id, 'seq'], 2)
+        self.assertEqual(self.currency.stream_count.get(), 2)
+
+    def test_compact_stream_events(self):
+        # GIVEN compact stream events are enabled
+        self.currency.change_metadata(key="stream_events", value="compact", signer="sys")
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2024, month=1, day=1, hour=0, minute=0)
+        self.currency.balances[sender] = (closes - begins).seconds
+
+        # WHEN a stream is created and balanced
+        create_res = self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender, return_full_output=True)
+        stream_id = create_res['result']
+        balance_res = self.currency.balance_stream(stream_id=stream_id, signer=receiver, environment={"now": closes}, return_full_output=True)
+        finalize_res = self.currency.finalize_stream(stream_id=stream_id, signer=receiver, environment={"now": closes}, return_full_output=True)
+
+        # THEN the events should reference the sequence number and carry unix timestamps
+        self.assertEqual(create_res['events'], [{
+            'contract': 'currency',
+            'event': 'StreamCreatedCompact',
+            'signer': 'mary',
+            'caller': 'mary',
+            'data_indexed': {'sender': 'mary', 'receiver': 'janine', 'stream': 1},
+            'data': {'stream_id': stream_id, 'rate': 1, 'begins': 1672531200, 'closes': 1704067200, 'blocks': False}
+        }])
+        self.assertEqual(balance_res['events'], [{
+            'contract': 'currency',
+            'event': 'StreamBalanceCompact',
+            'signer': 'janine',
+            'caller': 'janine',
+            'data_indexed': {'stream': 1},
+            'data': {'amount': 31536000}
+        }])
+        self.assertEqual(finalize_res['events'], [{
+            'contract': 'currency',
+            'event': 'StreamFinalizedCompact',
+            'signer': 'janine',
+            'caller': 'janine',
+            'data_indexed': {'stream': 1},
+            'data': {'time': 1704067200}
+        }])
+
+    def test_stream_events_mode_is_validated(self):
+        # GIVEN an unknown stream event mode
+        # WHEN the operator tries to set it
+        # THEN it should be rejected
+        with self.assertRaises(AssertionError):
+            self.currency.change_metadata(key="stream_events", value="verbose", signer="sys")
+        self.assertEqual(self.currency.metadata["stream_events"], "full")
+
+    def test_sequential_stream_ids(self):
+        # GIVEN sequential stream ids are enabled
+        self.currency.change_metadata(key="stream_ids", value="sequential", signer="sys")
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2024, month=1, day=1, hour=0, minute=0)
+        self.currency.balances[sender] = (closes - begins).seconds * 2
+
+        # WHEN two streams with identical parameters are created
+        first_id = self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+        second_id = self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # THEN both should exist under short sequential ids and be balanceable
+        self.assertEqual(first_id, '1')
+        self.assertEqual(second_id, '2')
+        self.assertEqual(self.currency.streams['2', 'status'], 'active')
+        self.assertIsNone(self.currency.streams['2', 'seq'])
+        self.currency.balance_stream(stream_id=second_id, signer=receiver, environment={"now": closes})
+        self.assertEqual(self.currency.streams['2', 'claimed'], (closes - begins).seconds)
+        self.assertEqual(self.currency.streams['1', 'claimed'], 0)
+
+    def test_sequential_stream_ids_with_hash_alias(self):
+        # GIVEN sequential stream ids with hash aliases
+        self.currency.change_metadata(key="stream_ids", value="sequential", signer="sys")
+        self.currency.change_metadata(key="stream_aliases", value=True, signer="sys")
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2024, month=1, day=1, hour=0, minute=0)
+
+        # WHEN a stream is created
+        stream_id = self.currency.create_stream(receiver='bob', rate=1, begins=str(begins), closes=str(closes), signer='alice')
+
+        # THEN the hash-derived id should resolve to the sequential id
+        alias = sha3(f"alice:bob:{begins}:{closes}:1")
+        self.assertEqual(self.currency.resolve_stream(stream_id=alias), stream_id)
+        self.assertEqual(self.currency.resolve_stream(stream_id=stream_id), stream_id)
+
+    def test_prune_stream_removes_alias(self):
+        # GIVEN two identical sequential streams with hash aliases, the first one forfeited
+        self.currency.change_metadata(key="stream_ids", value="sequential", signer="sys")
+        self.currency.change_metadata(key="stream_aliases", value=True, signer="sys")
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2024, month=1, day=1, hour=0, minute=0)
+        alias = sha3(f"alice:bob:{begins}:{closes}:1")
+        first_id = self.currency.create_stream(receiver='bob', rate=1, begins=str(begins), closes=str(closes), signer='alice')
+        self.currency.forfeit_stream(stream_id=first_id, signer='bob')
+
+        # WHEN the forfeited stream is pruned
+        self.currency.prune_streams(stream_ids=[first_id], signer='anyone')
+
+        # THEN its alias should be gone
+        self.assertIsNone(self.currency.stream_aliases[alias])
+        self.assertEqual(self.currency.resolve_stream(stream_id=alias), alias)
+
+        # AND pruning an older stream should keep an alias that points to a newer one
+        second_id = self.currency.create_stream(receiver='bob', rate=1, begins=str(begins), closes=str(closes), signer='alice')
+        third_id = self.currency.create_stream(receiver='bob', rate=1, begins=str(begins), closes=str(closes), signer='alice')
+        self.currency.forfeit_stream(stream_id=second_id, signer='bob')
+        self.currency.prune_streams(stream_ids=[second_id], signer='anyone')
+        self.assertEqual(self.currency.resolve_stream(stream_id=alias), third_id)
+
+    def test_create_streams_batch(self):
+        # GIVEN a payroll of streams sharing the same time window
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=2, day=1, hour=0, minute=0)
+        payroll = [
+            ['bob', 1, str(begins), str(closes)],
+            ['carol', 2, str(begins), str(closes)],
+            ['dave', 3, str(begins), '2023-03-01 00:00:00'],
+        ]
+
+        # WHEN they are created in one transaction
+        result = self.currency.create_streams(new_streams=payroll, signer='alice', return_full_output=True)
+
+        # THEN every stream should exist with one StreamCreated event each
+        stream_ids = result['result']
+        self.assertEqual(len(stream_ids), 3)
+        self.assertEqual([e['event'] for e in result['events']], ['StreamCreated'] * 3)
+        for stream_id, (receiver, rate, _, _) in zip(stream_ids, payroll):
+            self.assertEqual(self.currency.streams[stream_id, 'sender'], 'alice')
+            self.assertEqual(self.currency.streams[stream_id, 'receiver'], receiver)
+            self.assertEqual(self.currency.streams[stream_id, 'rate'], rate)
+            self.assertEqual(self.currency.streams[stream_id, 'begins'], begins)
+        self.assertEqual(self.currency.streams[stream_ids[2], 'closes'], Datetime(year=2023, month=3, day=1))
+
+    def test_create_streams_is_atomic(self):
+        # GIVEN a batch where the last stream is invalid
+        payroll = [
+            ['bob', 1, '2023-01-01 00:00:00', '2023-02-01 00:00:00'],
+            ['carol', -1, '2023-01-01 00:00:00', '2023-02-01 00:00:00'],
+        ]
+        # WHEN the batch is submitted
+        # THEN it should fail and no stream should be created
+        with self.assertRaises(AssertionError):
+            self.currency.create_streams(new_streams=payroll, signer='alice')
+        self.assertEqual(self.currency.stream_count.get(), 0)
+
+    def test_escrowed_stream_pays_out_after_sender_drains_balance(self):
+        # GIVEN an escrowed stream funded for its whole duration
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        deposit = (closes - begins).seconds
+        self.currency.balances[sender] = deposit + 100
+        stream_id = self.currency.create_escrowed_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+        self.assertEqual(self.currency.streams[stream_id, 'escrow'], deposit)
+        self.assertEqual(self.currency.balances[sender], 100)
+
+        # WHEN the sender spends the rest of their balance and the receiver settles once at the end
+        self.currency.transfer(amount=100, to='someone_else', signer=sender)
+        self.currency.balance_finalize(stream_id=stream_id, signer=receiver, environment={"now": closes})
+
+        # THEN the receiver should be paid in full from escrow
+        self.assertEqual(self.currency.balances[receiver], deposit)
+        self.assertEqual(self.currency.streams[stream_id, 'escrow'], 0)
+        self.assertEqual(self.currency.streams[stream_id, 'status'], 'finalized')
+
+    def test_escrowed_stream_refunds_on_early_close(self):
+        # GIVEN an escrowed stream
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        halfway = Datetime(year=2023, month=1, day=1, hour=12, minute=0)
+        deposit = (closes - begins).seconds
+        self.currency.balances[sender] = deposit
+        stream_id = self.currency.create_escrowed_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the sender closes, balances and finalizes it halfway through
+        self.currency.close_balance_finalize(stream_id=stream_id, signer=sender, environment={"now": halfway})
+
+        # THEN the unused half should be refunded to the sender
+        self.assertEqual(self.currency.balances[receiver], deposit / 2)
+        self.assertEqual(self.currency.balances[sender], deposit / 2)
+        self.assertEqual(self.currency.streams[stream_id, 'escrow'], 0)
+
+    def test_escrowed_stream_extension_tops_up_escrow(self):
+        # GIVEN an escrowed stream
+        sender = 'mary'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        new_closes = Datetime(year=2023, month=1, day=3, hour=0, minute=0)
+        deposit = (closes - begins).seconds
+        self.currency.balances[sender] = deposit * 2
+        stream_id = self.currency.create_escrowed_stream(receiver='janine', rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the close time is extended by a day
+        self.currency.change_close_time(stream_id=stream_id, new_close_time=str(new_closes), signer=sender, environment={"now": begins})
+
+        # THEN the extra day should be escrowed from the sender
+        self.assertEqual(self.currency.streams[stream_id, 'escrow'], deposit * 2)
+        self.assertEqual(self.currency.balances[sender], 0)
+
+    def test_escrowed_stream_refunds_on_forfeit(self):
+        # GIVEN an escrowed stream
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        deposit = (closes - begins).seconds
+        self.currency.balances[sender] = deposit
+        stream_id = self.currency.create_escrowed_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the receiver forfeits it
+        self.currency.forfeit_stream(stream_id=stream_id, signer=receiver, environment={"now": begins})
+
+        # THEN the escrow should go back to the sender
+        self.assertEqual(self.currency.balances[sender], deposit)
+        self.assertEqual(self.currency.streams[stream_id, 'escrow'], 0)
+
+    def test_escrowed_stream_requires_funds(self):
+        # GIVEN a sender without enough balance to escrow the stream
+        self.currency.balances['mary'] = 10
+        # WHEN / THEN creating an escrowed stream should fail
+        with self.assertRaises(AssertionError) as context:
+            self.currency.create_escrowed_stream(receiver='janine', rate=1, begins='2023-01-01 00:00:00', closes='2023-01-02 00:00:00', signer='mary')
+        self.assertIn('Not enough coins to escrow', str(context.exception))
+
+    def test_claim_stream_to_another_address(self):
+        # GIVEN a stream with a full day due
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        due = (closes - begins).seconds
+        self.currency.balances[sender] = due
+        stream_id = self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the receiver claims part of it straight to a cold wallet
+        result = self.currency.claim_stream(stream_id=stream_id, amount=1000, to='cold_wallet', signer=receiver, environment={"now": closes}, return_full_output=True)
+
+        # THEN the cold wallet should be paid without touching the receiver's balance
+        self.assertEqual(self.currency.balances['cold_wallet'], 1000)
+        self.assertEqual(self.currency.balances[receiver], 0)
+        self.assertEqual(self.currency.balances[sender], due - 1000)
+        self.assertEqual(self.currency.streams[stream_id, 'claimed'], 1000)
+        self.assertEqual(result['events'][0]['event'], 'StreamClaim')
+        self.assertEqual(result['events'][0]['data'], {'amount': 1000, 'to': 'cold_wallet'})
+
+    def test_claim_stream_cannot_exceed_amount_due(self):
+        # GIVEN a stream with a day due
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        due = (closes - begins).seconds
+        self.currency.balances[sender] = due * 2
+        stream_id = self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN claiming more than is due
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.claim_stream(stream_id=stream_id, amount=due + 1, to=receiver, signer=receiver, environment={"now": closes})
+
+    def test_claim_stream_only_receiver(self):
+        # GIVEN a stream
+        sender = 'mary'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        self.currency.balances[sender] = (closes - begins).seconds
+        stream_id = self.currency.create_stream(receiver='janine', rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the sender tries to claim
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.claim_stream(stream_id=stream_id, amount=10, to=sender, signer=sender, environment={"now": closes})
+
+    def test_transfer_stream(self):
+        # GIVEN a stream with a day due
+        sender = 'mary'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        self.currency.balances[sender] = (closes - begins).seconds
+        stream_id = self.currency.create_stream(receiver='janine', rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the receiver transfers it to a new address
+        result = self.currency.transfer_stream(stream_id=stream_id, new_receiver='janine_new', signer='janine', return_full_output=True)
+
+        # THEN the new receiver should own the stream, its index and the balance due
+        self.assertEqual(self.currency.streams[stream_id, 'receiver'], 'janine_new')
+        self.assertEqual(self.currency.stream_index['janine_new', 'receiver'], 1)
+        self.assertEqual(self.currency.stream_index['janine_new', 'receiver', 0], stream_id)
+        self.assertEqual(result['events'][0]['event'], 'StreamTransfer')
+        self.assertEqual(result['events'][0]['data_indexed'], {'from': 'janine', 'to': 'janine_new', 'stream_id': stream_id})
+
+        with self.assertRaises(AssertionError):
+            self.currency.balance_stream(stream_id=stream_id, signer='janine', environment={"now": closes})
+        self.currency.balance_stream(stream_id=stream_id, signer='janine_new', environment={"now": closes})
+        self.assertEqual(self.currency.balances['janine_new'], (closes - begins).seconds)
+
+    def test_transfer_stream_only_receiver(self):
+        # GIVEN a stream
+        stream_id = self.currency.create_stream(receiver='janine', rate=1, begins='2023-01-01 00:00:00', closes='2023-01-02 00:00:00', signer='mary')
+        # WHEN the sender tries to move it
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.transfer_stream(stream_id=stream_id, new_receiver='mary', signer='mary')
+
+    def test_change_rate_checkpoints_accrued_amount(self):
+        # GIVEN a two day stream at rate 1
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        halfway = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=3, hour=0, minute=0)
+        day = (halfway - begins).seconds
+        self.currency.balances[sender] = day * 3
+        stream_id = self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the sender doubles the rate after the first day
+        self.currency.change_rate(stream_id=stream_id, new_rate=2, signer=sender, environment={"now": halfway})
+
+        # THEN the first day is checkpointed and the second day accrues at the new rate
+        self.assertEqual(self.currency.streams[stream_id, 'accrued'], day)
+        self.assertEqual(self.currency.streams[stream_id, 'accrued_at'], halfway)
+        self.assertEqual(self.currency.streams[stream_id, 'rate'], 2)
+        # AND the stream keeps its original start
+        self.assertEqual(self.currency.streams[stream_id, 'begins'], begins)
+        record = self.currency.get_stream(stream_id=stream_id, environment={"now": halfway})
+        self.assertEqual(record["begins"], str(begins))
+        self.assertEqual(record["accrued_at"], str(halfway))
+        self.currency.balance_finalize(stream_id=stream_id, signer=receiver, environment={"now": closes})
+        self.assertEqual(self.currency.balances[receiver], day * 3)
+        self.assertEqual(self.currency.streams[stream_id, 'status'], 'finalized')
+
+    def test_change_rate_on_escrowed_stream_adjusts_escrow(self):
+        # GIVEN an escrowed two day stream at rate 2
+        sender = 'mary'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        halfway = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=3, hour=0, minute=0)
+        day = (halfway - begins).seconds
+        self.currency.balances[sender] = day * 4
+        stream_id = self.currency.create_escrowed_stream(receiver='janine', rate=2, begins=str(begins), closes=str(closes), signer=sender)
+
+        # WHEN the rate is cut to 1 after the first day
+        self.currency.change_rate(stream_id=stream_id, new_rate=1, signer=sender, environment={"now": halfway})
+
+        # THEN the escrow covers the first day at 2 and the second at 1, and the rest is refunded
+        self.assertEqual(self.currency.streams[stream_id, 'escrow'], day * 3)
+        self.assertEqual(self.currency.balances[sender], day)
+
+    def test_change_rate_only_sender(self):
+        # GIVEN a stream
+        stream_id = self.currency.create_stream(receiver='janine', rate=1, begins='2023-01-01 00:00:00', closes='2023-01-03 00:00:00', signer='mary')
+        # WHEN the receiver tries to raise the rate
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.change_rate(stream_id=stream_id, new_rate=5, signer='janine', environment={"now": Datetime(year=2023, month=1, day=2)})
+
+    def test_prune_streams(self):
+        # GIVEN a finalized stream and a forfeited stream
+        sender = 'mary'
+        receiver = 'janine'
+        begins = Datetime(year=2023, month=1, day=1, hour=0, minute=0)
+        closes = Datetime(year=2023, month=1, day=2, hour=0, minute=0)
+        self.currency.balances[sender] = (closes - begins).seconds
+        finalized_id = self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+        self.currency.balance_finalize(stream_id=finalized_id, signer=receiver, environment={"now": closes})
+        forfeited_id = self.currency.create_stream(receiver=receiver, rate=2, begins=str(begins), closes=str(closes), signer=sender)
+        self.currency.forfeit_stream(stream_id=forfeited_id, signer=receiver)
+
+        # WHEN they are pruned in bulk
+        self.currency.prune_streams(stream_ids=[finalized_id, forfeited_id], signer='anyone')
+
+        # THEN only the status tombstones should remain
+        for stream_id, status in [(finalized_id, 'finalized'), (forfeited_id, 'forfeit')]:
+            self.assertEqual(self.currency.streams[stream_id, 'status'], status)
+            for key in ['sender', 'receiver', 'begins', 'closes', 'rate', 'claimed', 'seq']:
+                self.assertIsNone(self.currency.streams[stream_id, key])
+
+        # AND the hash-derived id cannot be reused
+        with self.assertRaises(AssertionError):
+            self.currency.create_stream(receiver=receiver, rate=1, begins=str(begins), closes=str(closes), signer=sender)
+
+    def test_prune_streams_rejects_active_streams(self):
+        # GIVEN an active stream
+        stream_id = self.currency.create_stream(receiver='janine', rate=1, begins='2023-01-01 00:00:00', closes='2023-01-02 00:00:00', signer='mary')
+        # WHEN / THEN pruning it should fail and leave it intact
+        with self.assertRaises(AssertionError):
+            self.currency.prune_streams(stream_ids=[stream_id], signer='anyone')
+        self.assertEqual(self.currency.streams[stream_id, 'receiver'], 'janine')
+
+    def test_prune_permits(self):
+        # GIVEN a used permit
+        wallet = Wallet('ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8')
+        deadline = Datetime(year=2030, month=1, day=1)
+        msg = self.construct_permit_msg(wallet.public_key, "some_spender", 100, deadline)
+        permit_hash = self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg), environment={"now": Datetime(year=2029, month=1, day=1)})
+
+        # WHEN pruning it before its deadline
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.prune_permits(permit_hashes=[permit_hash], signer="anyone", environment={"now": Datetime(year=2029, month=6, day=1)})
+
+        # WHEN pruning it after its deadline
+        self.currency.prune_permits(permit_hashes=[permit_hash], signer="anyone", environment={"now": Datetime(year=2030, month=6, day=1)})
+
+        # THEN the marker should be gone and the permit still be rejected by its deadline
+        self.assertIsNone(self.currency.permits[permit_hash])
+        with self.assertRaises(AssertionError) as context:
+            self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg), environment={"now": Datetime(year=2030, month=6, day=1)})
+        self.assertIn('Permit has expired', str(context.exception))
+
+    def test_prune_permits_rejects_legacy_markers(self):
+        # GIVEN a permit recorded before deadlines were stored
+        self.currency.permits["legacy_hash"] = True
+
+        # WHEN pruning it
+        # THEN it should be rejected with a clear message and kept
+        with self.assertRaises(AssertionError) as context:
+            self.currency.prune_permits(permit_hashes=["legacy_hash"], signer="anyone", environment={"now": Datetime(year=2030, month=6, day=1)})
+        self.assertIn("without a deadline", str(context.exception))
+        self.assertTrue(self.currency.permits["legacy_hash"])
+
+    def test_structured_permit(self):
+        # GIVEN a permit signed over the structured encoding
+        wallet = Wallet('ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8')
+        deadline = Datetime(year=2030, month=1, day=1)
+        env = {"now": Datetime(year=2029, month=1, day=1)}
+        msg = self.construct_structured_permit_msg(wallet.public_key, "some_spender", 100, deadline)
+
+        # WHEN it is submitted in structured mode
+        permit_hash = self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True, environment=env)
+
+        # THEN the allowance should be set and the structured message be marked as used
+        self.assertEqual(permit_hash, sha3(msg))
+        self.assertEqual(self.currency.balances[wallet.public_key, "some_spender"], 100)
+        self.assertEqual(self.currency.permits[permit_hash], deadline)
+
+    def test_structured_permit_rejects_legacy_signature(self):
+        # GIVEN a permit signed over the legacy encoding
+        wallet = Wallet('ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8')
+        deadline = Datetime(year=2030, month=1, day=1)
+        msg = self.construct_permit_msg(wallet.public_key, "some_spender", 100, deadline)
+
+        # WHEN it is submitted in structured mode
+        # THEN the signature should not verify
+        with self.assertRaises(AssertionError) as context:
+            self.currency.permit(owner=wallet.public_key, spender="some_spender", value=100, deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True, environment={"now": Datetime(year=2029, month=1, day=1)})
+        self.assertIn("Invalid signature", str(context.exception))
+
+    def test_structured_permit_amounts_are_fixed_point(self):
+        # GIVEN permits signed over fixed-point amounts
+        wallet = Wallet('ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8')
+        deadline = Datetime(year=2030, month=1, day=1)
+        env = {"now": Datetime(year=2029, month=1, day=1)}
+
+        for i, (value, encoded) in enumerate([(1.5e20, "150000000000000000000"), (1.5e2, "150"), (2.5e-10, "0.00000000025"), (1.0e10, "10000000000")]):
+            msg = self.construct_structured_permit_msg(wallet.public_key, f"spender_{i}", encoded, deadline)
+
+            # WHEN they are submitted with the amount in exponent form
+            permit_hash = self.currency.permit(owner=wallet.public_key, spender=f"spender_{i}", value=value, deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True, environment=env)
+
+            # THEN they should verify
+            self.assertEqual(permit_hash, sha3(msg))
+
+        # AND a permit signed for 150 should not authorize 1.5E+20
+        msg = self.construct_structured_permit_msg(wallet.public_key, "other_spender", "150", deadline)
+        with self.assertRaises(AssertionError) as context:
+            self.currency.permit(owner=wallet.public_key, spender="other_spender", value=1.5e20, deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True, environment=env)
+        self.assertIn("Invalid signature", str(context.exception))
+
+    def test_create_stream_from_structured_permit(self):
+        # GIVEN a stream permit signed over the structured encoding
+        wallet = Wallet('ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8')
+        begins = Datetime(year=2023, month=1, day=1)
+        closes = Datetime(year=2023, month=1, day=10)
+        deadline = Datetime(year=2023, month=1, day=11)
+        env = {"now": Datetime(year=2023, month=1, day=3), "chain_id": self.chain_id}
+        msg = self.construct_structured_stream_permit_msg(wallet.public_key, "bob", 1, begins, closes, deadline)
+
+        # WHEN the stream is created from it
+        stream_id = self.currency.create_stream_from_permit(sender=wallet.public_key, receiver="bob", rate=1, begins=str(begins), closes=str(closes), deadline=str(deadline), signature=wallet.sign_msg(msg), structured=True, environment=env)
+
+        # THEN the stream should exist and the permit be consumed
+        self.assertEqual(self.currency.streams[stream_id, "receiver"], "bob")
+        self.assertEqual(self.currency.permits[sha3(msg)], deadline)
+
+        # AND the same permit in legacy mode should not verify
+        with self.assertRaises(AssertionError):
+            self.currency.create_stream_from_permit(sender=wallet.public_key, receiver="bob", rate=1, begins=str(begins), closes=str(closes), deadline=str(deadline), signature=wallet.sign_msg(msg), environment=env)
+
+    def test_integer_units_stream(self):
+        # GIVEN a token deployed with 8 decimals and a stream of 3 base units per second
+        self.currency = self.deploy(decimals=8)
+        begins = Datetime(year=2023, month=1, day=1)
+        closes = Datetime(year=2023, month=1, day=2)
+        stream_id = self.currency.create_stream(receiver="bob", rate=3, begins=str(begins), closes=str(closes), signer="sys")
+
+        # WHEN it is balanced 10.5 seconds in
+        self.currency.balance_stream(stream_id=stream_id, signer="bob", environment={"now": Datetime(year=2023, month=1, day=1, second=10, microsecond=500000)})
+
+        # THEN only whole seconds should have accrued, as integer base units
+        self.assertEqual(self.currency.balances["bob"], 30)
+        self.assertIsInstance(self.currency.balances["sys"], int)
+        self.assertEqual(self.currency.streams[stream_id, "claimed"], 30)
+
+    def test_integer_units_reject_fractions(self):
+        # GIVEN a token deployed with 8 decimals
+        self.currency = self.deploy(decimals=8)
+        begins = Datetime(year=2023, month=1, day=1)
+        closes = Datetime(year=2023, month=1, day=2)
+
+        # WHEN a stream is created with a fractional rate
+        # THEN it should be rejected
+        with self.assertRaises(AssertionError) as context:
+            self.currency.create_stream(receiver="bob", rate=0.5, begins=str(begins), closes=str(closes), signer="sys")
+        self.assertIn("integer base units", str(context.exception))
+
+        # AND so should fractional rate changes
+        stream_id = self.currency.create_stream(receiver="bob", rate=1, begins=str(begins), closes=str(closes), signer="sys")
+        with self.assertRaises(AssertionError):
+            self.currency.change_rate(stream_id=stream_id, new_rate=1.5, signer="sys", environment={"now": begins})
+
+    def test_get_stream(self):
+        # GIVEN a stream of 1 per second whose sender can only cover 100
+        begins = Datetime(year=2023, month=1, day=1)
+        closes = Datetime(year=2023, month=1, day=2)
+        self.currency.balances["mary"] = 100
+        stream_id = self.currency.create_stream(receiver="janine", rate=1, begins=str(begins), closes=str(closes), signer="mary")
+
+        # WHEN it is read 300 seconds in
+        record = self.currency.get_stream(stream_id=stream_id, environment={"now": Datetime(year=2023, month=1, day=1, minute=5)})
+
+        # THEN the whole record and what can be claimed now should be returned
+        self.assertEqual(record["stream_id"], stream_id)
+        self.assertEqual(record["status"], "active")
+        self.assertEqual(record["sender"], "mary")
+        self.assertEqual(record["receiver"], "janine")
+        self.assertEqual(record["begins"], str(begins))
+        self.assertEqual(record["closes"], str(closes))
+        self.assertEqual(record["rate"], 1)
+        self.assertEqual(record["claimed"], 0)
+        self.assertIsNone(record["escrow"])
+        self.assertEqual(record["outstanding"], 300)
+        self.assertEqual(record["claimable"], 100)
+
+        # AND nothing should be claimable before the stream begins
+        record = self.currency.get_stream(stream_id=stream_id, environment={"now": Datetime(year=2022, month=12, day=31)})
+        self.assertEqual(record["claimable"], 0)
+
+        with self.assertRaises(AssertionError):
+            self.currency.get_stream(stream_id="missing")
+
+    def test_streams_of(self):
+        # GIVEN three streams to janine, one of which she hands on
+        begins = Datetime(year=2023, month=1, day=1)
+        closes = Datetime(year=2023, month=1, day=2)
+        stream_ids = [
+            self.currency.create_stream(receiver="janine", rate=rate, begins=str(begins), closes=str(closes), signer="sys")
+            for rate in [1, 2, 3]
+        ]
+        self.currency.transfer_stream(stream_id=stream_ids[1], new_receiver="tom", signer="janine")
+
+        # WHEN her streams are read in pages of one
+        first = self.currency.streams_of(address="janine", role="receiver", limit=1)
+        second = self.currency.streams_of(address="janine", role="receiver", cursor=first["next_cursor"], limit=1)
+
+        # THEN only the streams she still receives should be listed
+        self.assertEqual([record["stream_id"] for record in first["streams"]], [stream_ids[0]])
+        self.assertEqual(first["next_cursor"], 1)
+        self.assertEqual([record["stream_id"] for record in second["streams"]], [stream_ids[2]])
+        self.assertIsNone(second["next_cursor"])
+
+        # AND the sender and the new receiver should see their streams
+        self.assertEqual(len(self.currency.streams_of(address="sys", role="sender")["streams"]), 3)
+        self.assertEqual(self.currency.streams_of(address="tom", role="receiver")["streams"][0]["rate"], 2)
+
+        with self.assertRaises(AssertionError):
+            self.currency.streams_of(address="janine", role="owner")
+        with self.assertRaises(AssertionError):
+            self.currency.streams_of(address="janine", role="receiver", limit=101)
+
+    def test_stream_index_has_no_duplicates(self):
+        # GIVEN two streams to alice
+        begins = Datetime(year=2023, month=1, day=1)
+        closes = Datetime(year=2023, month=1, day=2)
+        stream_ids = [
+            self.currency.create_stream(receiver="alice", rate=rate, begins=str(begins), closes=str(closes), signer="sys")
+            for rate in [1, 2]
+        ]
+
+        # WHEN the first is handed to bob and back to alice
+        self.currency.transfer_stream(stream_id=stream_ids[0], new_receiver="bob", signer="alice")
+        self.currency.transfer_stream(stream_id=stream_ids[0], new_receiver="alice", signer="bob")
+
+        # THEN each index should list every stream once
+        self.assertEqual(self.currency.stream_index["alice", "receiver"], 2)
+        listed = [record["stream_id"] for record in self.currency.streams_of(address="alice", role="receiver")["streams"]]
+        self.assertEqual(sorted(listed), sorted(stream_ids))
+        self.assertEqual(self.currency.stream_index["bob", "receiver"], 0)
+        self.assertEqual(self.currency.streams_of(address="bob", role="receiver")["streams"], [])
+
+        # AND pruned streams should leave both indexes
+        self.currency.forfeit_stream(stream_id=stream_ids[0], signer="alice", environment={"now": begins})
+        self.currency.prune_streams(stream_ids=[stream_ids[0]])
+        self.assertEqual(self.currency.stream_index["alice", "receiver"], 1)
+        self.assertEqual(self.currency.stream_index["sys", "sender"], 1)
+        self.assertEqual(self.currency.streams_of(address="sys", role="sender")["streams"][0]["stream_id"], stream_ids[1])
+
+    def test_scheduled_stream_with_cliff(self):
+        # GIVEN a stream paying 1 per second for an hour and 2 per second for the next, with a cliff after 30 minutes
+        segments = [["2023-01-01 00:00:00", 1], ["2023-01-01 01:00:00", 2]]
+        stream_id = self.currency.create_scheduled_stream(receiver="bob", segments=segments, closes="2023-01-01 02:00:00", cliff="2023-01-01 00:30:00", signer="sys")
+        self.assertEqual(self.currency.streams[stream_id, "schedule"], [[0, 1], [3600, 2]])
+
+        # WHEN it is balanced before the cliff
+        # THEN nothing should be due
+        with self.assertRaises(AssertionError):
+            self.currency.balance_stream(stream_id=stream_id, signer="bob", environment={"now": Datetime(year=2023, month=1, day=1, minute=20)})
+
+        # WHEN it is balanced halfway through the second segment
+        self.currency.balance_stream(stream_id=stream_id, signer="bob", environment={"now": Datetime(year=2023, month=1, day=1, hour=1, minute=30)})
+
+        # THEN everything earned since the start should have been paid, at each segment's rate
+        self.assertEqual(self.currency.balances["bob"], 3600 * 1 + 1800 * 2)
+        # AND get_stream should report the rate in effect, not the first segment's
+        self.assertEqual(self.currency.get_stream(stream_id=stream_id, environment={"now": Datetime(year=2023, month=1, day=1, minute=20)})["rate"], 1)
+        self.assertEqual(self.currency.get_stream(stream_id=stream_id, environment={"now": Datetime(year=2023, month=1, day=1, hour=1, minute=30)})["rate"], 2)
+
+        # AND after the close the stream should settle at the full schedule and finalize
+        closes = Datetime(year=2023, month=1, day=1, hour=2)
+        self.assertEqual(self.currency.get_stream(stream_id=stream_id, environment={"now": closes})["outstanding"], 1800 * 2)
+        self.currency.balance_finalize(stream_id=stream_id, signer="bob", environment={"now": closes})
+        self.assertEqual(self.currency.balances["bob"], 3600 * 1 + 3600 * 2)
+
+    def test_scheduled_stream_closed_before_cliff_pays_nothing(self):
+        # GIVEN an escrowed scheduled stream with a cliff
+        segments = [["2023-01-01 00:00:00", 1], ["2023-01-01 01:00:00", 2]]
+        stream_id = self.currency.create_scheduled_stream(receiver="bob", segments=segments, closes="2023-01-01 02:00:00", cliff="2023-01-01 00:30:00", escrowed=True, signer="sys")
+        self.assertEqual(self.currency.streams[stream_id, "escrow"], 3600 * 1 + 3600 * 2)
+
+        # WHEN the sender closes it before the cliff
+        now = Datetime(year=2023, month=1, day=1, minute=10)
+        self.currency.change_close_time(stream_id=stream_id, new_close_time=str(now), signer="sys", environment={"now": now})
+
+        # THEN the escrow should be refunded and the stream can be finalized without paying anything
+        self.assertEqual(self.currency.streams[stream_id, "escrow"], 0)
+        self.currency.finalize_stream(stream_id=stream_id, signer="sys", environment={"now": now})
+        self.assertEqual(self.currency.balances["bob"], 0)
+        self.assertEqual(self.currency.balances["sys"], 1_000_000)
+
+    def test_scheduled_stream_validation(self):
+        # GIVEN segments out of time order, a cliff after the close and too many segments
+        # THEN the streams should be rejected
+        with self.assertRaises(AssertionError):
+            self.currency.create_scheduled_stream(receiver="bob", segments=[["2023-01-01 01:00:00", 1], ["2023-01-01 00:00:00", 2]], closes="2023-01-02 00:00:00", signer="sys")
+        with self.assertRaises(AssertionError):
+            self.currency.create_scheduled_stream(receiver="bob", segments=[["2023-01-01 00:00:00", 1]], closes="2023-01-02 00:00:00", cliff="2023-01-03 00:00:00", signer="sys")
+        with self.assertRaises(AssertionError):
+            self.currency.create_scheduled_stream(receiver="bob", segments=[[f"2023-01-01 00:{minute:02d}:00", 1] for minute in range(17)], closes="2023-01-02 00:00:00", signer="sys")
+
+        # AND the rates of a scheduled stream cannot be changed
+        stream_id = self.currency.create_scheduled_stream(receiver="bob", segments=[["2023-01-01 00:00:00", 1]], closes="2023-01-02 00:00:00", signer="sys")
+        with self.assertRaises(AssertionError):
+            self.currency.change_rate(stream_id=stream_id, new_rate=2, signer="sys", environment={"now": Datetime(year=2023, month=1, day=1)})
+
+    def test_block_stream(self):
+        # GIVEN a stream of 5 per block from block 100 to block 200
+        stream_id = self.currency.create_block_stream(receiver="bob", rate=5, begins_block=100, closes_block=200, signer="sys")
+
+        # WHEN it is balanced before it begins
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.balance_stream(stream_id=stream_id, signer="bob", environment={"block_num": 100})
+
+        # WHEN it is balanced at block 150
+        self.currency.balance_stream(stream_id=stream_id, signer="bob", environment={"block_num": 150})
+
+        # THEN 50 blocks should have been paid
+        self.assertEqual(self.currency.balances["bob"], 250)
+        record = self.currency.get_stream(stream_id=stream_id, environment={"block_num": 170})
+        self.assertTrue(record["blocks"])
+        self.assertEqual(record["begins"], "100")
+        self.assertEqual(record["outstanding"], 100)
+
+        # WHEN the sender closes it at block 180 and it is settled later
+        self.currency.change_close_block(stream_id=stream_id, new_close_block=180, signer="sys", environment={"block_num": 170})
+        self.currency.balance_finalize(stream_id=stream_id, signer="bob", environment={"block_num": 190})
+
+        # THEN exactly the blocks up to the close should have been paid
+        self.assertEqual(self.currency.balances["bob"], 400)
+        self.assertEqual(self.currency.streams[stream_id, "status"], "finalized")
+
+    def test_block_stream_rate_change_and_forfeit(self):
+        # GIVEN an escrowed stream of 2 per block from block 0 to block 100
+        stream_id = self.currency.create_block_stream(receiver="bob", rate=2, begins_block=0, closes_block=100, escrowed=True, signer="sys")
+        self.assertEqual(self.currency.streams[stream_id, "escrow"], 200)
+
+        # WHEN the rate is raised to 3 at block 10 and bob forfeits at block 20
+        self.currency.change_rate(stream_id=stream_id, new_rate=3, signer="sys", environment={"block_num": 10})
+        self.currency.balance_stream(stream_id=stream_id, signer="bob", environment={"block_num": 20})
+        self.currency.forfeit_stream(stream_id=stream_id, signer="bob", environment={"block_num": 20})
+
+        # THEN bob should have 10 blocks at 2 and 10 at 3, and the rest of the escrow goes back
+        self.assertEqual(self.currency.balances["bob"], 50)
+        self.assertEqual(self.currency.streams[stream_id, "begins"], 0)
+        self.assertEqual(self.currency.streams[stream_id, "accrued_at"], 10)
+        self.assertEqual(self.currency.streams[stream_id, "closes"], 20)
+        self.assertEqual(self.currency.balances["sys"], 1_000_000 - 50)
+
+    def test_block_streams_close_at_blocks(self):
+        # GIVEN a block stream and a time stream
+        block_stream = self.currency.create_block_stream(receiver="bob", rate=1, begins_block=0, closes_block=100, signer="sys")
+        time_stream = self.currency.create_stream(receiver="bob", rate=1, begins="2023-01-01 00:00:00", closes="2023-01-02 00:00:00", signer="sys")
+
+        # WHEN their close is changed with the other kind of close
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.change_close_time(stream_id=block_stream, new_close_time="2023-01-01 12:00:00", signer="sys", environment={"block_num": 10})
+        with self.assertRaises(AssertionError):
+            self.currency.change_close_block(stream_id=time_stream, new_close_block=10, signer="sys", environment={"now": Datetime(year=2023, month=1, day=1)})
+
+    def test_block_stream_compact_events(self):
+        # GIVEN compact stream events are enabled
+        self.currency.change_metadata(key="stream_events", value="compact", signer="sys")
+
+        # WHEN a block stream is created, its rate changed and forfeited
+        create_res = self.currency.create_block_stream(receiver="bob", rate=2, begins_block=100, closes_block=200, signer="sys", return_full_output=True)
+        stream_id = create_res["result"]
+        rate_res = self.currency.change_rate(stream_id=stream_id, new_rate=3, signer="sys", environment={"block_num": 150}, return_full_output=True)
+        forfeit_res = self.currency.forfeit_stream(stream_id=stream_id, signer="bob", environment={"block_num": 160}, return_full_output=True)
+
+        # THEN the created event should flag the stream as a block stream
+        self.assertEqual(create_res["events"][0]["event"], "StreamCreatedCompact")
+        self.assertEqual(create_res["events"][0]["data"], {"stream_id": stream_id, "rate": 2, "begins": 100, "closes": 200, "blocks": True})
+        # AND every later event should carry block heights, not unix timestamps
+        self.assertEqual(rate_res["events"][0]["data"], {"rate": 3, "time": 150})
+        self.assertEqual(forfeit_res["events"][0]["data"], {"time": 160})
+
+    def test_block_stream_close_balance_finalize(self):
+        # GIVEN an escrowed stream of 2 per block from block 0 to block 100
+        stream_id = self.currency.create_block_stream(receiver="bob", rate=2, begins_block=0, closes_block=100, escrowed=True, signer="sys")
+
+        # WHEN the sender closes, balances and finalizes it at block 30
+        result = self.currency.close_balance_finalize(stream_id=stream_id, signer="sys", environment={"block_num": 30}, return_full_output=True)
+
+        # THEN it should close at that block, pay 30 blocks and refund the rest of the escrow
+        self.assertEqual(self.currency.streams[stream_id, "closes"], 30)
+        self.assertEqual(self.currency.streams[stream_id, "status"], "finalized")
+        self.assertEqual(self.currency.balances["bob"], 60)
+        self.assertEqual(self.currency.balances["sys"], 1_000_000 - 60)
+        self.assertEqual(result["events"][-1]["data"], {"time": "30"})
+
+    def test_block_streams_reject_booleans(self):
+        # GIVEN block heights given as booleans
+        # WHEN a block stream is created with them
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.create_block_stream(receiver="bob", rate=1, begins_block=False, closes_block=True, signer="sys")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -22,7 +22,7 @@ class TestCurrencyContract(unittest.TestCase):
         # Get the directory containing the test file
         current_dir = Path(__file__).parent
         # Navigate to the contract file in the parent directory
-        contract_path = current_dir.parent / "XSC0003.py"
+        contract_path = current_dir.parent / "XSC0004.py"
 
         with open(contract_path) as f:
             code = f.read()
@@ -36,6 +36,11 @@ class TestCurrencyContract(unittest.TestCase):
         # Called after every test, ensures each test starts with a clean slate and is isolated from others
         self.client.flush()
 
+    def deploy(self, **constructor_args):
+        with open(Path(__file__).parent.parent / "XSC0004.py") as f:
+            self.client.submit(f.read(), name="configured", constructor_args=constructor_args)
+        return self.client.get_contract("configured")
+
     def test_balance_of(self):
         # GIVEN
         receiver = 'receiver_account'
@@ -77,6 +82,40 @@ class TestCurrencyContract(unittest.TestCase):
         # THEN the metadata should be updated correctly
         self.assertEqual(new_name, "NEW TOKEN")
 
+    def test_get_metadata(self):
+        # GIVEN the seeded metadata
+        # WHEN reading all standard fields in one call
+        metadata = self.currency.get_metadata()
+        # THEN every field and the version counter should be returned
+        self.assertEqual(metadata["token_name"], "TEST TOKEN")
+        self.assertEqual(metadata["token_symbol"], "TST")
+        self.assertEqual(metadata["total_supply"], 1_000_000)
+        self.assertEqual(metadata["operator"], "sys")
+        self.assertEqual(metadata["version"], 0)
+
+    def test_change_metadata_bumps_version(self):
+        # GIVEN two metadata changes by the operator
+        self.currency.change_metadata(key="token_name", value="NEW TOKEN", signer="sys")
+        self.currency.change_metadata(key="token_symbol", value="NEW", signer="sys")
+        # WHEN reading the metadata
+        metadata = self.currency.get_metadata()
+        # THEN the version should have been bumped once per change
+        self.assertEqual(metadata["token_name"], "NEW TOKEN")
+        self.assertEqual(metadata["token_symbol"], "NEW")
+        self.assertEqual(metadata["version"], 2)
+
+    def test_change_metadata_validates_standard_keys(self):
+        # GIVEN invalid values for standard keys
+        # WHEN they are set by the operator
+        # THEN the changes should be rejected and the version left untouched
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_symbol", value=123, signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="token_name", value="", signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="total_supply", value=1, signer="sys")
+        self.assertEqual(self.currency.get_metadata()["version"], 0)
+
     def test_approve_and_allowance(self):
         # GIVEN an approval setup
         self.currency.approve(amount=500, to="eve", signer="sys")
@@ -172,6 +211,105 @@ class TestCurrencyContract(unittest.TestCase):
         with self.assertRaises(Exception):
             self.currency.burn(amount=big_amount, signer="sys")
 
+    def test_integer_units(self):
+        # GIVEN a token deployed with 8 decimals
+        self.currency = self.deploy(decimals=8)
+        # WHEN minting, burning and transferring integer base units
+        self.currency.mint(amount=250_000_000, to="alice", signer="sys")
+        self.currency.burn(amount=50_000_000, signer="alice")
+        self.currency.transfer(amount=100_000_000, to="bob", signer="alice")
+        # THEN balances and supply should stay exact integers
+        self.assertEqual(self.currency.balances["alice"], 100_000_000)
+        self.assertEqual(self.currency.balances["bob"], 100_000_000)
+        self.assertEqual(self.currency.metadata["total_supply"], 1_000_000 + 200_000_000)
+        self.assertIsInstance(self.currency.metadata["total_supply"], int)
+        self.assertEqual(self.currency.get_metadata()["decimals"], 8)
+
+    def test_integer_units_reject_fractions(self):
+        # GIVEN a token deployed with 8 decimals
+        self.currency = self.deploy(decimals=8)
+        # WHEN amounts with a fractional part are used
+        # THEN they should be rejected
+        with self.assertRaises(Exception):
+            self.currency.mint(amount=0.5, to="alice", signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.burn(amount=1.5, signer="sys")
+        with self.assertRaises(Exception):
+            self.currency.transfer(amount=1.5, to="bob", signer="sys")
+        # AND decimals cannot be changed after deployment
+        with self.assertRaises(Exception):
+            self.currency.change_metadata(key="decimals", value=6, signer="sys")
+
+    def test_balance_at(self):
+        # GIVEN a token deployed with checkpoints and bob's balance changing over time
+        currency = self.deploy(enable_checkpoints=True)
+        currency.transfer(amount=100, to="bob", signer="sys", environment={"now": Datetime(year=2100, month=1, day=1)})
+        currency.approve(amount=100, to="sys", signer="bob")
+        currency.transfer_from(amount=40, to="carl", main_account="bob", signer="sys", environment={"now": Datetime(year=2100, month=2, day=1)})
+        currency.burn(amount=10, signer="bob", environment={"now": Datetime(year=2100, month=3, day=1)})
+        # WHEN querying bob's historical balances
+        # THEN each query should return the balance at that time
+        self.assertEqual(currency.balance_at(address="bob", time="2099-12-31 00:00:00"), 0)
+        self.assertEqual(currency.balance_at(address="bob", time="2100-01-20 00:00:00"), 100)
+        self.assertEqual(currency.balance_at(address="bob", time="2100-02-20 00:00:00"), 60)
+        self.assertEqual(currency.balance_at(address="bob", time="2100-03-01 00:00:00"), 50)
+        self.assertEqual(currency.balance_at(address="sys", time="2099-12-31 00:00:00"), 1_000_000)
+
+    def test_total_supply_at(self):
+        # GIVEN a token deployed with checkpoints and the supply changing through mints and burns
+        currency = self.deploy(enable_checkpoints=True)
+        currency.mint(amount=500, to="alice", signer="sys", environment={"now": Datetime(year=2100, month=1, day=1)})
+        currency.burn(amount=200, signer="alice", environment={"now": Datetime(year=2100, month=2, day=1)})
+        # WHEN querying the historical supply
+        # THEN each query should return the supply at that time
+        self.assertEqual(currency.total_supply_at(time="2099-06-01 00:00:00"), 1_000_000)
+        self.assertEqual(currency.total_supply_at(time="2100-01-15 00:00:00"), 1_000_500)
+        self.assertEqual(currency.total_supply_at(time="2100-06-01 00:00:00"), 1_000_300)
+        self.assertEqual(currency.balance_at(address="alice", time="2100-01-15 00:00:00"), 500)
+
+    def test_no_checkpoints_before_deployment(self):
+        # GIVEN a token deployed with checkpoints
+        currency = self.deploy(enable_checkpoints=True)
+        currency.mint(amount=500, to="alice", signer="sys", environment={"now": Datetime(year=2100, month=1, day=1)})
+        # WHEN querying a time before the deployment
+        # THEN the query should be rejected instead of inventing history
+        with self.assertRaises(AssertionError):
+            currency.total_supply_at(time="1990-01-01 00:00:00")
+        with self.assertRaises(AssertionError):
+            currency.balance_at(address="sys", time="1990-01-01 00:00:00")
+
+    def test_checkpoints_cannot_be_toggled(self):
+        # GIVEN a token deployed with checkpoints
+        currency = self.deploy(enable_checkpoints=True)
+        # WHEN the operator tries to switch them off
+        # THEN the change should be rejected
+        with self.assertRaises(AssertionError):
+            currency.change_metadata(key="checkpoints", value=None, signer="sys")
+        # AND transfers keep being checkpointed
+        currency.transfer(amount=100, to="bob", signer="sys", environment={"now": Datetime(year=2100, month=1, day=1)})
+        self.assertEqual(currency.balance_at(address="bob", time="2100-01-02 00:00:00"), 100)
+
+    def test_checkpoints_are_off_by_default(self):
+        # GIVEN the default configuration
+        # WHEN minting
+        self.currency.mint(amount=500, to="alice", signer="sys")
+        # THEN no checkpoints should be written
+        self.assertEqual(self.currency.checkpoints["alice"], 0)
+        self.assertEqual(self.currency.supply_checkpoints["total_supply"], 0)
+        # AND they cannot be switched on later, which would leave a gap in the history
+        with self.assertRaises(AssertionError):
+            self.currency.change_metadata(key="checkpoints", value=True, signer="sys")
+        with self.assertRaises(AssertionError):
+            self.currency.total_supply_at(time="2100-01-01 00:00:00")
+
+    def test_transfer_from_error_reports_allowance(self):
+        # GIVEN an allowance of 50
+        self.currency.approve(amount=50, to="bob", signer="sys")
+        # WHEN spending more than the allowance
+        # THEN the error should report the allowance, not a balance
+        with self.assertRaises(AssertionError) as context:
+            self.currency.transfer_from(amount=100, to="bob", main_account="sys", signer="bob")
+        self.assertIn("You have 50 and are trying to spend 100", str(context.exception))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,220 @@
+balances = Hash(default_value=0)
+approvals = Hash(default_value=0)
+metadata = Hash()
+metadata_version = Variable()
+
+minter = Variable()
+
+# XSC005: delegates[account] is the representative `account` delegates its balance to,
+# voting_powers[representative] is the sum of the balances delegated to it
+delegates = Hash()
+voting_powers = Hash(default_value=0)
+
+
+TransferEvent = LogEvent(
+    event="Transfer",
+    params={
+        "from": {"type": str, "idx": True},
+        "to": {"type": str, "idx": True},
+        "amount": {"type": (int, float, decimal)},
+    },
+)
+ApproveEvent = LogEvent(
+    event="Approve",
+    params={
+        "from": {"type": str, "idx": True},
+        "to": {"type": str, "idx": True},
+        "amount": {"type": (int, float, decimal)},
+    },
+)
+MintEvent = LogEvent(
+    event="Mint",
+    params={
+        "to": {"type": str, "idx": True},
+        "amount": {"type": (int, float, decimal)},
+    },
+)
+BurnEvent = LogEvent(
+    event="Burn",
+    params={
+        "from": {"type": str, "idx": True},
+        "amount": {"type": (int, float, decimal)},
+    },
+)
+DelegateChangedEvent = LogEvent(
+    event="DelegateChanged",
+    params={
+        "delegator": {"type": str, "idx": True},
+        "from_delegate": {"type": str, "idx": True},
+        "to_delegate": {"type": str, "idx": True},
+    },
+)
+
+
+@construct
+def seed(decimals: int = None):
+    balances[ctx.caller] = 1_000_000
+
+    metadata["token_name"] = "TEST TOKEN"
+    metadata["token_symbol"] = "TST"
+    metadata["token_logo_url"] = "https://some.token.url/test-token.png"
+    metadata["token_website"] = "https://some.token.url"
+    metadata["total_supply"] = balances[ctx.caller]
+    metadata["operator"] = ctx.caller
+    # The token's decimals (e.g. 8) to keep every amount in integer base units, or None for floats
+    assert decimals is None or (isinstance(decimals, int) and not isinstance(decimals, bool) and decimals >= 0), "Decimals must be a non-negative integer."
+    metadata["decimals"] = decimals
+
+    metadata_version.set(0)
+
+    minter.set(ctx.caller)
+
+
+# xsc-core: begin (generated from xsc_tools/core.py, do not edit by hand)
+@export
+def change_metadata(key: str, value: Any):
+    assert ctx.caller == metadata["operator"], "Only operator can set metadata."
+    validate_metadata(key, value)
+
+    metadata[key] = value
+    metadata_version.set(metadata_version.get() + 1)
+
+
+@export
+def get_metadata():
+    return {
+        "token_name": metadata["token_name"],
+        "token_symbol": metadata["token_symbol"],
+        "token_logo_url": metadata["token_logo_url"],
+        "token_website": metadata["token_website"],
+        "total_supply": metadata["total_supply"],
+        "operator": metadata["operator"],
+        "decimals": metadata["decimals"],
+        "version": metadata_version.get(),
+    }
+
+
+@export
+def transfer(amount: float, to: str):
+    validate_amount(amount, metadata["decimals"])
+    assert amount > 0, "Cannot send negative balances."
+    assert balances[ctx.caller] >= amount, "Not enough coins to send."
+
+    balances[ctx.caller] -= amount
+    balances[to] += amount
+    move_voting_power(delegates[ctx.caller], delegates[to], amount)
+
+    TransferEvent({"from": ctx.caller, "to": to, "amount": amount})
+
+
+@export
+def approve(amount: float, to: str):
+    validate_amount(amount, metadata["decimals"])
+    assert amount >= 0, "Cannot approve negative balances."
+    approvals[ctx.caller, to] = amount
+
+    ApproveEvent({"from": ctx.caller, "to": to, "amount": amount})
+
+
+@export
+def transfer_from(amount: float, to: str, main_account: str):
+    validate_amount(amount, metadata["decimals"])
+    assert amount > 0, "Cannot send negative balances."
+    assert (
+        approvals[main_account, ctx.caller] >= amount
+    ), f"Not enough coins approved to send. You have {approvals[main_account, ctx.caller]} and are trying to spend {amount}"
+    assert balances[main_account] >= amount, "Not enough coins to send."
+
+    approvals[main_account, ctx.caller] -= amount
+    balances[main_account] -= amount
+    balances[to] += amount
+    move_voting_power(delegates[main_account], delegates[to], amount)
+
+    TransferEvent({"from": main_account, "to": to, "amount": amount})
+
+
+@export
+def balance_of(address: str):
+    return balances[address]
+# xsc-core: end
+
+
+@export
+def change_minter(new_minter: str):
+    assert ctx.caller == minter.get(), "Only minter can change minter."
+    minter.set(new_minter)
+
+
+@export
+def mint(amount: float, to: str):
+    assert ctx.caller == minter.get(), "Only minter can mint tokens."
+    validate_amount(amount, metadata["decimals"])
+    assert amount > 0, "Cannot mint negative balances."
+
+    balances[to] += amount
+    metadata["total_supply"] += amount
+    move_voting_power(None, delegates[to], amount)
+
+    MintEvent({"to": to, "amount": amount})
+
+
+@export
+def burn(amount: float):
+    validate_amount(amount, metadata["decimals"])
+    assert amount > 0, "Cannot burn negative balances."
+    assert balances[ctx.caller] >= amount, "Not enough coins to burn."
+
+    balances[ctx.caller] -= amount
+    metadata["total_supply"] -= amount
+    move_voting_power(delegates[ctx.caller], None, amount)
+
+    BurnEvent({"from": ctx.caller, "amount": amount})
+
+
+# XSC005 / Delegation
+
+# Delegates the caller's whole balance, now and in the future, to `to`
+# Delegate to yourself to vote with your own balance, or to "" to stop delegating
+@export
+def delegate(to: str):
+    previous = delegates[ctx.caller]
+    new = to if to != "" else None
+
+    assert previous != new, "Already delegating to this account."
+
+    delegates[ctx.caller] = new
+    move_voting_power(previous, new, balances[ctx.caller])
+
+    DelegateChangedEvent({"delegator": ctx.caller, "from_delegate": previous or "", "to_delegate": to})
+
+
+# Sum of the balances delegated to `address`, kept up to date on every balance change
+@export
+def voting_power(address: str):
+    return voting_powers[address]
+
+
+def move_voting_power(from_delegate: str, to_delegate: str, amount: float):
+    if from_delegate == to_delegate or amount == 0:
+        return
+
+    if from_delegate is not None:
+        voting_powers[from_delegate] -= amount
+    if to_delegate is not None:
+        voting_powers[to_delegate] += amount
+
+
+def validate_metadata(key: str, value: Any):
+    assert key != "total_supply", "Total supply is managed by the contract."
+    assert key != "decimals", "Decimals are fixed at deployment."
+
+    if key in ["token_name", "token_symbol", "operator"]:
+        assert isinstance(value, str) and value != "", f"Metadata {key} must be a non-empty string."
+    elif key in ["token_logo_url", "token_website"]:
+        assert isinstance(value, str), f"Metadata {key} must be a string."
+
+
+# Integer-unit mode: with `decimals` set, amounts must be whole base units, so balances stay exact integers
+def validate_amount(amount: float, decimals: int):
+    if decimals is not None:
+        assert isinstance(amount, int) and not isinstance(amount, bool), "Amounts must be integer base units."
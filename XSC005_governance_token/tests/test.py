@@ -0,0 +1,151 @@
+import unittest
+from contracting.client import ContractingClient
+from pathlib import Path
+
+
+class TestCurrencyContract(unittest.TestCase):
+    def setUp(self):
+
+        # Called before every test, bootstraps the environment.
+        self.chain_id = "test-chain"
+        self.environment = {
+            "chain_id": self.chain_id
+        }
+
+        self.client = ContractingClient(environment=self.environment)
+        self.client.flush()
+
+        # Get the directory containing the test file
+        current_dir = Path(__file__).parent
+        # Navigate to the contract file in the parent directory
+        contract_path = current_dir.parent / "XSC0005.py"
+
+        with open(contract_path) as f:
+            code = f.read()
+            self.client.submit(code, name="currency")
+
+        self.currency = self.client.get_contract("currency")
+
+    def tearDown(self):
+        # Called after every test, ensures each test starts with a clean slate and is isolated from others
+        self.client.flush()
+
+    def test_transfer(self):
+        # GIVEN a transfer setup
+        self.currency.transfer(amount=100, to="bob", signer="sys")
+        # WHEN checking balances after transfer
+        # THEN the balances should reflect the transfer correctly
+        self.assertEqual(self.currency.balances["bob"], 100)
+        self.assertEqual(self.currency.balances["sys"], 999_900)
+
+    def test_transfer_from_with_approval(self):
+        # GIVEN a setup with approval
+        self.currency.approve(amount=200, to="bob", signer="sys")
+        # WHEN transferring with approval
+        self.currency.transfer_from(amount=100, to="bob", main_account="sys", signer="bob")
+        # THEN the balances and allowance should reflect the transfer
+        self.assertEqual(self.currency.balances["bob"], 100)
+        self.assertEqual(self.currency.approvals["sys", "bob"], 100)
+
+    def test_transfer_from_error_reports_allowance(self):
+        # GIVEN an allowance of 50
+        self.currency.approve(amount=50, to="bob", signer="sys")
+        # WHEN spending more than the allowance
+        # THEN the error should report the allowance
+        with self.assertRaises(AssertionError) as context:
+            self.currency.transfer_from(amount=100, to="bob", main_account="sys", signer="bob")
+        self.assertIn("You have 50", str(context.exception))
+
+    def test_mint_and_burn(self):
+        # GIVEN the default minter is 'sys'
+        # WHEN minting to alice and alice burning part of it
+        self.currency.mint(amount=500, to="alice", signer="sys")
+        self.currency.burn(amount=200, signer="alice")
+        # THEN balances and total supply should reflect both
+        self.assertEqual(self.currency.balances["alice"], 300)
+        self.assertEqual(self.currency.metadata["total_supply"], 1_000_300)
+
+    def test_mint_not_authorized(self):
+        with self.assertRaises(Exception):
+            self.currency.mint(amount=500, to="bob", signer="bob")
+
+    def test_no_voting_power_without_delegation(self):
+        # GIVEN sys holds coins but has not delegated
+        # WHEN reading voting power
+        # THEN it should be zero
+        self.assertEqual(self.currency.voting_power(address="sys"), 0)
+
+    def test_delegate_to_self(self):
+        # GIVEN sys delegates to itself
+        self.currency.delegate(to="sys", signer="sys")
+        # WHEN reading voting power
+        # THEN it should equal sys's balance
+        self.assertEqual(self.currency.voting_power(address="sys"), 1_000_000)
+        self.assertEqual(self.currency.delegates["sys"], "sys")
+
+    def test_delegate_emits_event(self):
+        # GIVEN sys delegates to bob
+        response = self.currency.delegate(to="bob", signer="sys", return_full_output=True)
+        # THEN a DelegateChanged event should be emitted
+        event = response["events"][0]
+        self.assertEqual(event["event"], "DelegateChanged")
+        self.assertEqual(event["data_indexed"], {"delegator": "sys", "from_delegate": "", "to_delegate": "bob"})
+
+    def test_transfer_moves_voting_power(self):
+        # GIVEN sys delegates to rep_a and bob delegates to rep_b
+        self.currency.delegate(to="rep_a", signer="sys")
+        self.currency.delegate(to="rep_b", signer="bob")
+        # WHEN sys transfers to bob, directly and through an allowance
+        self.currency.transfer(amount=100, to="bob", signer="sys")
+        self.currency.approve(amount=50, to="carl", signer="sys")
+        self.currency.transfer_from(amount=50, to="bob", main_account="sys", signer="carl")
+        # THEN the power should follow the coins
+        self.assertEqual(self.currency.voting_power(address="rep_a"), 999_850)
+        self.assertEqual(self.currency.voting_power(address="rep_b"), 150)
+
+    def test_transfer_to_undelegated_account(self):
+        # GIVEN sys delegates to rep_a
+        self.currency.delegate(to="rep_a", signer="sys")
+        # WHEN sys transfers to an account that has not delegated
+        self.currency.transfer(amount=100, to="bob", signer="sys")
+        # THEN the transferred power should leave rep_a without going anywhere
+        self.assertEqual(self.currency.voting_power(address="rep_a"), 999_900)
+        self.assertEqual(self.currency.voting_power(address="bob"), 0)
+        # AND bob's coins count once bob delegates
+        self.currency.delegate(to="rep_a", signer="bob")
+        self.assertEqual(self.currency.voting_power(address="rep_a"), 1_000_000)
+
+    def test_mint_and_burn_adjust_voting_power(self):
+        # GIVEN alice delegates to rep_a
+        self.currency.delegate(to="rep_a", signer="alice")
+        # WHEN coins are minted to alice and alice burns some of them
+        self.currency.mint(amount=500, to="alice", signer="sys")
+        self.currency.burn(amount=200, signer="alice")
+        # THEN rep_a's power should track alice's balance
+        self.assertEqual(self.currency.voting_power(address="rep_a"), 300)
+
+    def test_redelegate_and_undelegate(self):
+        # GIVEN sys delegates to rep_a
+        self.currency.delegate(to="rep_a", signer="sys")
+        # WHEN sys moves the delegation to rep_b
+        self.currency.delegate(to="rep_b", signer="sys")
+        # THEN all power should move to rep_b
+        self.assertEqual(self.currency.voting_power(address="rep_a"), 0)
+        self.assertEqual(self.currency.voting_power(address="rep_b"), 1_000_000)
+        # WHEN sys stops delegating
+        self.currency.delegate(to="", signer="sys")
+        # THEN no one should hold its power
+        self.assertEqual(self.currency.voting_power(address="rep_b"), 0)
+        self.assertIsNone(self.currency.delegates["sys"])
+
+    def test_delegate_twice_to_same_account(self):
+        # GIVEN sys delegates to rep_a
+        self.currency.delegate(to="rep_a", signer="sys")
+        # WHEN delegating to rep_a again
+        # THEN it should fail
+        with self.assertRaises(AssertionError):
+            self.currency.delegate(to="rep_a", signer="sys")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+"""Off-chain tooling for the Xian standard contracts."""
@@ -0,0 +1,155 @@
+"""Deploy-cost and cold-start benchmarks for the standard contracts.
+
+For every standard this measures what a feature costs at deploy time and on the first
+call after deployment:
+
+- source size (bytes and lines) and the size of the compiled source contracting stores,
+- the size of the compiled code object (marshalled),
+- linter and compiler time,
+- `ContractingClient.submit` time (lint, compile, store and run `seed`),
+- first-call (cold) and second-call (warm) latency of `balance_of`.
+
+Run `python -m xsc_tools.bench` from the repository root. `--output FILE` appends the
+results as one JSON line per run (with the git revision), so they can be tracked over time.
+"""
+
+import argparse
+import ast
+import datetime
+import json
+import marshal
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from contracting.client import ContractingClient
+from contracting.compilation.compiler import ContractingCompiler
+from contracting.compilation.linter import Linter
+
+from xsc_tools.core import PROFILES, ROOT
+
+STANDARDS = {Path(path).stem.lower(): path for path in PROFILES}
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def measure_source(source: str, name: str) -> dict:
+    """Static measurements that do not need a client."""
+    compiler = ContractingCompiler(module_name=name)
+
+    tree = ast.parse(source)
+    violations, lint_time = timed(Linter().check, tree)
+    assert not violations, f"{name} does not lint: {violations}"
+
+    compiled_source, compile_time = timed(compiler.parse_to_code, source, lint=False)
+    code = compile(compiled_source, name, "exec")
+
+    return {
+        "source_bytes": len(source.encode()),
+        "source_lines": source.count("\n") + 1,
+        "compiled_source_bytes": len(compiled_source.encode()),
+        "code_object_bytes": len(marshal.dumps(code)),
+        "lint_seconds": lint_time,
+        "compile_seconds": compile_time,
+    }
+
+
+def measure_deploy(client: ContractingClient, source: str, name: str) -> dict:
+    """Submit `source` as `name` and time the first and second call."""
+    _, submit_time = timed(client.submit, source, name=name)
+    contract = client.get_contract(name)
+    _, first_call = timed(contract.balance_of, address="sys")
+    _, second_call = timed(contract.balance_of, address="sys")
+
+    return {"submit_seconds": submit_time, "first_call_seconds": first_call, "second_call_seconds": second_call}
+
+
+def benchmark(standards: list = None, repeat: int = 5, root: Path = ROOT) -> dict:
+    """Benchmark `standards` (names from `STANDARDS`, default all) and return the medians per standard."""
+    client = ContractingClient()
+    client.flush()
+    results = {}
+
+    try:
+        for standard in standards or list(STANDARDS):
+            source = (root / STANDARDS[standard]).read_text()
+            runs = []
+            for i in range(repeat):
+                run = measure_source(source, standard)
+                run.update(measure_deploy(client, source, f"{standard}_{i}"))
+                runs.append(run)
+            results[standard] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    finally:
+        client.flush()
+
+    return results
+
+
+def git_revision(root: Path = ROOT) -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_results(results: dict) -> str:
+    columns = [
+        ("source_bytes", "src B", "{:.0f}"),
+        ("source_lines", "lines", "{:.0f}"),
+        ("compiled_source_bytes", "stored B", "{:.0f}"),
+        ("code_object_bytes", "code B", "{:.0f}"),
+        ("lint_seconds", "lint ms", "{:.2f}"),
+        ("compile_seconds", "compile ms", "{:.2f}"),
+        ("submit_seconds", "submit ms", "{:.2f}"),
+        ("first_call_seconds", "1st call ms", "{:.3f}"),
+        ("second_call_seconds", "2nd call ms", "{:.3f}"),
+    ]
+    rows = [["standard"] + [title for _, title, _ in columns]]
+    for standard, result in results.items():
+        row = [standard]
+        for key, _, fmt in columns:
+            value = result[key] * 1000 if key.endswith("_seconds") else result[key]
+            row.append(fmt.format(value))
+        rows.append(row)
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("standards", nargs="*", help=f"standards to benchmark: {', '.join(STANDARDS)} (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per standard, the median is reported")
+    parser.add_argument("--output", type=Path, help="append the results to this JSON lines file")
+    args = parser.parse_args(argv)
+
+    unknown = sorted(set(args.standards) - set(STANDARDS))
+    if unknown:
+        parser.error(f"unknown standards: {', '.join(unknown)}")
+
+    results = benchmark(args.standards, args.repeat)
+    print(format_results(results))
+
+    if args.output:
+        record = {
+            "time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
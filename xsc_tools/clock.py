@@ -0,0 +1,171 @@
+"""Simulation clock for long-horizon tests against a local `ContractingClient`.
+
+`SimulationClock` keeps the current block time and passes it as `environment["now"]`
+to every call, so tests do not build `Datetime` objects per call. Actions are scheduled
+at a time or at a fixed interval and `run` executes them in timestamp order (actions at
+the same time run in the order they were scheduled), moving the clock to each one:
+
+    clock = SimulationClock(client, datetime.datetime(2030, 1, 1))
+    stream_id = clock.call("currency", "create_stream", signer="alice", receiver="bob", rate=1,
+                           begins="2030-01-01 00:00:00", closes="2031-01-01 00:00:00")
+    clock.balance_stream_every("currency", stream_id, "bob", datetime.timedelta(hours=24))
+    clock.forfeit_stream_at("currency", stream_id, "bob", datetime.datetime(2030, 7, 1))
+    clock.run(until=datetime.datetime(2031, 1, 1))
+
+Rejected calls (failed assertions) are recorded as outcomes and do not stop the run.
+"""
+
+import collections
+import datetime
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from contracting.client import ContractingClient
+
+from xsc_tools.times import format_time, to_datetime
+
+STREAM_ACTIVE = "active"
+
+# Returned by an action to cancel the rest of its schedule
+STOP = object()
+
+
+@dataclass(order=True)
+class Event:
+    time: datetime.datetime
+    seq: int
+    name: str = field(compare=False)
+    action: Callable = field(compare=False)
+    interval: datetime.timedelta = field(default=None, compare=False)
+    until: datetime.datetime = field(default=None, compare=False)
+
+
+@dataclass
+class Outcome:
+    time: datetime.datetime
+    name: str
+    result: object = None
+    error: str = None
+
+
+class SimulationClock:
+    def __init__(self, client: ContractingClient, start: datetime.datetime, environment: dict = None):
+        self.client = client
+        self.now = start
+        self.environment = environment or {}
+        self.queue = []
+        self.seq = itertools.count()
+        self.outcomes = []
+        self.elapsed = 0.0
+
+    # Time
+
+    def travel(self, to: datetime.datetime):
+        assert to >= self.now, "The clock cannot go back in time."
+        self.now = to
+
+    def advance(self, delta: datetime.timedelta):
+        self.travel(self.now + delta)
+
+    def call_environment(self) -> dict:
+        return dict(self.environment, now=to_datetime(self.now))
+
+    def call(self, contract, export: str, signer: str, **kwargs):
+        """Call `export` on `contract` (a name or a client contract) at the current time."""
+        if isinstance(contract, str):
+            contract = self.client.get_contract(contract)
+        return getattr(contract, export)(signer=signer, environment=self.call_environment(), **kwargs)
+
+    # Scheduling
+
+    def at(self, when: datetime.datetime, name: str, action: Callable):
+        """Run `action()` at `when`."""
+        assert when >= self.now, "Cannot schedule actions in the past."
+        heapq.heappush(self.queue, Event(when, next(self.seq), name, action))
+
+    def every(
+        self, interval: datetime.timedelta, name: str, action: Callable,
+        start: datetime.datetime = None, until: datetime.datetime = None,
+    ):
+        """Run `action()` every `interval` from `start` (default: one interval from now) until `until` (inclusive).
+
+        The schedule ends early when `action` returns `STOP`.
+        """
+        assert interval > datetime.timedelta(0), "Interval must be positive."
+        start = start or self.now + interval
+        assert start >= self.now, "Cannot schedule actions in the past."
+        heapq.heappush(self.queue, Event(start, next(self.seq), name, action, interval, until))
+
+    def schedule_call(self, when: datetime.datetime, contract, export: str, signer: str, **kwargs):
+        self.at(when, export, lambda: self.call(contract, export, signer, **kwargs))
+
+    def run(self, until: datetime.datetime = None) -> list:
+        """Run the scheduled actions up to `until` (default: all of them) in timestamp order.
+
+        Returns the outcomes of this run. The clock ends at `until` when given.
+        """
+        first = len(self.outcomes)
+        while self.queue and (until is None or self.queue[0].time <= until):
+            event = heapq.heappop(self.queue)
+            self.travel(event.time)
+
+            start = time.perf_counter()
+            try:
+                outcome = Outcome(self.now, event.name, result=event.action())
+            except AssertionError as e:
+                outcome = Outcome(self.now, event.name, error=str(e))
+            self.elapsed += time.perf_counter() - start
+
+            if outcome.result is STOP:
+                continue
+            self.outcomes.append(outcome)
+
+            if event.interval is not None:
+                next_time = event.time + event.interval
+                if event.until is None or next_time <= event.until:
+                    event.time, event.seq = next_time, next(self.seq)
+                    heapq.heappush(self.queue, event)
+
+        if until is not None and until > self.now:
+            self.travel(until)
+        return self.outcomes[first:]
+
+    def summary(self) -> dict:
+        """Number of successful and rejected actions per name."""
+        summary = collections.defaultdict(lambda: {"ok": 0, "rejected": 0})
+        for outcome in self.outcomes:
+            summary[outcome.name]["ok" if outcome.error is None else "rejected"] += 1
+        return dict(summary)
+
+    # Stream actions
+
+    def balance_stream_every(
+        self, contract, stream_id: str, signer: str, interval: datetime.timedelta,
+        start: datetime.datetime = None, until: datetime.datetime = None,
+    ):
+        """Balance `stream_id` every `interval`; stops once the stream is no longer active."""
+        if isinstance(contract, str):
+            contract = self.client.get_contract(contract)
+
+        def balance():
+            if contract.streams[stream_id, "status"] != STREAM_ACTIVE:
+                return STOP
+            return self.call(contract, "balance_stream", signer, stream_id=stream_id)
+
+        self.every(interval, "balance_stream", balance, start=start, until=until)
+
+    def change_close_time_at(
+        self, contract, stream_id: str, signer: str, when: datetime.datetime, new_close_time: datetime.datetime
+    ):
+        self.schedule_call(
+            when, contract, "change_close_time", signer, stream_id=stream_id, new_close_time=format_time(new_close_time)
+        )
+
+    def forfeit_stream_at(self, contract, stream_id: str, signer: str, when: datetime.datetime):
+        self.schedule_call(when, contract, "forfeit_stream", signer, stream_id=stream_id)
+
+    def finalize_stream_at(self, contract, stream_id: str, signer: str, when: datetime.datetime):
+        self.schedule_call(when, contract, "finalize_stream", signer, stream_id=stream_id)
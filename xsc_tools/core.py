@@ -0,0 +1,180 @@
+"""Shared core token logic for the standard contracts.
+
+Contracting has no way for one contract to reuse another contract's code on its own
+state, so the core token functions (`change_metadata`, `get_metadata`, `transfer`,
+`approve`, `transfer_from` and `balance_of`) are kept here once, as a template, and
+copied into every standard between the `xsc-core` markers. Each standard only differs
+in its `Profile`: quote style, error message punctuation, where allowances are stored
+and the hook it runs after a transfer has moved balances.
+
+Change the core in `CORE_TEMPLATE` and run `python -m xsc_tools.core --write` to update
+all standards; `python -m xsc_tools.core` (and the tests) fail when a standard drifts.
+"""
+
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BEGIN_MARKER = "# xsc-core: begin (generated from xsc_tools/core.py, do not edit by hand)"
+END_MARKER = "# xsc-core: end"
+
+CORE_TEMPLATE = '''\
+@export
+def change_metadata(key: str, value: Any):
+    assert ctx.caller == metadata[{q}operator{q}], {q}Only operator can set metadata{p}{q}
+    validate_metadata(key, value)
+
+    metadata[key] = value
+    metadata_version.set(metadata_version.get() + 1)
+
+
+@export
+def get_metadata():
+    return {{
+        {q}token_name{q}: metadata[{q}token_name{q}],
+        {q}token_symbol{q}: metadata[{q}token_symbol{q}],
+        {q}token_logo_url{q}: metadata[{q}token_logo_url{q}],
+        {q}token_website{q}: metadata[{q}token_website{q}],
+        {q}total_supply{q}: metadata[{q}total_supply{q}],
+        {q}operator{q}: metadata[{q}operator{q}],
+        {q}decimals{q}: metadata[{q}decimals{q}],
+        {q}version{q}: metadata_version.get(),
+    }}
+
+
+@export
+def transfer(amount: float, to: str):
+    validate_amount(amount, metadata[{q}decimals{q}])
+    assert amount > 0, {q}Cannot send negative balances{p}{q}
+    assert balances[ctx.caller] >= amount, {q}Not enough coins to send{p}{q}
+
+    balances[ctx.caller] -= amount
+    balances[to] += amount
+{transfer_hook}
+    TransferEvent({{"from": ctx.caller, "to": to, "amount": amount}})
+
+
+@export
+def approve(amount: float, to: str):
+    validate_amount(amount, metadata[{q}decimals{q}])
+    assert amount >= 0, {q}Cannot approve negative balances{p}{q}
+    {allowances}[ctx.caller, to] = amount
+
+    ApproveEvent({{"from": ctx.caller, "to": to, "amount": amount}})
+
+
+@export
+def transfer_from(amount: float, to: str, main_account: str):
+    validate_amount(amount, metadata[{q}decimals{q}])
+    assert amount > 0, {q}Cannot send negative balances{p}{q}
+    assert (
+        {allowances}[main_account, ctx.caller] >= amount
+    ), f{q}Not enough coins approved to send{p} You have {{{allowances}[main_account, ctx.caller]}} and are trying to spend {{amount}}{q}
+    assert balances[main_account] >= amount, {q}Not enough coins to send{p}{q}
+
+    {allowances}[main_account, ctx.caller] -= amount
+    balances[main_account] -= amount
+    balances[to] += amount
+{transfer_from_hook}
+    TransferEvent({{"from": main_account, "to": to, "amount": amount}})
+
+
+@export
+def balance_of(address: str):
+    return balances[address]
+'''
+
+
+@dataclass(frozen=True)
+class Profile:
+    """How a standard renders the core.
+
+    `transfer_hook` runs after balances have moved; `{sender}` is replaced by the
+    account the coins are taken from.
+    """
+
+    quote: str = '"'
+    punctuation: str = "."
+    allowances: str = "balances"
+    transfer_hook: str = None
+
+
+PROFILES = {
+    "XSC001_standard_token/XSC0001.py": Profile(
+        quote="'", punctuation="!", transfer_hook="write_transfer_checkpoints({sender}, to, amount)"
+    ),
+    "XSC002_permit_token/XSC0002.py": Profile(quote="'", punctuation="!"),
+    "XSC003_streaming_payments_token/XSC0003.py": Profile(),
+    "XSC004_wrapped_token/XSC0004.py": Profile(
+        allowances="approvals", transfer_hook="write_transfer_checkpoints({sender}, to, amount)"
+    ),
+    "XSC005_governance_token/XSC0005.py": Profile(
+        allowances="approvals", transfer_hook="move_voting_power(delegates[{sender}], delegates[to], amount)"
+    ),
+}
+
+
+def render_hook(profile: Profile, sender: str) -> str:
+    if profile.transfer_hook is None:
+        return ""
+    return "    " + profile.transfer_hook.format(sender=sender) + "\n"
+
+
+def render_core(profile: Profile) -> str:
+    """Return the core functions for `profile`, including the markers."""
+    core = CORE_TEMPLATE.format(
+        q=profile.quote,
+        p=profile.punctuation,
+        allowances=profile.allowances,
+        transfer_hook=render_hook(profile, "ctx.caller"),
+        transfer_from_hook=render_hook(profile, "main_account"),
+    )
+    return f"{BEGIN_MARKER}\n{core}{END_MARKER}"
+
+
+def split_core(source: str):
+    """Split a contract into (before, core, after) around the markers."""
+    begin = source.find(BEGIN_MARKER)
+    end = source.find(END_MARKER)
+    if begin == -1 or end == -1 or end < begin:
+        raise ValueError("Contract has no xsc-core section.")
+    end += len(END_MARKER)
+    return source[:begin], source[begin:end], source[end:]
+
+
+def check(root: Path = ROOT) -> list:
+    """Return the paths (relative to `root`) whose core section drifted from the template."""
+    drifted = []
+    for path, profile in PROFILES.items():
+        before, core, after = split_core((root / path).read_text())
+        if core != render_core(profile):
+            drifted.append(path)
+    return drifted
+
+
+def write(root: Path = ROOT) -> list:
+    """Rewrite drifted core sections from the template and return their paths."""
+    drifted = check(root)
+    for path in drifted:
+        before, core, after = split_core((root / path).read_text())
+        (root / path).write_text(before + render_core(PROFILES[path]) + after)
+    return drifted
+
+
+def main(argv: list = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if "--write" in argv:
+        for path in write():
+            print(f"updated {path}")
+        return 0
+
+    drifted = check()
+    for path in drifted:
+        print(f"{path}: core differs from xsc_tools/core.py, run python -m xsc_tools.core --write")
+    return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
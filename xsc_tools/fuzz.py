@@ -0,0 +1,632 @@
+"""Stateful randomized invariant testing for the standard contracts.
+
+A `Fuzzer` deploys one standard and runs a long random sequence of the exports it has
+(transfers, approvals, permits, mints, burns, delegation and stream operations) across a
+small set of accounts, advancing block time between steps. Amounts are drawn around the
+edges (0, negative, exactly the balance, one more than the balance), so many calls are
+rejected on purpose.
+
+After every step the contract is checked against a reference model and the invariants:
+
+- core calls (`transfer`, `approve`, `transfer_from`, `permit`, `mint`, `burn`) succeed
+  or fail as the model predicts,
+- every balance is exactly what the model predicts, including what streams have paid
+  and escrowed (the model keeps each stream's rate history, claims and escrow),
+- balances plus stream escrow add up to `total_supply`,
+- allowances match the model and are never negative,
+- no stream has paid more than its rate times the time it has been running, and a
+  finalized stream paid exactly that,
+- with delegation, every voting power equals the balances delegated to it.
+
+`fuzz` splits the work into runs of `steps` steps, each with its own seed and a freshly
+deployed contract, across worker processes. A failure reports the standard, seed and
+step with the last calls before it; `Fuzzer(standard, config, seed).run()` replays it.
+Run e.g. `python -m xsc_tools.fuzz --runs 1000 --steps 1000 --workers 8`.
+"""
+
+import argparse
+import collections
+import datetime
+import decimal
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
+from contracting.client import ContractingClient
+from xian_py.wallet import Wallet
+
+from xsc_tools.bench import STANDARDS
+from xsc_tools.core import PROFILES, ROOT
+from xsc_tools.load import remove_contract
+from xsc_tools.permits import PermitBuilder
+from xsc_tools.times import format_time, to_datetime
+
+MINTER = "sys"
+
+CORE_OPERATIONS = ["transfer", "approve", "transfer_from", "permit", "mint", "burn"]
+STREAM_OPERATIONS = [
+    "create_stream", "create_escrowed_stream", "balance_stream", "claim_stream", "change_rate",
+    "change_close_time", "transfer_stream", "forfeit_stream", "finalize_stream",
+]
+OPERATIONS = CORE_OPERATIONS + ["delegate"] + STREAM_OPERATIONS
+
+
+class InvariantViolation(Exception):
+    pass
+
+
+@dataclass
+class FuzzConfig:
+    steps: int = 1_000
+    accounts: int = 6
+    initial_balance: int = 1_000
+    max_step_seconds: int = 6 * 3600
+    decimals: int = None
+    start: datetime.datetime = datetime.datetime(2030, 1, 1)
+    chain_id: str = "fuzz"
+    trace: int = 20
+
+
+@dataclass
+class Failure:
+    standard: str
+    seed: int
+    step: int
+    message: str
+    trace: list
+
+
+@dataclass
+class StreamModel:
+    sender: str
+    receiver: str
+    # [start, rate] for every rate the stream has had, oldest first
+    segments: list
+    closes: datetime.datetime
+    finalized: bool = False
+    claimed: decimal.Decimal = decimal.Decimal(0)
+    # None for streams paid from the sender's balance
+    escrow: decimal.Decimal = None
+
+    def payable(self, now: datetime.datetime) -> decimal.Decimal:
+        """The most the stream may have paid by `now`: each rate times the time it was in force."""
+        end = min(now, self.closes)
+        total = decimal.Decimal(0)
+        for i, (start, rate) in enumerate(self.segments):
+            until = self.segments[i + 1][0] if i + 1 < len(self.segments) else end
+            seconds = int((min(until, end) - start).total_seconds())
+            if seconds > 0:
+                total += rate * seconds
+        return total
+
+    def due(self, now: datetime.datetime) -> decimal.Decimal:
+        return self.payable(now) - self.claimed
+
+    def required_escrow(self) -> decimal.Decimal:
+        """What the escrow has to hold: everything still owed until the close."""
+        return self.payable(self.closes) - self.claimed
+
+
+def to_decimal(value) -> decimal.Decimal:
+    """Contract values and call arguments as exact decimals (floats reach contracts as `str(value)`)."""
+    return decimal.Decimal(str(value or 0))
+
+
+def contract_exports(source: str) -> set:
+    return set(re.findall(r"^@export\s*\ndef (\w+)", source, re.MULTILINE))
+
+
+class Fuzzer:
+    def __init__(self, standard: str, config: FuzzConfig = None, seed: int = 0, client: ContractingClient = None):
+        self.standard = standard
+        self.config = config or FuzzConfig()
+        self.seed = seed
+        self.rng = random.Random(f"{standard}:{seed}")
+        self.client = client or ContractingClient()
+        self.name = f"fuzz_{standard}_{seed}"
+        self.source = (ROOT / STANDARDS[standard]).read_text()
+        self.allowance_variable = PROFILES[STANDARDS[standard]].allowances
+        exports = contract_exports(self.source)
+        self.operations = [operation for operation in OPERATIONS if operation in exports]
+        self.builder = PermitBuilder(self.name, self.config.chain_id)
+        self.trace = collections.deque(maxlen=self.config.trace)
+        self.calls = collections.Counter()
+        self.rejected = collections.Counter()
+        self.slowest = {}
+
+    def setup(self):
+        """Deploy the contract and fund the accounts (through state)."""
+        self.client.submit(
+            self.source, name=self.name, signer=MINTER, constructor_args={"decimals": self.config.decimals}
+        )
+        self.contract = self.client.get_contract(self.name)
+
+        self.wallets = {}
+        for i in range(self.config.accounts):
+            wallet = Wallet(self.rng.randbytes(32).hex())
+            self.wallets[wallet.public_key] = wallet
+            self.contract.balances[wallet.public_key] = self.config.initial_balance
+        self.contract.metadata["total_supply"] = (
+            self.contract.metadata["total_supply"] + self.config.initial_balance * self.config.accounts
+        )
+
+        self.accounts = [MINTER] + list(self.wallets)
+        self.balances = {account: to_decimal(self.contract.balances[account]) for account in self.accounts}
+        self.allowances = collections.defaultdict(decimal.Decimal)
+        self.total_supply = to_decimal(self.contract.metadata["total_supply"])
+        self.delegates = {}
+        self.streams = {}
+        self.used_permits = set()
+        self.now = self.config.start
+
+    def teardown(self):
+        remove_contract(self.client.raw_driver, self.name)
+
+    def run(self) -> dict:
+        """Run `config.steps` random steps and return the call statistics and the failure, if any."""
+        self.setup()
+        failure = None
+        step = 0
+        try:
+            for step in range(self.config.steps):
+                self.now += datetime.timedelta(seconds=self.rng.randint(0, self.config.max_step_seconds))
+                operation = self.rng.choice(self.operations)
+                getattr(self, f"step_{operation}")()
+                self.check()
+        except Exception as e:
+            message = str(e) if isinstance(e, InvariantViolation) else f"{type(e).__name__}: {e}"
+            failure = Failure(self.standard, self.seed, step, message, list(self.trace))
+        finally:
+            self.teardown()
+
+        return {
+            "standard": self.standard,
+            "seed": self.seed,
+            "steps": step + 1,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "slowest": self.slowest,
+            "failure": failure,
+        }
+
+    # Drawing arguments
+
+    def pick(self) -> str:
+        return self.rng.choice(self.accounts)
+
+    def party(self, account: str) -> str:
+        """Usually `account`, sometimes anyone, to exercise the permission checks."""
+        return account if self.rng.random() < 0.8 else self.pick()
+
+    def amount(self, available: decimal.Decimal):
+        available = int(available)
+        amount = self.rng.choice([0, -1, available, available + 1, self.rng.randint(1, max(1, available))])
+        if self.config.decimals is None and self.rng.random() < 0.2:
+            # Fractional amounts in decimal mode
+            return amount + self.rng.randint(1, 99) / 100
+        return amount
+
+    def rate(self):
+        if self.rng.random() < 0.05:
+            return self.rng.choice([0, -1])
+        if self.config.decimals is None:
+            return self.rng.randint(1, 5_000) / 1_000
+        return self.rng.randint(1, 5)
+
+    def time_from_now(self, low: int, high: int) -> datetime.datetime:
+        return self.now + datetime.timedelta(seconds=self.rng.randint(low, high))
+
+    def pick_stream(self):
+        if not self.streams:
+            return None, None
+        stream_id = self.rng.choice(list(self.streams))
+        return stream_id, self.streams[stream_id]
+
+    # Calling the contract
+
+    def call(self, signer: str, export: str, **kwargs):
+        """Call `export`; returns (succeeded, result). Assertion failures are rejections, other errors propagate."""
+        arguments = ", ".join(f"{key}={value!r}" for key, value in kwargs.items() if key != "signature")
+        self.trace.append(f"{format_time(self.now)} {signer[:8]}: {export}({arguments})")
+        self.calls[export] += 1
+
+        environment = {"now": to_datetime(self.now), "chain_id": self.config.chain_id}
+        start = time.perf_counter()
+        try:
+            result = getattr(self.contract, export)(signer=signer, environment=environment, **kwargs)
+            succeeded = True
+        except AssertionError as e:
+            self.trace[-1] += f" -> rejected: {e}"
+            self.rejected[export] += 1
+            result = None
+            succeeded = False
+
+        elapsed = time.perf_counter() - start
+        if elapsed > self.slowest.get(export, (0, None))[0]:
+            self.slowest[export] = (elapsed, self.trace[-1])
+        return succeeded, result
+
+    def expect(self, expected: bool, succeeded: bool, export: str):
+        if expected != succeeded:
+            outcome = "succeeded" if succeeded else "was rejected"
+            raise InvariantViolation(f"{export} {outcome}, the model expected the opposite")
+
+    def move(self, sender: str, receiver: str, amount: decimal.Decimal):
+        self.balances[sender] -= amount
+        self.balances[receiver] += amount
+
+    # Core steps: the model predicts the outcome
+
+    def step_transfer(self):
+        sender, to = self.pick(), self.pick()
+        amount = self.amount(self.balances[sender])
+        value = to_decimal(amount)
+        expected = value > 0 and self.balances[sender] >= value
+
+        succeeded, _ = self.call(sender, "transfer", amount=amount, to=to)
+        self.expect(expected, succeeded, "transfer")
+        if succeeded:
+            self.move(sender, to, value)
+
+    def step_approve(self):
+        owner, spender = self.pick(), self.pick()
+        amount = self.amount(self.balances[owner])
+        value = to_decimal(amount)
+
+        succeeded, _ = self.call(owner, "approve", amount=amount, to=spender)
+        self.expect(value >= 0, succeeded, "approve")
+        if succeeded:
+            self.allowances[owner, spender] = value
+
+    def step_transfer_from(self):
+        spender, owner, to = self.pick(), self.pick(), self.pick()
+        allowance = self.allowances[owner, spender]
+        amount = self.amount(self.rng.choice([allowance, self.balances[owner]]))
+        value = to_decimal(amount)
+        expected = value > 0 and allowance >= value and self.balances[owner] >= value
+
+        succeeded, _ = self.call(spender, "transfer_from", amount=amount, to=to, main_account=owner)
+        self.expect(expected, succeeded, "transfer_from")
+        if succeeded:
+            self.allowances[owner, spender] -= value
+            self.move(owner, to, value)
+
+    def step_permit(self):
+        owner = self.rng.choice(list(self.wallets))
+        spender = self.pick()
+        amount = self.amount(self.balances[owner])
+        value = to_decimal(amount)
+        deadline = self.time_from_now(-3_600, 86_400)
+        structured = self.rng.random() < 0.5
+        permit = self.builder.sign(
+            self.wallets[owner], self.builder.permit(owner, spender, amount, deadline, structured=structured)
+        )
+        key = (owner, spender, value, permit.deadline, structured)
+        expected = key not in self.used_permits and self.now < deadline and value >= 0
+
+        succeeded, _ = self.call(
+            self.pick(), "permit", owner=owner, spender=spender, value=amount, deadline=permit.deadline,
+            signature=permit.signature, structured=structured,
+        )
+        self.expect(expected, succeeded, "permit")
+        if succeeded:
+            self.allowances[owner, spender] = value
+            self.used_permits.add(key)
+
+    def step_mint(self):
+        caller, to = self.rng.choice([MINTER, self.pick()]), self.pick()
+        amount = self.amount(self.config.initial_balance)
+        value = to_decimal(amount)
+
+        succeeded, _ = self.call(caller, "mint", amount=amount, to=to)
+        self.expect(caller == MINTER and value > 0, succeeded, "mint")
+        if succeeded:
+            self.balances[to] += value
+            self.total_supply += value
+
+    def step_burn(self):
+        caller = self.pick()
+        amount = self.amount(self.balances[caller])
+        value = to_decimal(amount)
+        expected = value > 0 and self.balances[caller] >= value
+
+        succeeded, _ = self.call(caller, "burn", amount=amount)
+        self.expect(expected, succeeded, "burn")
+        if succeeded:
+            self.balances[caller] -= value
+            self.total_supply -= value
+
+    def step_delegate(self):
+        caller = self.pick()
+        to = self.rng.choice(self.accounts + [""])
+        new = to if to != "" else None
+
+        succeeded, _ = self.call(caller, "delegate", to=to)
+        self.expect(self.delegates.get(caller) != new, succeeded, "delegate")
+        if succeeded:
+            self.delegates[caller] = new
+
+    # Stream steps: the contract decides the outcome, the model predicts what streams pay and escrow
+
+    def pay_from_stream(self, stream: StreamModel, amount: decimal.Decimal, to: str):
+        if stream.escrow is None:
+            self.balances[stream.sender] -= amount
+        else:
+            stream.escrow -= amount
+        self.balances[to] += amount
+        stream.claimed += amount
+
+    def settle_escrow(self, stream: StreamModel):
+        required = stream.required_escrow()
+        self.balances[stream.sender] -= required - stream.escrow
+        stream.escrow = required
+
+    def refund_escrow(self, stream: StreamModel):
+        self.balances[stream.sender] += stream.escrow
+        stream.escrow = decimal.Decimal(0)
+
+    def step_create_stream(self, export: str = "create_stream"):
+        sender, receiver = self.pick(), self.pick()
+        begins = self.time_from_now(-3_600, 86_400)
+        closes = begins + datetime.timedelta(seconds=self.rng.randint(-3_600, 30 * 86_400))
+
+        succeeded, stream_id = self.call(
+            sender, export, receiver=receiver, rate=self.rate(), begins=format_time(begins), closes=format_time(closes)
+        )
+        if succeeded:
+            rate = to_decimal(self.contract.streams[stream_id, "rate"])
+            stream = StreamModel(sender, receiver, [[begins, rate]], closes)
+            if export == "create_escrowed_stream":
+                stream.escrow = decimal.Decimal(0)
+                self.settle_escrow(stream)
+            self.streams[stream_id] = stream
+
+    def step_create_escrowed_stream(self):
+        self.step_create_stream("create_escrowed_stream")
+
+    def step_balance_stream(self):
+        stream_id, stream = self.pick_stream()
+        if stream is None:
+            return self.step_create_stream()
+        succeeded, _ = self.call(
+            self.party(self.rng.choice([stream.sender, stream.receiver])), "balance_stream", stream_id=stream_id
+        )
+        if succeeded:
+            due = stream.due(self.now)
+            if stream.escrow is None:
+                due = min(due, self.balances[stream.sender])
+            self.pay_from_stream(stream, due, stream.receiver)
+
+    def step_claim_stream(self):
+        stream_id, stream = self.pick_stream()
+        if stream is None:
+            return self.step_create_stream()
+        amount, to = self.amount(max(stream.due(self.now), 0)), self.pick()
+        succeeded, _ = self.call(self.party(stream.receiver), "claim_stream", stream_id=stream_id, amount=amount, to=to)
+        if succeeded:
+            self.pay_from_stream(stream, to_decimal(amount), to)
+
+    def step_change_rate(self):
+        stream_id, stream = self.pick_stream()
+        if stream is None:
+            return self.step_create_stream()
+
+        succeeded, _ = self.call(self.party(stream.sender), "change_rate", stream_id=stream_id, new_rate=self.rate())
+        if succeeded:
+            rate = to_decimal(self.contract.streams[stream_id, "rate"])
+            if self.now > stream.segments[-1][0]:
+                stream.segments.append([self.now, rate])
+            else:
+                stream.segments[-1][1] = rate
+            if stream.escrow is not None:
+                self.settle_escrow(stream)
+
+    def step_change_close_time(self):
+        stream_id, stream = self.pick_stream()
+        if stream is None:
+            return self.step_create_stream()
+        new_close_time = self.time_from_now(-3_600, 30 * 86_400)
+
+        succeeded, _ = self.call(
+            self.party(stream.sender), "change_close_time", stream_id=stream_id,
+            new_close_time=format_time(new_close_time),
+        )
+        if succeeded:
+            begins = stream.segments[0][0]
+            if new_close_time <= self.now:
+                stream.closes = self.now
+            elif new_close_time < begins:
+                stream.closes = begins
+            else:
+                stream.closes = new_close_time
+            if stream.escrow is not None:
+                self.settle_escrow(stream)
+
+    def step_transfer_stream(self):
+        stream_id, stream = self.pick_stream()
+        if stream is None:
+            return self.step_create_stream()
+        new_receiver = self.pick()
+
+        succeeded, _ = self.call(
+            self.party(stream.receiver), "transfer_stream", stream_id=stream_id, new_receiver=new_receiver
+        )
+        if succeeded:
+            stream.receiver = new_receiver
+
+    def step_forfeit_stream(self):
+        stream_id, stream = self.pick_stream()
+        if stream is None:
+            return self.step_create_stream()
+
+        succeeded, _ = self.call(self.party(stream.receiver), "forfeit_stream", stream_id=stream_id)
+        if succeeded:
+            stream.closes = self.now
+            if stream.escrow is not None:
+                self.refund_escrow(stream)
+
+    def step_finalize_stream(self):
+        stream_id, stream = self.pick_stream()
+        if stream is None:
+            return self.step_create_stream()
+
+        succeeded, _ = self.call(
+            self.party(self.rng.choice([stream.sender, stream.receiver])), "finalize_stream", stream_id=stream_id
+        )
+        if succeeded:
+            stream.finalized = True
+            if stream.escrow is not None:
+                self.refund_escrow(stream)
+
+    # Invariants
+
+    def check(self):
+        observed = {account: to_decimal(self.contract.balances[account]) for account in self.accounts}
+        for account in self.accounts:
+            if observed[account] != self.balances[account]:
+                raise InvariantViolation(
+                    f"balance of {account} is {observed[account]}, the model expected {self.balances[account]}"
+                )
+
+        total_supply = to_decimal(self.contract.metadata["total_supply"])
+        if total_supply != self.total_supply:
+            raise InvariantViolation(f"total_supply is {total_supply}, the model expected {self.total_supply}")
+
+        escrow = decimal.Decimal(0)
+        for stream_id, stream in self.streams.items():
+            escrow += self.check_stream(stream_id, stream)
+
+        if sum(observed.values()) + escrow != total_supply:
+            raise InvariantViolation(
+                f"balances ({sum(observed.values())}) plus escrow ({escrow}) do not add up to total_supply ({total_supply})"
+            )
+
+        allowances = getattr(self.contract, self.allowance_variable)
+        for owner in self.accounts:
+            for spender in self.accounts:
+                allowance = to_decimal(allowances[owner, spender])
+                if allowance < 0 or allowance != self.allowances[owner, spender]:
+                    raise InvariantViolation(
+                        f"allowance of {spender} on {owner} is {allowance}, "
+                        f"the model expected {self.allowances[owner, spender]}"
+                    )
+
+        if "delegate" in self.operations:
+            for account in self.accounts:
+                delegated = sum(
+                    (observed[delegator] for delegator, to in self.delegates.items() if to == account), decimal.Decimal(0)
+                )
+                voting_power = to_decimal(self.contract.voting_powers[account])
+                if voting_power != delegated:
+                    raise InvariantViolation(f"voting power of {account} is {voting_power}, {delegated} is delegated to it")
+
+    def check_stream(self, stream_id: str, stream: StreamModel) -> decimal.Decimal:
+        """Check one stream and return its escrow."""
+        claimed = to_decimal(self.contract.streams[stream_id, "claimed"])
+        if claimed != stream.claimed:
+            raise InvariantViolation(f"stream {stream_id} paid {claimed}, the model expected {stream.claimed}")
+        payable = stream.payable(self.now)
+        if claimed > payable:
+            raise InvariantViolation(f"stream {stream_id} paid {claimed}, at most {payable} is due")
+        if stream.finalized and claimed != payable:
+            raise InvariantViolation(f"finalized stream {stream_id} paid {claimed}, {payable} was due")
+
+        escrow = to_decimal(self.contract.streams[stream_id, "escrow"])
+        if escrow < 0:
+            raise InvariantViolation(f"escrow of stream {stream_id} is {escrow}")
+        if escrow != (stream.escrow or 0):
+            raise InvariantViolation(f"escrow of stream {stream_id} is {escrow}, the model expected {stream.escrow}")
+        return escrow
+
+
+@lru_cache(maxsize=None)
+def worker_client() -> ContractingClient:
+    return ContractingClient()
+
+
+def run_job(job: tuple) -> dict:
+    standard, seed, config = job
+    return Fuzzer(standard, config, seed, client=worker_client()).run()
+
+
+def fuzz(standards: list = None, runs: int = 1, config: FuzzConfig = None, workers: int = None, seed: int = 0) -> list:
+    """Run `runs` seeds (from `seed` on) against each of `standards` (default all) and return the run reports.
+
+    Every run deploys its own contract, so runs can share one storage across `workers`
+    processes; `workers=1` runs in this process.
+    """
+    config = config or FuzzConfig()
+    jobs = [(standard, seed + i, config) for i in range(runs) for standard in standards or list(STANDARDS)]
+
+    if workers == 1:
+        return list(map(run_job, jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_job, jobs))
+
+
+def summarize(reports: list) -> dict:
+    calls = collections.Counter()
+    rejected = collections.Counter()
+    slowest = {}
+    for report in reports:
+        calls.update(report["calls"])
+        rejected.update(report["rejected"])
+        for export, (seconds, call) in report["slowest"].items():
+            if seconds > slowest.get(export, (0, None))[0]:
+                slowest[export] = (seconds, call)
+
+    return {
+        "runs": len(reports),
+        "steps": sum(report["steps"] for report in reports),
+        "calls": calls,
+        "rejected": rejected,
+        "slowest": slowest,
+        "failures": [report["failure"] for report in reports if report["failure"] is not None],
+    }
+
+
+def format_summary(summary: dict) -> str:
+    lines = [
+        f"{summary['steps']} steps in {summary['runs']} runs, {len(summary['failures'])} failed",
+        "",
+        f"{'export':<24}{'calls':>10}{'rejected':>10}{'slowest ms':>12}",
+    ]
+    for export, count in sorted(summary["calls"].items()):
+        lines.append(
+            f"{export:<24}{count:>10}{summary['rejected'][export]:>10}{summary['slowest'][export][0] * 1000:>12.3f}"
+        )
+
+    for failure in summary["failures"]:
+        lines += ["", f"{failure.standard} seed {failure.seed} step {failure.step}: {failure.message}"]
+        lines += [f"    {call}" for call in failure.trace]
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> int:
+    defaults = FuzzConfig()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("standards", nargs="*", help=f"standards to test: {', '.join(STANDARDS)} (default: all)")
+    parser.add_argument("--runs", type=int, default=1, help="seeds per standard, each on a fresh contract")
+    parser.add_argument("--steps", type=int, default=defaults.steps, help="steps per run")
+    parser.add_argument("--accounts", type=int, default=defaults.accounts)
+    parser.add_argument("--decimals", type=int, default=defaults.decimals, help="run in integer-unit mode")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    args = parser.parse_args(argv)
+
+    unknown = sorted(set(args.standards) - set(STANDARDS))
+    if unknown:
+        parser.error(f"unknown standards: {', '.join(unknown)}")
+
+    config = FuzzConfig(steps=args.steps, accounts=args.accounts, decimals=args.decimals)
+    summary = summarize(fuzz(args.standards, args.runs, config, args.workers, args.seed))
+    print(format_summary(summary))
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
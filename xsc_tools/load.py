@@ -0,0 +1,309 @@
+"""Load generator for XSC token traffic against a local `ContractingClient`.
+
+Replays a configurable mix of `transfer`, `transfer_from`, `permit`, `create_stream` and
+`balance_stream` calls against XSC003 (which carries XSC001, XSC002 and the streams).
+Callers and receivers are drawn from a Zipf-distributed account population, so a few
+accounts see most of the traffic, as on a real chain. Block time advances by a fixed
+step per operation.
+
+The report has throughput (over the time spent in contract calls), latency percentiles
+per operation and the growth of the contract's state. Run e.g. `python -m xsc_tools.load --ops 10000 --accounts 1000`.
+"""
+
+import argparse
+import bisect
+import contextlib
+import datetime
+import itertools
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+
+from contracting.client import ContractingClient
+from contracting.storage.encoder import encode
+from xian_py.wallet import Wallet
+
+from xsc_tools.core import ROOT
+from xsc_tools.permits import PermitBuilder
+from xsc_tools.profiler import StorageProfiler
+from xsc_tools.times import format_time, to_datetime
+
+CONTRACT_PATH = ROOT / "XSC003_streaming_payments_token" / "XSC0003.py"
+CONTRACT_NAME = "load_currency"
+RELAYER = "relayer"
+
+OPERATIONS = ["transfer", "transfer_from", "permit", "create_stream", "balance_stream"]
+DEFAULT_MIX = {"transfer": 60, "transfer_from": 10, "permit": 5, "create_stream": 10, "balance_stream": 15}
+
+
+@dataclass
+class LoadConfig:
+    ops: int = 10_000
+    accounts: int = 1_000
+    zipf: float = 1.1
+    mix: dict = field(default_factory=lambda: dict(DEFAULT_MIX))
+    initial_balance: int = 1_000_000
+    seconds_per_op: int = 1
+    start: datetime.datetime = datetime.datetime(2030, 1, 1)
+    chain_id: str = "load-test"
+    seed: int = 0
+
+
+class ZipfSampler:
+    """Draws items with probability proportional to 1 / rank ** exponent."""
+
+    def __init__(self, items: list, exponent: float, rng: random.Random):
+        self.items = items
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(items) + 1)))
+
+    def sample(self):
+        return self.items[bisect.bisect(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def latency_summary(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50": percentile(latencies, 0.50),
+        "p90": percentile(latencies, 0.90),
+        "p99": percentile(latencies, 0.99),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def state_size(driver, contract: str) -> dict:
+    items = driver.items(f"{contract}.")
+    if isinstance(items, dict):
+        items = items.items()
+
+    keys = 0
+    size = 0
+    for key, value in items:
+        keys += 1
+        size += len(key) + len(encode(value))
+    return {"keys": keys, "bytes": size}
+
+
+def remove_contract(driver, name: str):
+    """Delete every key of contract `name`, so runs do not pile up state."""
+    items = driver.items(f"{name}.")
+    keys = list(items) if isinstance(items, dict) else [key for key, value in items]
+    for key in keys:
+        driver.set(key, None)
+    driver.commit()
+
+
+class LoadGenerator:
+    def __init__(self, config: LoadConfig, client: ContractingClient = None, profiler: StorageProfiler = None):
+        unknown = set(config.mix) - set(OPERATIONS)
+        assert not unknown, f"Unknown operations: {', '.join(sorted(unknown))}"
+        assert sum(config.mix.values()) > 0, "The operation mix is empty."
+
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.client = client or ContractingClient(environment={"chain_id": config.chain_id})
+        self.builder = PermitBuilder(CONTRACT_NAME, config.chain_id)
+        self.operations = list(config.mix)
+        self.weights = list(itertools.accumulate(config.mix[operation] for operation in self.operations))
+        self.profiler = profiler
+        self.streams = []
+        self.nonce = 0
+
+    def setup(self):
+        """Deploy the contract and fund the accounts (through state, outside the measurement).
+
+        Only the generator's own contract is (re)deployed, the rest of the client's state is kept.
+        """
+        remove_contract(self.client.raw_driver, CONTRACT_NAME)
+        self.client.submit(CONTRACT_PATH.read_text(), name=CONTRACT_NAME)
+        self.contract = self.client.get_contract(CONTRACT_NAME)
+
+        self.wallets = {}
+        for i in range(self.config.accounts):
+            wallet = Wallet(self.rng.randbytes(32).hex())
+            self.wallets[wallet.public_key] = wallet
+            self.contract.balances[wallet.public_key] = self.config.initial_balance
+            # Every account has approved the relayer, as with a DEX router
+            self.contract.balances[wallet.public_key, RELAYER] = self.config.initial_balance
+
+        accounts = list(self.wallets)
+        self.rng.shuffle(accounts)
+        self.accounts = ZipfSampler(accounts, self.config.zipf, self.rng)
+
+    def now(self, op: int) -> datetime.datetime:
+        return self.config.start + datetime.timedelta(seconds=op * self.config.seconds_per_op)
+
+    def prepare(self, operation: str, op: int):
+        """Return (signer, export name, kwargs) for one call. Signing happens here, outside the timer."""
+        sender = self.accounts.sample()
+        receiver = self.accounts.sample()
+        amount = self.rng.randint(1, 100)
+
+        if operation == "transfer":
+            return sender, "transfer", {"amount": amount, "to": receiver}
+
+        if operation == "transfer_from":
+            return RELAYER, "transfer_from", {"amount": amount, "to": receiver, "main_account": sender}
+
+        if operation == "permit":
+            # A distinct value per permit keeps every permit hash unique
+            self.nonce += 1
+            deadline = self.now(op) + datetime.timedelta(days=1)
+            permit = self.builder.sign(self.wallets[sender], self.builder.permit(sender, receiver, self.nonce, deadline))
+            return RELAYER, "permit", {
+                "owner": permit.owner, "spender": permit.spender, "value": permit.value,
+                "deadline": permit.deadline, "signature": permit.signature,
+            }
+
+        if operation == "create_stream":
+            begins = self.now(op)
+            closes = begins + datetime.timedelta(days=self.rng.randint(1, 30))
+            return sender, "create_stream", {
+                "receiver": receiver, "rate": self.rng.randint(1, 10) / 1000,
+                "begins": format_time(begins), "closes": format_time(closes),
+            }
+
+        if not self.streams:
+            return None
+        stream_id, stream_receiver = self.streams[self.rng.randrange(len(self.streams))]
+        return stream_receiver, "balance_stream", {"stream_id": stream_id}
+
+    def run(self) -> dict:
+        self.setup()
+        driver = self.client.raw_driver
+        state_before = state_size(driver, CONTRACT_NAME)
+
+        latencies = {operation: [] for operation in OPERATIONS}
+        failures = {operation: 0 for operation in OPERATIONS}
+        skipped = 0
+
+        for op in range(self.config.ops):
+            operation = self.operations[bisect.bisect(self.weights, self.rng.random() * self.weights[-1])]
+            call = self.prepare(operation, op)
+            if call is None:
+                skipped += 1
+                continue
+
+            signer, export, kwargs = call
+            environment = {"now": to_datetime(self.now(op)), "chain_id": self.config.chain_id}
+
+            profile = self.profiler.profile(export) if self.profiler else contextlib.nullcontext()
+            start = time.perf_counter()
+            try:
+                with profile:
+                    result = getattr(self.contract, export)(signer=signer, environment=environment, **kwargs)
+            except Exception:
+                failures[operation] += 1
+                result = None
+            latencies[operation].append(time.perf_counter() - start)
+
+            if operation == "create_stream" and result is not None:
+                self.streams.append((result, kwargs["receiver"]))
+
+        # Only time spent in contract calls counts; preparing and signing calls is not measured
+        elapsed = sum(itertools.chain.from_iterable(latencies.values()))
+        state_after = state_size(driver, CONTRACT_NAME)
+        executed = sum(len(values) for values in latencies.values())
+
+        report = {
+            "ops": executed,
+            "skipped": skipped,
+            "seconds": elapsed,
+            "throughput": executed / elapsed if elapsed else 0.0,
+            "latency": latency_summary(list(itertools.chain.from_iterable(latencies.values()))),
+            "operations": {
+                operation: dict(latency_summary(values), failures=failures[operation])
+                for operation, values in latencies.items() if values
+            },
+            "state": {
+                "keys_before": state_before["keys"],
+                "keys_after": state_after["keys"],
+                "bytes_before": state_before["bytes"],
+                "bytes_after": state_after["bytes"],
+                "bytes_per_op": (state_after["bytes"] - state_before["bytes"]) / executed if executed else 0.0,
+            },
+        }
+        self.teardown()
+        return report
+
+    def teardown(self):
+        remove_contract(self.client.raw_driver, CONTRACT_NAME)
+
+
+def parse_mix(value: str) -> dict:
+    """Parse `transfer=60,permit=5,...` into a mix."""
+    mix = {}
+    for part in value.split(","):
+        operation, _, weight = part.partition("=")
+        mix[operation.strip()] = float(weight)
+    return mix
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"{report['ops']} ops in {report['seconds']:.2f}s: {report['throughput']:.0f} ops/s"
+        + (f" ({report['skipped']} skipped)" if report["skipped"] else ""),
+        "",
+        f"{'operation':<16}{'count':>8}{'failed':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    rows = list(report["operations"].items()) + [("all", dict(report["latency"], failures=None))]
+    for operation, summary in rows:
+        failures = "" if summary["failures"] is None else summary["failures"]
+        lines.append(
+            f"{operation:<16}{summary['count']:>8}{failures:>8}"
+            + "".join(f"{summary[key] * 1000:>10.3f}" for key in ["p50", "p90", "p99", "max"])
+        )
+
+    state = report["state"]
+    lines += [
+        "",
+        f"state: {state['keys_before']} -> {state['keys_after']} keys, "
+        f"{state['bytes_before']} -> {state['bytes_after']} bytes ({state['bytes_per_op']:.1f} bytes/op)",
+    ]
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> int:
+    defaults = LoadConfig()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=defaults.ops)
+    parser.add_argument("--accounts", type=int, default=defaults.accounts)
+    parser.add_argument("--zipf", type=float, default=defaults.zipf, help="Zipf exponent of the account population")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=defaults.mix,
+        help="operation weights, e.g. transfer=60,transfer_from=10,permit=5,create_stream=10,balance_stream=15",
+    )
+    parser.add_argument("--seconds-per-op", type=int, default=defaults.seconds_per_op)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--profile", action="store_true", help="also report storage reads and writes per operation")
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(
+        ops=args.ops, accounts=args.accounts, zipf=args.zipf, mix=args.mix,
+        seconds_per_op=args.seconds_per_op, seed=args.seed,
+    )
+
+    if not args.profile:
+        print(format_report(LoadGenerator(config).run()))
+        return 0
+
+    with StorageProfiler(CONTRACT_NAME) as profiler:
+        report = LoadGenerator(config, profiler=profiler).run()
+    print(format_report(report))
+    print()
+    print(profiler.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""Helpers for the permits used by XSC002 and XSC003.
+
+The message builders mirror `construct_permit_msg` and `construct_stream_permit_msg`
+in the contracts, and their structured (length-prefixed, domain-separated) variants,
+so clients and relayers can build, sign, hash and verify permits off-chain exactly as
+the contract will.
+"""
+
+import decimal
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from nacl.signing import VerifyKey
+
+try:
+    from contracting.stdlib.bridge.decimal import ContractingDecimal
+except ImportError:
+    ContractingDecimal = None
+
+from xsc_tools.times import format_time
+
+PERMITS_VARIABLE = "permits"
+PERMIT_DOMAIN_NAME = "XSC002"
+PERMIT_DOMAIN_VERSION = "1"
+
+
+def render_amount(value) -> str:
+    """Format an amount the way the contracts render it inside a legacy permit message.
+
+    Integers stay integers. Floats reach the contract as `ContractingDecimal(str(value))`,
+    so they are formatted through the same class when contracting is installed.
+    """
+    if isinstance(value, bool):
+        raise TypeError("Amounts cannot be booleans.")
+    if isinstance(value, int):
+        return str(value)
+    if ContractingDecimal is not None:
+        return str(ContractingDecimal(str(value)))
+    return str(decimal.Decimal(str(value)))
+
+
+def format_amount(value) -> str:
+    """Same as the contracts' `format_amount`: the canonical amount of a structured permit.
+
+    The amount is rendered in fixed-point without an exponent and trailing zeros are dropped,
+    so `1`, `1.0` and `Decimal("1.00")` all encode as `1` and `1.5E+20` as `150000000000000000000`.
+    """
+    amount = decimal.Decimal(render_amount(value))
+    if amount == 0:
+        return "0"
+    amount = format(amount, "f")
+    if "." in amount:
+        amount = amount.rstrip("0").rstrip(".")
+    return amount
+
+
+def construct_permit_msg(owner: str, spender: str, value, deadline, contract: str, chain_id: str) -> str:
+    return f"{owner}:{spender}:{render_amount(value)}:{format_time(deadline)}:{contract}:{chain_id}"
+
+
+def construct_stream_permit_msg(
+    sender: str, receiver: str, rate, begins, closes, deadline, contract: str, chain_id: str
+) -> str:
+    return (
+        f"{sender}:{receiver}:{render_amount(rate)}:{format_time(begins)}:{format_time(closes)}:"
+        f"{format_time(deadline)}:{contract}:{chain_id}"
+    )
+
+
+def encode_permit_fields(fields: list) -> str:
+    """Same as the contracts' `encode_permit_fields`: each field becomes `<len>:<field>`."""
+    return "".join(f"{len(str(field))}:{field}" for field in fields)
+
+
+@lru_cache(maxsize=None)
+def permit_domain(contract: str, chain_id: str, version: str = PERMIT_DOMAIN_VERSION) -> str:
+    """Hash identifying the contract, chain and encoding version of a structured permit."""
+    return sha3(encode_permit_fields([PERMIT_DOMAIN_NAME, contract, chain_id, version]))
+
+
+def construct_structured_permit_msg(owner: str, spender: str, value, deadline, contract: str, chain_id: str) -> str:
+    return encode_permit_fields(
+        [permit_domain(contract, chain_id), "permit", owner, spender, format_amount(value), format_time(deadline)]
+    )
+
+
+def construct_structured_stream_permit_msg(
+    sender: str, receiver: str, rate, begins, closes, deadline, contract: str, chain_id: str
+) -> str:
+    return encode_permit_fields(
+        [
+            permit_domain(contract, chain_id),
+            "stream_permit",
+            sender,
+            receiver,
+            format_amount(rate),
+            format_time(begins),
+            format_time(closes),
+            format_time(deadline),
+        ]
+    )
+
+
+def sha3(message: str) -> str:
+    """Same as the contracts' `hashlib.sha3`: hex input is hashed as bytes, anything else as UTF-8."""
+    try:
+        data = bytes.fromhex(message)
+    except ValueError:
+        data = message.encode()
+    return hashlib.sha3_256(data).hexdigest()
+
+
+def verify_signature(public_key: str, message: str, signature: str) -> bool:
+    """Same as the contracts' `crypto.verify`."""
+    try:
+        VerifyKey(bytes.fromhex(public_key)).verify(message.encode(), bytes.fromhex(signature))
+    except Exception:
+        return False
+    return True
+
+
+@dataclass(frozen=True)
+class Permit:
+    owner: str
+    spender: str
+    value: object
+    deadline: object
+    signature: str = ""
+    structured: bool = False
+
+    @property
+    def signer(self) -> str:
+        return self.owner
+
+    def message(self, contract: str, chain_id: str) -> str:
+        construct = construct_structured_permit_msg if self.structured else construct_permit_msg
+        return construct(self.owner, self.spender, self.value, self.deadline, contract, chain_id)
+
+
+@dataclass(frozen=True)
+class StreamPermit:
+    sender: str
+    receiver: str
+    rate: object
+    begins: object
+    closes: object
+    deadline: object
+    signature: str = ""
+    structured: bool = False
+
+    @property
+    def signer(self) -> str:
+        return self.sender
+
+    def message(self, contract: str, chain_id: str) -> str:
+        construct = construct_structured_stream_permit_msg if self.structured else construct_stream_permit_msg
+        return construct(
+            self.sender, self.receiver, self.rate, self.begins, self.closes, self.deadline, contract, chain_id
+        )
+
+
+class PermitBuilder:
+    """Builds and signs canonical permits for one contract on one chain.
+
+    Deadlines and stream times are normalized to the contracts' time format, so the
+    permits can be submitted as-is.
+    """
+
+    def __init__(self, contract: str, chain_id: str):
+        self.contract = contract
+        self.chain_id = chain_id
+
+    def permit(self, owner: str, spender: str, value, deadline, structured: bool = False) -> Permit:
+        return Permit(owner, spender, value, format_time(deadline), structured=structured)
+
+    def stream_permit(
+        self, sender: str, receiver: str, rate, begins, closes, deadline, structured: bool = False
+    ) -> StreamPermit:
+        return StreamPermit(
+            sender,
+            receiver,
+            rate,
+            format_time(begins),
+            format_time(closes),
+            format_time(deadline),
+            structured=structured,
+        )
+
+    def message(self, permit) -> str:
+        return permit.message(self.contract, self.chain_id)
+
+    def permit_hash(self, permit) -> str:
+        return sha3(self.message(permit))
+
+    def sign(self, wallet, permit):
+        """Return a copy of `permit` signed by `wallet` (an `xian_py.wallet.Wallet`)."""
+        assert wallet.public_key == permit.signer, "Wallet does not match the permit signer."
+        return replace(permit, signature=wallet.sign_msg(self.message(permit)))
+
+    def sign_many(self, wallet, permits: list) -> list:
+        return [self.sign(wallet, permit) for permit in permits]
+
+
+def verify_job(job: tuple) -> bool:
+    return verify_signature(*job)
+
+
+class PermitVerifier:
+    """Verifies permits for one contract and caches the results.
+
+    Results are cached by `(permit_hash, signature)`, so a permit that is retried after
+    a mempool failure is not verified again, while a different signature for the same
+    permit still is. The cache keeps the `cache_size` most recently used results.
+
+    The process pool is started on the first parallel batch and reused for later ones;
+    call `close()`, or use the verifier as a context manager, to shut it down.
+    """
+
+    def __init__(
+        self, contract: str, chain_id: str, processes: int = None, chunksize: int = 256, cache_size: int = 65_536
+    ):
+        self.contract = contract
+        self.chain_id = chain_id
+        self.processes = processes
+        self.chunksize = chunksize
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pool = None
+        self.pool_processes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+            self.pool_processes = None
+
+    def executor(self, processes: int) -> ProcessPoolExecutor:
+        """The verifier's process pool, (re)started if it runs with a different number of processes."""
+        if self.pool is None or self.pool_processes != processes:
+            self.close()
+            self.pool = ProcessPoolExecutor(max_workers=processes)
+            self.pool_processes = processes
+        return self.pool
+
+    def permit_hash(self, permit) -> str:
+        return sha3(permit.message(self.contract, self.chain_id))
+
+    def verify(self, permit) -> bool:
+        return self.verify_many([permit], processes=1)[0]
+
+    def verify_many(self, permits: list, processes: int = None) -> list:
+        """Verify `permits`, running uncached signatures across a process pool.
+
+        Returns one bool per permit, in order. `processes=1` verifies in this process.
+        """
+        processes = processes or self.processes
+        keys = []
+        known = {}
+        jobs = {}
+
+        for permit in permits:
+            message = permit.message(self.contract, self.chain_id)
+            key = (sha3(message), permit.signature)
+            keys.append(key)
+            if key in self.cache:
+                known[key] = self.cache[key]
+                self.cache.move_to_end(key)
+            elif key not in jobs:
+                jobs[key] = (permit.signer, message, permit.signature)
+
+        if jobs:
+            if processes == 1 or len(jobs) < self.chunksize:
+                results = map(verify_job, jobs.values())
+            else:
+                pool = self.executor(processes)
+                results = list(pool.map(verify_job, jobs.values(), chunksize=self.chunksize))
+            known.update(zip(jobs.keys(), results))
+            for key in jobs:
+                self.cache[key] = known[key]
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        return [known[key] for key in keys]
+
+
+def scan_expired_permits(driver, contract: str, now) -> list:
+    """Return the hashes of used permits on `contract` whose deadline is at or before `now`.
+
+    `driver` is a contracting storage driver (e.g. `ContractingClient.raw_driver`).
+    `now` must be comparable with the stored deadlines, i.e. a contracting `Datetime`.
+    Markers without a deadline are skipped, as they can never be pruned.
+    """
+    prefix = f"{contract}.{PERMITS_VARIABLE}:"
+    items = driver.items(prefix)
+    if isinstance(items, dict):
+        items = items.items()
+
+    expired = []
+    for key, deadline in items:
+        if deadline is None or isinstance(deadline, bool):
+            continue
+        if deadline <= now:
+            expired.append(key[len(prefix):])
+    return expired
+
+
+def batched(values: list, size: int) -> list:
+    """Split `values` into lists of at most `size` items."""
+    assert size > 0, "Batch size must be greater than 0."
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def prune_expired_permits(client, contract: str, now, signer: str = "sys", batch_size: int = 500) -> int:
+    """Find expired permits on `contract` and prune them with `prune_permits` in batches.
+
+    Returns the number of pruned permits.
+    """
+    expired = scan_expired_permits(client.raw_driver, contract, now)
+    token = client.get_contract(contract)
+
+    for batch in batched(expired, batch_size):
+        token.prune_permits(permit_hashes=batch, signer=signer, environment={"now": now})
+
+    return len(expired)
@@ -0,0 +1,170 @@
+"""Storage access profiler for contract exports.
+
+Records every storage read and write contracting makes while an export runs, with the
+key, the encoded size of the value and whether the key was already read (or written)
+earlier in the same call, and aggregates them into a per-function report. Repeated
+reads and writes within one call are the candidates for caching in a local variable.
+
+    profiler = StorageProfiler()
+    with profiler:
+        profiler.call(currency, "balance_stream", stream_id=stream_id, signer="bob")
+    print(profiler.report())
+
+Keys are grouped into patterns for the report: arguments are replaced by `*`, except
+the last one of multi-argument keys, which is usually a field name (so
+`currency.streams:<id>:status` becomes `streams:*:status`). Contracting's own keys
+(`__code__`, `__owner__`, ...) are not recorded.
+"""
+
+import collections
+import contextlib
+from dataclasses import dataclass, field
+
+from contracting.storage.driver import Driver
+from contracting.storage.encoder import encode
+
+
+@dataclass
+class Access:
+    operation: str
+    key: str
+    size: int
+    repeat: bool
+
+
+@dataclass
+class CallProfile:
+    function: str
+    accesses: list = field(default_factory=list)
+    seen: dict = field(default_factory=lambda: {"get": set(), "set": set()})
+
+    def add(self, operation: str, key: str, size: int):
+        self.accesses.append(Access(operation, key, size, key in self.seen[operation]))
+        self.seen[operation].add(key)
+
+    def count(self, operation: str, repeat: bool = None) -> int:
+        return sum(
+            1 for access in self.accesses
+            if access.operation == operation and (repeat is None or access.repeat == repeat)
+        )
+
+
+def key_pattern(key: str) -> str:
+    """`currency.streams:abc:status` -> `streams:*:status`, `currency.balances:abc` -> `balances:*`."""
+    variable, *arguments = key.split(".", 1)[-1].split(":")
+    if not arguments:
+        return variable
+    if len(arguments) == 1:
+        return f"{variable}:*"
+    return ":".join([variable] + ["*"] * (len(arguments) - 1) + [arguments[-1]])
+
+
+def is_internal(key: str) -> bool:
+    return key.split(".", 1)[-1].startswith("__")
+
+
+def value_size(value) -> int:
+    return 0 if value is None else len(encode(value))
+
+
+class StorageProfiler:
+    """Patches `Driver.get` and `Driver.set` while active and attributes accesses to the current call."""
+
+    def __init__(self, contract: str = None):
+        self.contract = contract
+        self.calls = []
+        self.current = None
+        self.patches = None
+
+    def __enter__(self):
+        original_get = Driver.get
+        original_set = Driver.set
+        profiler = self
+
+        def profiled_get(driver, key, *args, **kwargs):
+            value = original_get(driver, key, *args, **kwargs)
+            profiler.record("get", key, value)
+            return value
+
+        def profiled_set(driver, key, value, *args, **kwargs):
+            profiler.record("set", key, value)
+            return original_set(driver, key, value, *args, **kwargs)
+
+        self.patches = (original_get, original_set)
+        Driver.get = profiled_get
+        Driver.set = profiled_set
+        return self
+
+    def __exit__(self, *exc):
+        Driver.get, Driver.set = self.patches
+        self.patches = None
+        return False
+
+    def record(self, operation: str, key: str, value):
+        if self.current is None or is_internal(key):
+            return
+        if self.contract is not None and not key.startswith(f"{self.contract}."):
+            return
+
+        self.current.add(operation, key, value_size(value))
+
+    @contextlib.contextmanager
+    def profile(self, function: str):
+        """Attribute the storage accesses made inside the block to `function`."""
+        assert self.patches is not None, "Use the profiler as a context manager first."
+        self.current = CallProfile(function)
+        try:
+            yield self.current
+        finally:
+            self.calls.append(self.current)
+            self.current = None
+
+    def call(self, contract, function: str, **kwargs):
+        """Call `function` on a `ContractingClient` contract and profile it."""
+        with self.profile(function):
+            return getattr(contract, function)(**kwargs)
+
+    def summary(self) -> dict:
+        """Per-function averages and the key patterns that are read or written repeatedly."""
+        by_function = collections.defaultdict(list)
+        for call in self.calls:
+            by_function[call.function].append(call)
+
+        summary = {}
+        for function, calls in by_function.items():
+            accesses = [access for call in calls for access in call.accesses]
+            repeats = collections.Counter(
+                (access.operation, key_pattern(access.key)) for access in accesses if access.repeat
+            )
+            summary[function] = {
+                "calls": len(calls),
+                "reads": sum(call.count("get") for call in calls) / len(calls),
+                "repeat_reads": sum(call.count("get", repeat=True) for call in calls) / len(calls),
+                "writes": sum(call.count("set") for call in calls) / len(calls),
+                "repeat_writes": sum(call.count("set", repeat=True) for call in calls) / len(calls),
+                "bytes_read": sum(a.size for a in accesses if a.operation == "get") / len(calls),
+                "bytes_written": sum(a.size for a in accesses if a.operation == "set") / len(calls),
+                "repeated_keys": {
+                    f"{operation} {pattern}": count / len(calls) for (operation, pattern), count in repeats.most_common()
+                },
+            }
+        return summary
+
+    def report(self) -> str:
+        """Per-function report; all numbers are averages per call."""
+        lines = [
+            f"{'function':<24}{'calls':>7}{'reads':>8}{'repeat':>8}{'writes':>8}{'repeat':>8}{'B read':>9}{'B written':>11}"
+        ]
+        summary = self.summary()
+        for function, stats in summary.items():
+            lines.append(
+                f"{function:<24}{stats['calls']:>7}{stats['reads']:>8.1f}{stats['repeat_reads']:>8.1f}"
+                f"{stats['writes']:>8.1f}{stats['repeat_writes']:>8.1f}{stats['bytes_read']:>9.0f}{stats['bytes_written']:>11.0f}"
+            )
+        for function, stats in summary.items():
+            if stats["repeated_keys"]:
+                lines.append("")
+                lines.append(f"{function}: repeated per call")
+                for key, count in stats["repeated_keys"].items():
+                    lines.append(f"    {count:>5.1f}  {key}")
+        return "\n".join(lines)
@@ -0,0 +1,593 @@
+import unittest
+from contracting.stdlib.bridge.time import Datetime
+from contracting.client import ContractingClient
+from contracting.storage.driver import Driver
+from xian_py.wallet import Wallet
+from pathlib import Path
+import datetime
+import collections
+import json
+import random
+import subprocess
+import sys
+import tempfile
+
+from xsc_tools import permits
+from xsc_tools.permits import Permit, PermitBuilder, PermitVerifier
+from xsc_tools import units, core, bench, load, profiler, fuzz, clock
+import decimal
+
+ROOT = Path(__file__).parent.parent.parent
+PRIVATE_KEY = 'ed30796abc4ab47a97bfb37359f50a9c362c7b304a4b4ad1b3f5369ecb6f7fd8'
+
+
+class TestPermitTools(unittest.TestCase):
+    def setUp(self):
+        self.chain_id = "test-chain"
+        self.client = ContractingClient(environment={"chain_id": self.chain_id})
+        self.client.flush()
+
+        with open(ROOT / "XSC002_permit_token" / "XSC0002.py") as f:
+            self.client.submit(f.read(), name="currency")
+
+        self.currency = self.client.get_contract("currency")
+        self.wallet = Wallet(PRIVATE_KEY)
+
+    def tearDown(self):
+        self.client.flush()
+
+    def use_permit(self, spender, deadline):
+        msg = f"{self.wallet.public_key}:{spender}:100:{deadline}:currency:{self.chain_id}"
+        return self.currency.permit(
+            owner=self.wallet.public_key, spender=spender, value=100, deadline=str(deadline),
+            signature=self.wallet.sign_msg(msg), environment={"now": Datetime(year=2029, month=1, day=1)}
+        )
+
+    def test_scan_expired_permits(self):
+        expired = self.use_permit("alice", Datetime(year=2030, month=1, day=1))
+        live = self.use_permit("bob", Datetime(year=2031, month=1, day=1))
+
+        found = permits.scan_expired_permits(self.client.raw_driver, "currency", Datetime(year=2030, month=6, day=1))
+
+        self.assertEqual(found, [expired])
+        self.assertNotIn(live, found)
+
+    def test_prune_expired_permits(self):
+        expired = self.use_permit("alice", Datetime(year=2030, month=1, day=1))
+        live = self.use_permit("bob", Datetime(year=2031, month=1, day=1))
+
+        pruned = permits.prune_expired_permits(self.client, "currency", Datetime(year=2030, month=6, day=1), batch_size=1)
+
+        self.assertEqual(pruned, 1)
+        self.assertIsNone(self.currency.permits[expired])
+        self.assertEqual(self.currency.permits[live], Datetime(year=2031, month=1, day=1))
+
+    def test_batched(self):
+        self.assertEqual(permits.batched([1, 2, 3, 4, 5], 2), [[1, 2], [3, 4], [5]])
+        self.assertEqual(permits.batched([], 2), [])
+
+
+class TestPermitVerifier(unittest.TestCase):
+    def setUp(self):
+        self.chain_id = "test-chain"
+        self.client = ContractingClient(environment={"chain_id": self.chain_id})
+        self.client.flush()
+
+        with open(ROOT / "XSC003_streaming_payments_token" / "XSC0003.py") as f:
+            self.client.submit(f.read(), name="currency")
+
+        self.currency = self.client.get_contract("currency")
+        self.wallet = Wallet(PRIVATE_KEY)
+        self.verifier = PermitVerifier("currency", self.chain_id)
+
+    def tearDown(self):
+        self.client.flush()
+
+    def signed_permit(self, spender="some_spender", value=100, deadline="2030-01-01 00:00:00"):
+        builder = PermitBuilder("currency", self.chain_id)
+        return builder.sign(self.wallet, builder.permit(self.wallet.public_key, spender, value, deadline))
+
+    def test_permit_hash_matches_contract(self):
+        permit = self.signed_permit()
+        permit_hash = self.currency.permit(
+            owner=permit.owner, spender=permit.spender, value=permit.value, deadline=permit.deadline,
+            signature=permit.signature, environment={"now": Datetime(year=2029, month=1, day=1)}
+        )
+        self.assertEqual(self.verifier.permit_hash(permit), permit_hash)
+        self.assertTrue(self.verifier.verify(permit))
+
+    def test_stream_permit_is_accepted_by_contract(self):
+        builder = PermitBuilder("currency", self.chain_id)
+        permit = builder.sign(self.wallet, builder.stream_permit(
+            self.wallet.public_key, "bob", 1, "2030-01-01 00:00:00", "2030-02-01 00:00:00", "2029-06-01 00:00:00"
+        ))
+
+        self.assertTrue(self.verifier.verify(permit))
+        stream_id = self.currency.create_stream_from_permit(
+            sender=permit.sender, receiver=permit.receiver, rate=permit.rate, begins=permit.begins,
+            closes=permit.closes, deadline=permit.deadline, signature=permit.signature,
+            environment={"now": Datetime(year=2029, month=1, day=1)}
+        )
+        self.assertEqual(self.currency.streams[stream_id, "sender"], self.wallet.public_key)
+
+    def test_verify_many_across_processes(self):
+        valid = [self.signed_permit(spender=f"spender_{i}") for i in range(8)]
+        tampered = Permit(valid[0].owner, "thief", valid[0].value, valid[0].deadline, valid[0].signature)
+        with PermitVerifier("currency", self.chain_id, processes=2, chunksize=2) as verifier:
+            results = verifier.verify_many(valid + [tampered])
+            pool = verifier.pool
+
+            # Later batches reuse the same pool
+            more = [self.signed_permit(spender=f"other_{i}") for i in range(4)]
+            self.assertEqual(verifier.verify_many(more), [True] * 4)
+            self.assertIs(verifier.pool, pool)
+
+        self.assertEqual(results, [True] * 8 + [False])
+        self.assertIsNone(verifier.pool)
+
+    def test_verify_many_caches_results(self):
+        permit = self.signed_permit()
+        self.assertEqual(self.verifier.verify_many([permit, permit]), [True, True])
+        self.assertEqual(len(self.verifier.cache), 1)
+
+        # A different signature for the same permit is verified separately
+        forged = Permit(permit.owner, permit.spender, permit.value, permit.deadline, "00" * 64)
+        self.assertFalse(self.verifier.verify(forged))
+        self.assertEqual(len(self.verifier.cache), 2)
+
+    def test_cache_is_bounded(self):
+        verifier = PermitVerifier("currency", self.chain_id, cache_size=2)
+        signed = [self.signed_permit(spender=f"spender_{i}") for i in range(3)]
+
+        self.assertEqual(verifier.verify_many(signed), [True] * 3)
+        self.assertEqual(len(verifier.cache), 2)
+
+        # The least recently used result is evicted first
+        verifier.verify(signed[1])
+        verifier.verify(signed[0])
+        self.assertEqual(
+            list(verifier.cache), [(verifier.permit_hash(permit), permit.signature) for permit in signed[1::-1]]
+        )
+
+
+class TestPermitBuilder(unittest.TestCase):
+    VALUES = [100, 0, 100.5, 0.1, 12345.678901, 1_000_000_000]
+
+    def setUp(self):
+        self.chain_id = "test-chain"
+        self.client = ContractingClient(environment={"chain_id": self.chain_id})
+        self.client.flush()
+
+        for name, path in [("xsc002", "XSC002_permit_token/XSC0002.py"), ("xsc003", "XSC003_streaming_payments_token/XSC0003.py")]:
+            with open(ROOT / path) as f:
+                self.client.submit(f.read(), name=name)
+
+        self.wallet = Wallet(PRIVATE_KEY)
+        self.env = {"now": Datetime(year=2029, month=1, day=1)}
+
+    def tearDown(self):
+        self.client.flush()
+
+    def test_permit_messages_match_contracts(self):
+        for name in ["xsc002", "xsc003"]:
+            contract = self.client.get_contract(name)
+            builder = PermitBuilder(name, self.chain_id)
+            unsigned = [builder.permit(self.wallet.public_key, f"spender_{i}", value, Datetime(year=2030, month=1, day=1)) for i, value in enumerate(self.VALUES)]
+
+            for permit in builder.sign_many(self.wallet, unsigned):
+                with self.subTest(contract=name, value=permit.value):
+                    permit_hash = contract.permit(
+                        owner=permit.owner, spender=permit.spender, value=permit.value,
+                        deadline=permit.deadline, signature=permit.signature, environment=self.env
+                    )
+                    self.assertEqual(builder.permit_hash(permit), permit_hash)
+
+    def test_stream_permit_messages_match_contract(self):
+        contract = self.client.get_contract("xsc003")
+        builder = PermitBuilder("xsc003", self.chain_id)
+
+        for i, rate in enumerate([1, 0.5, 12.345678]):
+            permit = builder.sign(self.wallet, builder.stream_permit(
+                self.wallet.public_key, f"receiver_{i}", rate,
+                datetime.datetime(2030, 1, 1), "2030-02-01 00:00:00", Datetime(year=2029, month=6, day=1)
+            ))
+            with self.subTest(rate=rate):
+                contract.create_stream_from_permit(
+                    sender=permit.sender, receiver=permit.receiver, rate=permit.rate, begins=permit.begins,
+                    closes=permit.closes, deadline=permit.deadline, signature=permit.signature, environment=self.env
+                )
+                self.assertEqual(contract.permits[builder.permit_hash(permit)], Datetime(year=2029, month=6, day=1))
+
+    def test_structured_permits_match_contracts(self):
+        for name in ["xsc002", "xsc003"]:
+            contract = self.client.get_contract(name)
+            builder = PermitBuilder(name, self.chain_id)
+            permit = builder.sign(self.wallet, builder.permit(self.wallet.public_key, "spender", 100.5, "2030-01-01 00:00:00", structured=True))
+
+            with self.subTest(contract=name):
+                permit_hash = contract.permit(
+                    owner=permit.owner, spender=permit.spender, value=permit.value,
+                    deadline=permit.deadline, signature=permit.signature, structured=True, environment=self.env
+                )
+                self.assertEqual(builder.permit_hash(permit), permit_hash)
+
+        contract = self.client.get_contract("xsc003")
+        builder = PermitBuilder("xsc003", self.chain_id)
+        permit = builder.sign(self.wallet, builder.stream_permit(
+            self.wallet.public_key, "receiver", 0.5, "2030-01-01 00:00:00", "2030-02-01 00:00:00", "2029-06-01 00:00:00", structured=True
+        ))
+        contract.create_stream_from_permit(
+            sender=permit.sender, receiver=permit.receiver, rate=permit.rate, begins=permit.begins,
+            closes=permit.closes, deadline=permit.deadline, signature=permit.signature, structured=True, environment=self.env
+        )
+        self.assertIsNotNone(contract.permits[builder.permit_hash(permit)])
+
+    def test_structured_amounts_are_canonical(self):
+        builder = PermitBuilder("xsc002", self.chain_id)
+        signed = [
+            builder.sign(self.wallet, builder.permit(self.wallet.public_key, "spender", value, "2030-01-01 00:00:00", structured=True))
+            for value in [1, 1.0, decimal.Decimal("1.00")]
+        ]
+        self.assertEqual(len({permit.signature for permit in signed}), 1)
+
+        # Signed over an int, accepted with the amount as a float
+        permit_hash = self.client.get_contract("xsc002").permit(
+            owner=signed[0].owner, spender=signed[0].spender, value=1.0, deadline=signed[0].deadline,
+            signature=signed[0].signature, structured=True, environment=self.env
+        )
+        self.assertEqual(builder.permit_hash(signed[0]), permit_hash)
+
+        # Large and small amounts are signed in fixed-point, as the contract encodes them
+        for i, value in enumerate([1.5e20, 1.5e2, 2.5e-10]):
+            permit = builder.sign(self.wallet, builder.permit(self.wallet.public_key, f"spender_{i}", value, "2030-01-01 00:00:00", structured=True))
+            permit_hash = self.client.get_contract("xsc002").permit(
+                owner=permit.owner, spender=permit.spender, value=permit.value, deadline=permit.deadline,
+                signature=permit.signature, structured=True, environment=self.env
+            )
+            self.assertEqual(builder.permit_hash(permit), permit_hash)
+
+    def test_structured_permits_are_domain_separated(self):
+        permit = Permit("owner", "spender", 1, "2030-01-01 00:00:00", structured=True)
+        self.assertNotEqual(permit.message("xsc002", self.chain_id), permit.message("xsc003", self.chain_id))
+        self.assertNotEqual(permit.message("xsc002", self.chain_id), permit.message("xsc002", "other-chain"))
+        self.assertNotEqual(permits.permit_domain("xsc002", self.chain_id), permits.permit_domain("xsc002", self.chain_id, "2"))
+        self.assertEqual(permits.encode_permit_fields(["a:b", 10]), "3:a:b2:10")
+
+    def test_sign_requires_matching_wallet(self):
+        builder = PermitBuilder("xsc002", self.chain_id)
+        with self.assertRaises(AssertionError):
+            builder.sign(self.wallet, builder.permit("someone_else", "spender", 1, "2030-01-01 00:00:00"))
+
+    def test_format_amount(self):
+        self.assertEqual(permits.format_amount(100), "100")
+        self.assertEqual(permits.format_amount(100.50), "100.5")
+        self.assertEqual(permits.format_amount(decimal.Decimal("1.5E+20")), "150000000000000000000")
+        self.assertEqual(permits.format_amount(decimal.Decimal("1.5E+2")), "150")
+        self.assertEqual(permits.format_amount(2.5e-10), "0.00000000025")
+        self.assertEqual(permits.format_amount(decimal.Decimal("1.0E+10")), "10000000000")
+        self.assertEqual(permits.format_amount(decimal.Decimal("0E+3")), "0")
+        self.assertEqual(permits.render_amount(100), "100")
+        self.assertEqual(permits.format_time(datetime.datetime(2030, 1, 2, 3, 4, 5)), "2030-01-02 03:04:05")
+        self.assertEqual(permits.format_time(Datetime(year=2030, month=1, day=2, hour=3)), "2030-01-02 03:00:00")
+        with self.assertRaises(TypeError):
+            permits.format_amount(True)
+
+
+class TestUnits(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(units.to_base_units("1.5", 8), 150_000_000)
+        self.assertEqual(units.to_base_units(0.1, 8), 10_000_000)
+        self.assertEqual(units.to_base_units(7, 0), 7)
+        self.assertEqual(units.from_base_units(150_000_000, 8), decimal.Decimal("1.5"))
+        self.assertEqual(units.format_units(150_000_000, 8, "TST"), "1.50000000 TST")
+
+    def test_rejects_extra_precision(self):
+        with self.assertRaises(ValueError):
+            units.to_base_units("0.000000001", 8)
+        with self.assertRaises(TypeError):
+            units.to_base_units(True, 8)
+
+    def test_amounts_are_accepted_by_contract(self):
+        client = ContractingClient()
+        client.flush()
+        with open(ROOT / "XSC001_standard_token/XSC0001.py") as f:
+            client.submit(f.read(), name="xsc001", constructor_args={"decimals": 8})
+        contract = client.get_contract("xsc001")
+
+        contract.transfer(amount=units.to_base_units("0.0025", 8), to="bob", signer="sys")
+        self.assertEqual(units.format_units(contract.balances["bob"], 8), "0.00250000")
+        client.flush()
+
+class TestCore(unittest.TestCase):
+    def test_standards_match_core(self):
+        self.assertEqual(core.check(ROOT), [])
+
+    def test_write_restores_drifted_core(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            for path in core.PROFILES:
+                (tmp / path).parent.mkdir(parents=True, exist_ok=True)
+                (tmp / path).write_text((ROOT / path).read_text())
+
+            drifted_path = "XSC004_wrapped_token/XSC0004.py"
+            source = (tmp / drifted_path).read_text()
+            (tmp / drifted_path).write_text(source.replace("Not enough coins to send.", "Not enough coins."))
+
+            self.assertEqual(core.check(tmp), [drifted_path])
+            self.assertEqual(core.write(tmp), [drifted_path])
+            self.assertEqual((tmp / drifted_path).read_text(), source)
+
+    def test_render_core(self):
+        rendered = core.render_core(core.Profile(allowances="approvals", transfer_hook="hook({sender})"))
+        self.assertIn("    hook(ctx.caller)\n", rendered)
+        self.assertIn("    hook(main_account)\n", rendered)
+        self.assertIn("You have {approvals[main_account, ctx.caller]}", rendered)
+        compile(rendered, "core", "exec")
+
+
+class TestBench(unittest.TestCase):
+    def test_benchmark(self):
+        results = bench.benchmark(["xsc0001", "xsc0003"], repeat=1)
+
+        self.assertEqual(list(results), ["xsc0001", "xsc0003"])
+        self.assertGreater(results["xsc0003"]["source_bytes"], results["xsc0001"]["source_bytes"])
+        for result in results.values():
+            self.assertGreater(result["code_object_bytes"], 0)
+            self.assertGreater(result["submit_seconds"], 0)
+            self.assertGreater(result["first_call_seconds"], 0)
+
+        self.assertIn("xsc0003", bench.format_results(results))
+
+    def test_output_is_appended(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "results.jsonl"
+            bench.main(["xsc0001", "--repeat", "1", "--output", str(output)])
+            bench.main(["xsc0001", "--repeat", "1", "--output", str(output)])
+
+            records = [json.loads(line) for line in output.read_text().splitlines()]
+            self.assertEqual(len(records), 2)
+            self.assertIn("xsc0001", records[0]["results"])
+
+
+class TestLoad(unittest.TestCase):
+    def test_zipf_sampler_favours_low_ranks(self):
+        sampler = load.ZipfSampler(list(range(100)), 1.2, random.Random(1))
+        counts = collections.Counter(sampler.sample() for _ in range(10_000))
+        self.assertGreater(counts[0], counts[10])
+        self.assertGreater(counts[10], counts[99])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(load.percentile(values, 0.5), 50)
+        self.assertEqual(load.percentile(values, 0.99), 99)
+        self.assertEqual(load.percentile([], 0.5), 0.0)
+
+    def test_run(self):
+        config = load.LoadConfig(ops=300, accounts=20, seed=3)
+        report = load.LoadGenerator(config).run()
+
+        self.assertEqual(report["ops"] + report["skipped"], 300)
+        self.assertGreater(report["throughput"], 0)
+        self.assertEqual(set(report["operations"]), set(load.OPERATIONS))
+        self.assertEqual(report["operations"]["transfer"]["failures"], 0)
+        self.assertGreater(report["state"]["keys_after"], report["state"]["keys_before"])
+        self.assertIn("ops/s", load.format_report(report))
+
+    def test_run_keeps_client_state(self):
+        client = ContractingClient(environment={"chain_id": "load-test"})
+        client.flush()
+        client.raw_driver.set("other.balances:alice", 5)
+        client.raw_driver.commit()
+
+        load.LoadGenerator(load.LoadConfig(ops=50, accounts=5), client=client).run()
+
+        # Only the generator's own contract is removed afterwards
+        self.assertEqual(client.raw_driver.get("other.balances:alice"), 5)
+        self.assertEqual(load.state_size(client.raw_driver, load.CONTRACT_NAME)["keys"], 0)
+        client.flush()
+
+    def test_parse_mix(self):
+        self.assertEqual(load.parse_mix("transfer=3,permit=1"), {"transfer": 3.0, "permit": 1.0})
+        with self.assertRaises(AssertionError):
+            load.LoadGenerator(load.LoadConfig(mix={"mint": 1}))
+
+
+class TestStorageProfiler(unittest.TestCase):
+    def setUp(self):
+        self.client = ContractingClient()
+        self.client.flush()
+        with open(ROOT / "XSC003_streaming_payments_token" / "XSC0003.py") as f:
+            self.client.submit(f.read(), name="currency")
+        self.currency = self.client.get_contract("currency")
+
+    def tearDown(self):
+        self.client.flush()
+
+    def test_profiles_exports(self):
+        stream_id = self.currency.create_stream(receiver="bob", rate=1, begins="2030-01-01 00:00:00", closes="2030-02-01 00:00:00", signer="sys")
+        original_get, original_set = Driver.get, Driver.set
+
+        with profiler.StorageProfiler("currency") as storage:
+            self.assertIsNot(Driver.get, original_get)
+            storage.call(self.currency, "transfer", amount=10, to="bob", signer="sys")
+            storage.call(self.currency, "transfer", amount=10, to="carl", signer="sys")
+            storage.call(self.currency, "balance_stream", stream_id=stream_id, signer="bob", environment={"now": Datetime(year=2030, month=1, day=2)})
+
+        summary = storage.summary()
+        self.assertEqual(summary["transfer"]["calls"], 2)
+        self.assertEqual(summary["transfer"]["writes"], 2)
+        self.assertGreater(summary["balance_stream"]["reads"], summary["transfer"]["reads"])
+        self.assertIn("balance_stream", storage.report())
+
+        # The driver is restored afterwards
+        self.assertIs(Driver.get, original_get)
+        self.assertIs(Driver.set, original_set)
+
+    def test_repeats(self):
+        driver = self.client.raw_driver
+        with profiler.StorageProfiler() as storage:
+            with storage.profile("manual") as call:
+                driver.get("currency.streams:abc:status")
+                driver.get("currency.streams:abc:status")
+                driver.get("currency.__code__")
+                driver.set("currency.balances:bob", 5)
+
+        self.assertEqual(call.count("get"), 2)
+        self.assertEqual(call.count("get", repeat=True), 1)
+        self.assertEqual(storage.summary()["manual"]["repeated_keys"], {"get streams:*:status": 1.0})
+
+    def test_key_pattern(self):
+        self.assertEqual(profiler.key_pattern("currency.streams:abc:status"), "streams:*:status")
+        self.assertEqual(profiler.key_pattern("currency.balances:abc"), "balances:*")
+        self.assertEqual(profiler.key_pattern("currency.balances:abc:def"), "balances:*:def")
+        self.assertEqual(profiler.key_pattern("currency.stream_count"), "stream_count")
+
+
+class TestFuzz(unittest.TestCase):
+    def setUp(self):
+        self.client = ContractingClient()
+        self.client.flush()
+
+    def tearDown(self):
+        self.client.flush()
+
+    def test_standards_hold_invariants(self):
+        config = fuzz.FuzzConfig(steps=200)
+        reports = fuzz.fuzz(runs=1, config=config, workers=1)
+
+        self.assertEqual(len(reports), len(bench.STANDARDS))
+        for report in reports:
+            self.assertIsNone(report["failure"], report["failure"])
+            self.assertEqual(report["steps"], 200)
+            self.assertGreater(sum(report["rejected"].values()), 0)
+
+    def test_integer_mode(self):
+        config = fuzz.FuzzConfig(steps=200, decimals=8)
+        for report in fuzz.fuzz(["xsc0003"], runs=2, config=config, workers=1):
+            self.assertIsNone(report["failure"], report["failure"])
+
+    def test_workers(self):
+        config = fuzz.FuzzConfig(steps=50)
+        summary = fuzz.summarize(fuzz.fuzz(["xsc0001", "xsc0005"], runs=2, config=config, workers=2))
+
+        self.assertEqual(summary["runs"], 4)
+        self.assertEqual(summary["steps"], 200)
+        self.assertEqual(summary["failures"], [])
+        self.assertIn("transfer", fuzz.format_summary(summary))
+
+    def test_detects_violations(self):
+        fuzzer = fuzz.Fuzzer("xsc0001", seed=1, client=self.client)
+        fuzzer.setup()
+        fuzzer.check()
+
+        account = fuzzer.accounts[1]
+        fuzzer.contract.balances[account] = fuzzer.contract.balances[account] + 1
+
+        # The model disagrees with the balance
+        with self.assertRaises(fuzz.InvariantViolation):
+            fuzzer.check()
+
+    def test_detects_misdirected_stream_payouts(self):
+        fuzzer = fuzz.Fuzzer("xsc0003", seed=1, client=self.client)
+        fuzzer.setup()
+        while not any(stream.escrow for stream in fuzzer.streams.values()):
+            fuzzer.step_create_escrowed_stream()
+        fuzzer.check()
+
+        # Pay a coin out of the escrow to an account the stream does not pay: the totals still add up
+        stream_id, stream = next((key, value) for key, value in fuzzer.streams.items() if value.escrow)
+        account = next(account for account in fuzzer.accounts if account != stream.receiver)
+        fuzzer.contract.streams[stream_id, "escrow"] = fuzzer.contract.streams[stream_id, "escrow"] - 1
+        fuzzer.contract.balances[account] = fuzzer.contract.balances[account] + 1
+
+        with self.assertRaises(fuzz.InvariantViolation):
+            fuzzer.check()
+
+    def test_stream_model(self):
+        start = datetime.datetime(2030, 1, 1)
+        stream = fuzz.StreamModel("a", "b", [[start, decimal.Decimal(2)]], start + datetime.timedelta(seconds=100))
+        stream.segments.append([start + datetime.timedelta(seconds=10), decimal.Decimal(1)])
+
+        self.assertEqual(stream.payable(start - datetime.timedelta(seconds=5)), 0)
+        self.assertEqual(stream.payable(start + datetime.timedelta(seconds=30)), 40)
+        self.assertEqual(stream.payable(start + datetime.timedelta(days=1)), 110)
+
+        stream.claimed = decimal.Decimal(30)
+        self.assertEqual(stream.due(start + datetime.timedelta(seconds=30)), 10)
+        self.assertEqual(stream.required_escrow(), 80)
+
+
+class TestSimulationClock(unittest.TestCase):
+    def setUp(self):
+        self.client = ContractingClient()
+        self.client.flush()
+        with open(ROOT / "XSC003_streaming_payments_token" / "XSC0003.py") as f:
+            self.client.submit(f.read(), name="currency")
+        self.currency = self.client.get_contract("currency")
+        self.start = datetime.datetime(2030, 1, 1)
+        self.clock = clock.SimulationClock(self.client, self.start)
+
+    def tearDown(self):
+        self.client.flush()
+
+    def test_does_not_import_the_load_generator(self):
+        code = "import sys, xsc_tools.clock; print('xsc_tools.load' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_runs_actions_in_timestamp_order(self):
+        hours = datetime.timedelta(hours=1)
+        order = []
+        self.clock.at(self.start + 3 * hours, "c", lambda: order.append(("c", self.clock.now)))
+        self.clock.every(hours, "tick", lambda: order.append(("tick", self.clock.now)), until=self.start + 3 * hours)
+        self.clock.at(self.start + 2 * hours, "b", lambda: order.append(("b", self.clock.now)))
+
+        self.clock.run(until=self.start + 5 * hours)
+
+        self.assertEqual(order, [
+            ("tick", self.start + hours),
+            ("b", self.start + 2 * hours),
+            ("tick", self.start + 2 * hours),
+            ("c", self.start + 3 * hours),
+            ("tick", self.start + 3 * hours),
+        ])
+        self.assertEqual(self.clock.now, self.start + 5 * hours)
+        with self.assertRaises(AssertionError):
+            self.clock.travel(self.start)
+
+    def test_year_of_daily_balancing(self):
+        # GIVEN three year-long streams that are balanced daily
+        day = datetime.timedelta(days=1)
+        stream_ids = {}
+        for receiver in ["bob", "carl", "dave"]:
+            stream_ids[receiver] = self.clock.call(
+                self.currency, "create_stream", "sys", receiver=receiver, rate=0.01,
+                begins="2030-01-01 00:00:00", closes="2031-01-01 00:00:00",
+            )
+            self.clock.balance_stream_every(
+                self.currency, stream_ids[receiver], receiver, day, until=datetime.datetime(2031, 1, 1)
+            )
+
+        # bob forfeits in April, carl's stream is closed at the start of June and finalized the day after
+        self.clock.forfeit_stream_at(self.currency, stream_ids["bob"], "bob", datetime.datetime(2030, 4, 1, 12))
+        self.clock.change_close_time_at(
+            self.currency, stream_ids["carl"], "sys", datetime.datetime(2030, 3, 1, 12), datetime.datetime(2030, 6, 1)
+        )
+        self.clock.finalize_stream_at(self.currency, stream_ids["carl"], "carl", datetime.datetime(2030, 6, 2))
+
+        # WHEN the year is simulated
+        self.clock.run(until=datetime.datetime(2031, 1, 2))
+
+        # THEN every receiver got the rate (864 a day) for each day their stream ran
+        self.assertEqual(self.currency.balance_of(address="bob"), 864 * 90)
+        self.assertEqual(self.currency.balance_of(address="carl"), 864 * 151)
+        self.assertEqual(self.currency.balance_of(address="dave"), 864 * 365)
+
+        summary = self.clock.summary()
+        self.assertEqual(summary["balance_stream"], {"ok": 90 + 151 + 365, "rejected": 0})
+        self.assertEqual(summary["forfeit_stream"], {"ok": 1, "rejected": 0})
+        self.assertEqual(summary["finalize_stream"], {"ok": 1, "rejected": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+"""Time helpers shared by the tools.
+
+Contracts parse times with `strptime_ymdhms` (`%Y-%m-%d %H:%M:%S`) and receive
+`environment["now"]` as a contracting `Datetime`; these helpers convert to both.
+"""
+
+import datetime
+
+try:
+    from contracting.stdlib.bridge.time import Datetime
+except ImportError:
+    Datetime = None
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_time(value) -> str:
+    """Format a time the way the contracts do after `strptime_ymdhms`.
+
+    Accepts a `%Y-%m-%d %H:%M:%S` string, a `datetime.datetime` or a contracting `Datetime`.
+    """
+    return datetime.datetime.strptime(str(value), TIME_FORMAT).strftime(TIME_FORMAT)
+
+
+def to_datetime(value: datetime.datetime) -> Datetime:
+    return Datetime(value.year, value.month, value.day, hour=value.hour, minute=value.minute, second=value.second)
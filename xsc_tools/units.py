@@ -0,0 +1,39 @@
+"""Conversions between display amounts and integer base units.
+
+Tokens deployed with a `decimals` metadata field keep every amount as an integer
+number of base units (see `validate_amount` in the contracts). These helpers convert
+display amounts to base units before submitting, and back for display, without going
+through floats.
+"""
+
+import decimal
+
+
+def to_base_units(amount, decimals: int) -> int:
+    """Convert a display amount (e.g. `"1.5"`) to integer base units.
+
+    Floats are converted through their `str` form. Raises `ValueError` if `amount` has
+    more fractional digits than `decimals`.
+    """
+    if isinstance(amount, bool):
+        raise TypeError("Amounts cannot be booleans.")
+    if decimals < 0:
+        raise ValueError("Decimals cannot be negative.")
+
+    units = decimal.Decimal(str(amount)).scaleb(decimals)
+    if units != units.to_integral_value():
+        raise ValueError(f"{amount} has more than {decimals} decimals.")
+    return int(units)
+
+
+def from_base_units(units: int, decimals: int) -> decimal.Decimal:
+    """Convert integer base units to an exact `Decimal` display amount."""
+    if decimals < 0:
+        raise ValueError("Decimals cannot be negative.")
+    return decimal.Decimal(int(units)).scaleb(-decimals)
+
+
+def format_units(units: int, decimals: int, symbol: str = None) -> str:
+    """Format base units for display with all `decimals` digits, e.g. `"1.50000000 TST"`."""
+    amount = f"{from_base_units(units, decimals):.{decimals}f}"
+    return f"{amount} {symbol}" if symbol else amount